@@ -0,0 +1,220 @@
+"""Benchmark the fixed cost that pyright-python adds on top of running `node index.js` directly.
+
+Every node strategy is benchmarked against stubbed `node` / `npm` binaries and a pre-seeded
+cache so that this can be run offline and measures only the wrapper overhead.
+
+Usage:
+
+    python scripts/benchmark.py --iterations 20 --output benchmark.json
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from typing import Any, Dict, List, Callable
+from pathlib import Path
+
+STRATEGIES = ('global', 'nodejs_wheel', 'nodeenv')
+PHASES = ('import', 'end_to_end', 'strategy_resolution', 'version_check', 'install_pyright', 'spawn', 'direct_spawn')
+PYRIGHT_VERSION = '1.1.0'
+
+STUB_BINARY = """#!/bin/sh
+if [ "$1" = "--version" ]; then
+    echo "v20.0.0"
+fi
+exit 0
+"""
+
+STUB_NODEJS_WHEEL = """
+import os
+import subprocess
+
+ROOT_DIR = os.path.dirname(__file__)
+
+
+def node(args=None, return_completed_process=False, **kwargs):
+    proc = subprocess.run([os.path.join(ROOT_DIR, 'bin', 'node'), *args], **kwargs)
+    return proc if return_completed_process else proc.returncode
+
+
+def npm(args=None, return_completed_process=False, **kwargs):
+    proc = subprocess.run([os.path.join(ROOT_DIR, 'bin', 'npm'), *args], **kwargs)
+    return proc if return_completed_process else proc.returncode
+"""
+
+
+def _write_stub(path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(STUB_BINARY)
+    path.chmod(0o755)
+
+
+def _setup(root: Path) -> Dict[str, Dict[str, str]]:
+    """Create the stubbed binaries and a warm cache, returns the environment to use for each strategy"""
+    for name in ('node', 'npm'):
+        _write_stub(root / 'global' / 'bin' / name)
+        _write_stub(root / 'site' / 'nodejs_wheel' / 'bin' / name)
+        _write_stub(root / 'nodeenv' / 'bin' / name)
+
+    root.joinpath('site', 'nodejs_wheel', '__init__.py').write_text(STUB_NODEJS_WHEEL)
+
+    cache_dir = root / 'cache' / 'pyright-python'
+    pkg_dir = cache_dir / PYRIGHT_VERSION / 'node_modules' / 'pyright'
+    pkg_dir.mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': PYRIGHT_VERSION}))
+    pkg_dir.joinpath('index.js').write_text('')
+
+    # ensure the new version check never has to access the network
+    cache_dir.joinpath('latest-version.json').write_text(json.dumps({'version': '1.1.1', 'checked_at': time.time()}))
+
+    base = {
+        **{key: value for key, value in os.environ.items() if not key.startswith('PYRIGHT_PYTHON_')},
+        'PYRIGHT_PYTHON_CACHE_DIR': str(root / 'cache'),
+        'PYRIGHT_PYTHON_FORCE_VERSION': PYRIGHT_VERSION,
+    }
+    path = base.get('PATH', '')
+    return {
+        'global': {
+            **base,
+            'PATH': f'{root / "global" / "bin"}{os.pathsep}{path}',
+            'PYRIGHT_PYTHON_NODEJS_WHEEL': '0',
+        },
+        'nodejs_wheel': {
+            **base,
+            'PYTHONPATH': str(root / 'site'),
+        },
+        'nodeenv': {
+            **base,
+            'PYRIGHT_PYTHON_NODEJS_WHEEL': '0',
+            'PYRIGHT_PYTHON_GLOBAL_NODE': '0',
+            'PYRIGHT_PYTHON_ENV_DIR': str(root / 'nodeenv'),
+        },
+    }
+
+
+def _timed(func: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+def _worker(result_path: Path) -> None:
+    """Runs in a fresh interpreter for every iteration, timings are in milliseconds"""
+    timings: Dict[str, float] = {}
+
+    start = time.perf_counter()
+    from pyright import cli, node, utils, _utils
+
+    timings['import'] = (time.perf_counter() - start) * 1000
+
+    # the first call in the process, this is what a real CLI invocation pays
+    timings['end_to_end'] = _timed(lambda: cli.run('--version', stdout=subprocess.DEVNULL))
+
+    def version_check() -> None:
+        utils.get_latest_version.cache_clear()
+        _utils._should_warn_version(args=(), quiet=None)
+        utils.get_latest_version()
+
+    pkg_dir = _utils.install_pyright((), quiet=True)
+    script = str(pkg_dir / 'index.js')
+    command = node.get_command('node', script, '--version')
+
+    timings['strategy_resolution'] = _timed(lambda: node._resolve_strategy('node'))
+    timings['version_check'] = _timed(version_check)
+    timings['install_pyright'] = _timed(lambda: _utils.install_pyright(('--version',), quiet=True))
+    timings['spawn'] = _timed(lambda: node.run('node', script, '--version', stdout=subprocess.DEVNULL))
+    timings['direct_spawn'] = _timed(lambda: subprocess.run(command.args, env=command.env, stdout=subprocess.DEVNULL))
+
+    result_path.write_text(json.dumps(timings))
+
+
+def _summarise(values: List[float]) -> Dict[str, float]:
+    return {
+        'min': round(min(values), 3),
+        'median': round(statistics.median(values), 3),
+        'mean': round(statistics.mean(values), 3),
+        'max': round(max(values), 3),
+    }
+
+
+def run(*, iterations: int, strategies: List[str]) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        envs = _setup(root)
+        result_path = root / 'result.json'
+
+        for strategy in strategies:
+            samples: Dict[str, List[float]] = {phase: [] for phase in (*PHASES, 'process')}
+
+            # the first run populates the strategy cache and is not included in the results
+            for iteration in range(iterations + 1):
+                start = time.perf_counter()
+                subprocess.run(
+                    [sys.executable, __file__, '--worker', str(result_path)],
+                    env=envs[strategy],
+                    check=True,
+                    stdout=subprocess.DEVNULL,
+                )
+                elapsed = (time.perf_counter() - start) * 1000
+                if iteration == 0:
+                    continue
+
+                timings = json.loads(result_path.read_text())
+                for phase in PHASES:
+                    samples[phase].append(timings[phase])
+                samples['process'].append(elapsed)
+
+            summary = {phase: _summarise(values) for phase, values in samples.items()}
+            summary['overhead'] = _summarise(
+                [e2e - direct for e2e, direct in zip(samples['end_to_end'], samples['direct_spawn'])]
+            )
+            results[strategy] = summary
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--strategy', action='append', choices=STRATEGIES, dest='strategies')
+    parser.add_argument('--output', type=Path, help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--worker', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        _worker(args.worker)
+        return
+
+    if os.name != 'posix':
+        raise SystemExit('The benchmark stubs are shell scripts and require a POSIX system')
+
+    import pyright
+
+    report = {
+        'pyright_python': pyright.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'iterations': args.iterations,
+        'unit': 'ms',
+        'results': run(iterations=args.iterations, strategies=args.strategies or list(STRATEGIES)),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
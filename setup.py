@@ -54,6 +54,7 @@ setup(
         'console_scripts': [
             'pyright=pyright.cli:entrypoint',
             'pyright-python=pyright.cli:entrypoint',
+            'pyright-python-tools=pyright._commands:entrypoint',
             'pyright-langserver=pyright.langserver:entrypoint',
             'pyright-python-langserver=pyright.langserver:entrypoint',
         ],
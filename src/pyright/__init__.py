@@ -7,16 +7,58 @@ __license__ = 'MIT'
 __copyright__ = 'Copyright 2021 Robert Craigie'
 
 import os
+from typing import TYPE_CHECKING, Any
 
-from . import errors as errors
-from .cli import *
 from ._version import (
     __version__ as __version__,
     __pyright_version__ as __pyright_version__,
 )
 
+if TYPE_CHECKING:
+    from . import (
+        cli as cli,
+        node as node,
+        types as types,
+        utils as utils,
+        errors as errors,
+        results as results,
+        langserver as langserver,
+    )
+    from .cli import *
+
 if os.environ.get('PYRIGHT_PYTHON_DEBUG'):
     import logging
 
     logging.basicConfig(format='%(asctime)-15s - %(levelname)s - %(name)s - %(message)s')
     logging.getLogger('pyright').setLevel(logging.DEBUG)
+
+
+# Attributes are imported lazily to reduce the startup cost of the CLI entrypoints,
+# maps the attribute name to the module that defines it.
+_LAZY_ATTRIBUTES = {
+    'run': 'cli',
+    'arun': 'cli',
+    'main': 'cli',
+    'check': 'cli',
+    'acheck': 'cli',
+    'check_stream': 'cli',
+    'batch': 'cli',
+}
+
+# submodules that were previously always imported and can still be accessed as attributes, e.g. `pyright.cli.run()`
+_LAZY_SUBMODULES = {'cli', 'node', 'types', 'utils', 'errors', 'results', 'langserver'}
+
+
+def __getattr__(name: str) -> Any:
+    import importlib
+
+    if name in _LAZY_SUBMODULES:
+        return importlib.import_module(f'.{name}', __name__)
+
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,307 @@
+"""Only checks the files affected by changes since a git ref, see `--changed-since`.
+
+The changed files are read from `git diff` against the merge base of the given ref and the current
+commit, including uncommitted and untracked files. The affected files are the changed files and
+every file that imports them, directly or transitively.
+
+Imports are found by parsing every source file in the project, the imports of each file are stored
+in an index in the cache directory so that only files that have been modified since the previous run
+have to be parsed again.
+"""
+
+from __future__ import annotations
+
+import os
+import ast
+import time
+import hashlib
+import logging
+import subprocess
+from typing import Any, Dict, List, Tuple, Union, Iterable, Optional, Sequence, cast
+from pathlib import Path
+
+log: logging.Logger = logging.getLogger(__name__)
+
+CHANGED_SINCE_OPTION = '--changed-since'
+INDEX_VERSION = 1
+
+# files are parsed in separate processes when there are more than this many files to parse
+PARALLEL_THRESHOLD = 256
+
+
+def has_options(args: Sequence[str]) -> bool:
+    return any(arg == CHANGED_SINCE_OPTION or arg.startswith(f'{CHANGED_SINCE_OPTION}=') for arg in args)
+
+
+def pop_changed_since(args: Sequence[str]) -> Tuple[Optional[str], Tuple[str, ...]]:
+    """Removes `--changed-since <ref>` from the given arguments and returns the ref"""
+    from . import errors
+    from ._shard import _pop_option
+
+    ref, remaining = _pop_option(args, CHANGED_SINCE_OPTION)
+    if ref is not None and not ref:
+        raise errors.PyrightError(f'Expected {CHANGED_SINCE_OPTION} to be given a git ref, e.g. origin/main')
+
+    return ref, remaining
+
+
+def _git(args: Sequence[str], *, cwd: Path) -> str:
+    from . import errors
+
+    try:
+        proc = subprocess.run(['git', *args], cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as exc:
+        raise errors.PyrightError(f'Could not run git: {exc}') from exc
+
+    if proc.returncode != 0:
+        message = proc.stderr.decode('utf-8', errors='replace').strip()
+        raise errors.PyrightError(f'git {args[0]} failed: {message}')
+
+    return proc.stdout.decode('utf-8', errors='surrogateescape')
+
+
+def get_changed_files(ref: str, *, root: Path) -> List[Path]:
+    """Returns the files under `root` that have changed since the merge base of `ref` and `HEAD`.
+
+    This includes uncommitted, untracked and deleted files.
+    """
+    base = _git(['merge-base', ref, 'HEAD'], cwd=root).strip()
+    log.debug('Finding files changed since %s (%s)', ref, base)
+
+    # paths are relative to `root` and changes outside of it are not included
+    changed = _git(['diff', '--name-only', '--no-renames', '--relative', '-z', base, '--'], cwd=root)
+    untracked = _git(['ls-files', '--others', '--exclude-standard', '-z'], cwd=root)
+    names = {name for name in (*changed.split('\0'), *untracked.split('\0')) if name}
+    return [root / name for name in sorted(names)]
+
+
+def _scan_file(path: str) -> List[str]:
+    """Returns the modules imported by the given file, relative imports are prefixed with their level of dots"""
+    try:
+        with open(path, 'rb') as file:
+            tree = ast.parse(file.read(), filename=path)
+    except (OSError, SyntaxError, ValueError):
+        return []
+
+    imports: Dict[str, None] = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.setdefault(alias.name, None)
+        elif isinstance(node, ast.ImportFrom):
+            module = '.' * node.level + (node.module or '')
+            imports.setdefault(module, None)
+            for alias in node.names:
+                if alias.name != '*':
+                    # the imported name could also be a submodule
+                    separator = '' if module.endswith('.') else '.'
+                    imports.setdefault(f'{module}{separator}{alias.name}', None)
+
+    return list(imports)
+
+
+def scan_imports(root: Path, paths: Sequence[Path]) -> Dict[str, List[str]]:
+    """Returns the imports of every given file.
+
+    Imports are cached in an index keyed by the size and mtime of each file, so only modified
+    files are parsed again. Files are parsed in parallel if there are many to parse.
+    """
+    from . import _cache, _utils
+    from ._result_cache import RACY_INTERVAL_NS
+
+    index_path = (
+        _utils.ROOT_CACHE_DIR / 'imports' / f'{hashlib.sha256(str(root).encode("utf-8")).hexdigest()[:16]}.json'
+    )
+    data = _cache.read_json(index_path)
+    index: Dict[str, Any] = {}
+    if isinstance(data, dict):
+        files = cast(Dict[str, Any], data).get('files')
+        if cast(Dict[str, Any], data).get('version') == INDEX_VERSION and isinstance(files, dict):
+            index = cast(Dict[str, Any], files)
+
+    imports: Dict[str, List[str]] = {}
+    stats: Dict[str, Tuple[int, int]] = {}
+    pending: List[str] = []
+    for path in paths:
+        key = str(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            continue
+
+        stats[key] = (stat.st_mtime_ns, stat.st_size)
+        entry = index.get(key)
+        if isinstance(entry, list) and len(cast(List[Any], entry)) == 3:
+            *stat_key, names = cast(List[Any], entry)
+            if tuple(stat_key) == stats[key] and isinstance(names, list):
+                imports[key] = [str(name) for name in cast(List[Any], names)]
+                continue
+
+        pending.append(key)
+
+    if pending:
+        log.debug('Scanning imports in %s files', len(pending))
+        imports.update(zip(pending, _scan_files(pending)))
+
+    now = time.time_ns()
+    new_index = {
+        key: [mtime, size, imports[key]] for key, (mtime, size) in stats.items() if now - mtime > RACY_INTERVAL_NS
+    }
+    if new_index != index:
+        _cache.write_json(index_path, {'version': INDEX_VERSION, 'files': new_index})
+
+    return imports
+
+
+def _scan_files(paths: List[str]) -> List[List[str]]:
+    from ._batch import get_cpu_count
+
+    workers = get_cpu_count()
+    if len(paths) > PARALLEL_THRESHOLD and workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(_scan_file, paths, chunksize=64))
+        except Exception:
+            log.debug('Could not scan imports in parallel', exc_info=True)
+
+    return [_scan_file(path) for path in paths]
+
+
+def get_module_names(path: Path, search_roots: Iterable[Path]) -> List[str]:
+    """Returns every name that the given file could be imported as"""
+    names: List[str] = []
+    for search_root in search_roots:
+        try:
+            parts = list(path.relative_to(search_root).with_suffix('').parts)
+        except ValueError:
+            continue
+
+        if parts and parts[-1] == '__init__':
+            parts.pop()
+
+        if parts:
+            names.append('.'.join(parts))
+
+    return names
+
+
+def _resolve(name: str, module: str, *, is_package: bool) -> Optional[str]:
+    """Resolves a possibly relative import from the given module to an absolute module name"""
+    level = len(name) - len(name.lstrip('.'))
+    if not level:
+        return name
+
+    parts = module.split('.')
+    if not is_package:
+        parts.pop()
+
+    if level > 1:
+        if level - 1 > len(parts):
+            return None
+        parts = parts[: len(parts) - (level - 1)]
+
+    rest = name[level:]
+    return '.'.join([*parts, rest] if rest else parts) or None
+
+
+def find_affected(
+    changed: Iterable[Path], sources: Sequence[Path], *, root: Path, config: Dict[str, Any]
+) -> List[Path]:
+    """Returns the changed source files and every source file that imports them, directly or transitively"""
+    search_roots = [root / 'src', root]
+    directories: List[Any] = [config.get('stubPath') or 'typings', *(config.get('extraPaths') or [])]
+    for directory in directories:
+        if isinstance(directory, str):
+            search_roots.insert(0, root / directory)
+
+    # maps module names to the files that import them
+    importers: Dict[str, List[str]] = {}
+    for path, imports in scan_imports(root, sources).items():
+        names = get_module_names(Path(path), search_roots)
+        is_package = Path(path).stem == '__init__'
+        for name in imports:
+            if name.startswith('.'):
+                resolved = {_resolve(name, module, is_package=is_package) for module in names}
+            else:
+                resolved = {name}
+
+            for module in resolved:
+                if module is None:
+                    continue
+
+                # importing a submodule also imports its parent packages
+                parts = module.split('.')
+                for index in range(1, len(parts) + 1):
+                    importers.setdefault('.'.join(parts[:index]), []).append(path)
+
+    source_keys = {str(path) for path in sources}
+    affected: Dict[str, None] = {}
+    queue: List[str] = []
+    for path in changed:
+        key = str(path)
+        if key in source_keys:
+            affected[key] = None
+        if path.suffix in ('.py', '.pyi'):
+            # deleted files are still looked up so that the files that imported them are checked
+            queue.extend(get_module_names(path, search_roots))
+
+    seen = set(queue)
+    while queue:
+        name = queue.pop()
+        for importer in importers.get(name, []):
+            if importer in affected:
+                continue
+
+            affected[importer] = None
+            for importer_name in get_module_names(Path(importer), search_roots):
+                if importer_name not in seen:
+                    seen.add(importer_name)
+                    queue.append(importer_name)
+
+    return [path for path in sources if str(path) in affected]
+
+
+def run(
+    args: Sequence[str], **kwargs: Any
+) -> Union[subprocess.CompletedProcess[bytes], subprocess.CompletedProcess[str]]:
+    """Run pyright on the files affected by changes since a git ref, this accepts the same arguments as `cli.run()`"""
+    from . import cli, _shard, errors, _config
+    from ._report import complete_empty, complete_process
+
+    try:
+        ref, args = pop_changed_since(args)
+    except errors.PyrightError as exc:
+        return complete_process(args, 4, b'', f'{exc.message}\n'.encode(), kwargs)
+
+    split = _shard.split_args(args)
+    if ref is None or split is None:
+        log.debug('Not filtering the pyright run as it contains unsupported options')
+        return cli.run(*args, **kwargs)
+
+    options, files = split
+    cwd = Path(kwargs.get('cwd') or os.getcwd()).absolute()
+    root = _shard.get_project_root(options, cwd)
+
+    try:
+        changed = get_changed_files(ref, root=root)
+    except errors.PyrightError as exc:
+        return complete_process(args, 4, b'', f'{exc.message}\n'.encode(), kwargs)
+
+    if any(
+        path.parent == root and path.name in (_config.CONFIG_FILENAME, _config.PYPROJECT_FILENAME) for path in changed
+    ):
+        log.debug('Checking every file as the configuration has changed')
+        return cli.run(*args, **kwargs)
+
+    config = _config.load_config(root)
+    sources = _config.find_sources(root, config)
+    candidates = {str(path) for path in _shard.find_files(options, files, cwd=cwd)}
+    affected = [path for path in find_affected(changed, sources, root=root, config=config) if str(path) in candidates]
+    log.debug('%s of %s files are affected by changes since %s', len(affected), len(candidates), ref)
+
+    if not affected:
+        return complete_empty(args, kwargs)
+
+    return cli.run(*options, *(str(path) for path in affected), **kwargs)
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import io
+import os
+import json
+import time
+import shutil
+import logging
+import tarfile
+import platform
+import tempfile
+from typing import Any, Dict, List, Tuple, Iterator, Optional, Sequence, cast
+from pathlib import Path, PurePosixPath
+
+from . import node, _cache, _store, _utils, errors
+from ._lock import FileLock
+from .utils import get_bin_dir
+from ._version import __version__
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_FORMAT = 1
+CHUNK_SIZE = 64 * 1024
+
+log: logging.Logger = logging.getLogger(__name__)
+
+
+def get_installed_versions() -> List[str]:
+    """Returns all of the pyright versions that are installed in the cache directory"""
+    versions: List[str] = []
+    if not _utils.ROOT_CACHE_DIR.exists():
+        return versions
+
+    for path in sorted(_utils.ROOT_CACHE_DIR.iterdir()):
+        if path.name.startswith('.') or not path.is_dir():
+            continue
+
+        if node.get_pkg_version(path / 'node_modules' / 'pyright' / 'package.json') == path.name:
+            versions.append(path.name)
+
+    return versions
+
+
+def export_cache(archive: Path, *, versions: Optional[Sequence[str]] = None, nodeenv: bool = True) -> Dict[str, Any]:
+    """Pack the nodeenv and the given pyright versions into a single gzip compressed tarball.
+
+    The first member of the archive is a manifest that records the checksum of every file so
+    that the archive can be verified when it is imported.
+
+    Returns the manifest.
+    """
+    installed = get_installed_versions()
+    if versions is None:
+        versions = installed
+    else:
+        missing = sorted(set(versions) - set(installed))
+        if missing:
+            raise errors.ArchiveError(f'The following versions are not installed: {", ".join(missing)}')
+
+    roots: Dict[str, Path] = {}
+    entries: List[Dict[str, Any]] = []
+
+    env_dir = node._get_env_dir()
+    if nodeenv and _get_nodeenv_binary(env_dir).exists():
+        roots['nodeenv'] = env_dir
+        entries.append({'type': 'nodeenv', 'path': 'nodeenv', **_describe_tree(env_dir)})
+
+    for version in versions:
+        path = f'versions/{version}'
+        roots[path] = _utils.ROOT_CACHE_DIR / version
+        entries.append({'type': 'version', 'version': version, 'path': path, **_describe_tree(roots[path])})
+
+    manifest: Dict[str, Any] = {
+        'format': MANIFEST_FORMAT,
+        'pyright_python': __version__,
+        'platform': _get_platform(),
+        'created_at': time.time(),
+        'entries': entries,
+    }
+
+    archive.parent.mkdir(parents=True, exist_ok=True)
+    with tarfile.open(str(archive), mode='w:gz') as tar:
+        data = json.dumps(manifest, indent=2).encode('utf-8')
+        info = tarfile.TarInfo(MANIFEST_NAME)
+        info.size = len(data)
+        info.mtime = int(manifest['created_at'])
+        tar.addfile(info, io.BytesIO(data))
+
+        for entry in entries:
+            root = roots[entry['path']]
+            for name in (*entry['files'], *entry['symlinks']):
+                tar.add(str(root / name), arcname=f'{entry["path"]}/{name}', recursive=False)
+
+    log.debug('Exported %s entries to %s', len(entries), archive)
+    return manifest
+
+
+def import_cache(archive: Path) -> Dict[str, List[str]]:
+    """Unpack an archive created by `export_cache()` into the cache directories.
+
+    Entries that are already present are skipped, every other entry is extracted to a temporary
+    directory, verified against the manifest checksums and then moved into place.
+
+    Returns the paths of the entries that were imported, skipped and that are incompatible with this platform.
+    """
+    result: Dict[str, List[str]] = {'imported': [], 'skipped': [], 'incompatible': []}
+
+    try:
+        tar = tarfile.open(str(archive), mode='r:*')
+    except (OSError, tarfile.TarError) as exc:
+        raise errors.ArchiveError(f'Could not open archive {archive}: {exc}') from exc
+
+    with tar:
+        members = iter(tar)
+        manifest = _read_manifest(tar, next(members, None))
+
+        pending: Dict[str, Dict[str, Any]] = {}
+        for entry in manifest['entries']:
+            if _is_present(entry):
+                log.debug('Skipping %s as it is already present', entry['path'])
+                result['skipped'].append(entry['path'])
+            elif entry['type'] == 'nodeenv' and manifest['platform'] != _get_platform():
+                log.debug('Skipping nodeenv built for %s', manifest['platform'])
+                result['incompatible'].append(entry['path'])
+            else:
+                _check_replaceable(entry)
+                pending[entry['path']] = entry
+
+        staging: Dict[str, Path] = {}
+        try:
+            for member in members:
+                entry_path, name = _split_member(member.name)
+                entry = pending.get(entry_path)
+                if entry is None:
+                    continue
+
+                if entry_path not in staging:
+                    target = _get_target(entry)
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    staging[entry_path] = Path(
+                        tempfile.mkdtemp(dir=str(target.parent), prefix=f'.{target.name}.', suffix='.tmp')
+                    )
+
+                _extract_member(tar, member, staging[entry_path], name)
+
+            for entry_path, entry in pending.items():
+                tmp_dir = staging.get(entry_path)
+                if tmp_dir is None:
+                    raise errors.ArchiveError(f'The archive does not contain any files for {entry_path}')
+
+                _verify(entry, tmp_dir)
+
+                if entry['type'] == 'version':
+                    with _store.use() as store:
+                        if store is not None:
+                            hashes = {name: info['sha256'] for name, info in entry['files'].items()}
+                            store.dedupe(tmp_dir, hashes=hashes)
+
+                _move_into_place(entry, tmp_dir)
+                result['imported'].append(entry_path)
+        finally:
+            for tmp_dir in staging.values():
+                if tmp_dir.exists():
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return result
+
+
+def _get_platform() -> str:
+    return f'{platform.system().lower()}-{platform.machine().lower()}'
+
+
+def _get_nodeenv_binary(env_dir: Path) -> Path:
+    return get_bin_dir(env_dir=env_dir) / ('node.exe' if node._is_windows() else 'node')
+
+
+def _walk(root: Path) -> Iterator[Path]:
+    for dirpath, dirnames, filenames in os.walk(str(root)):
+        dirnames.sort()
+        for name in sorted(filenames + [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]):
+            yield Path(dirpath, name)
+
+
+def _describe_tree(root: Path) -> Dict[str, Any]:
+    files: Dict[str, Dict[str, Any]] = {}
+    symlinks: Dict[str, str] = {}
+    for path in _walk(root):
+        name = path.relative_to(root).as_posix()
+        if path.is_symlink():
+            symlinks[name] = os.readlink(str(path))
+        elif path.is_file():
+            files[name] = {'sha256': _cache.hash_file(path), 'size': path.stat().st_size}
+
+    return {'files': files, 'symlinks': symlinks}
+
+
+def _read_manifest(tar: tarfile.TarFile, member: Optional[tarfile.TarInfo]) -> Dict[str, Any]:
+    if member is None or member.name != MANIFEST_NAME:
+        raise errors.ArchiveError(f'Expected the first member of the archive to be {MANIFEST_NAME}')
+
+    f = tar.extractfile(member)
+    assert f is not None
+    with f:
+        manifest = cast(Dict[str, Any], json.loads(f.read()))
+
+    if manifest.get('format') != MANIFEST_FORMAT:
+        raise errors.ArchiveError(f'Unsupported archive format: {manifest.get("format")}')
+
+    return manifest
+
+
+def _split_member(name: str) -> Tuple[str, str]:
+    parts = PurePosixPath(name).parts
+    if name.startswith('/') or '..' in parts:
+        raise errors.ArchiveError(f'Refusing to extract unsafe archive member: {name}')
+
+    if parts[:1] == ('nodeenv',):
+        return 'nodeenv', '/'.join(parts[1:])
+
+    if parts[:1] == ('versions',) and len(parts) > 2:
+        return f'versions/{parts[1]}', '/'.join(parts[2:])
+
+    raise errors.ArchiveError(f'Unexpected archive member: {name}')
+
+
+def _get_target(entry: Dict[str, Any]) -> Path:
+    if entry['type'] == 'nodeenv':
+        return node._get_env_dir()
+
+    version = entry['version']
+    if not isinstance(version, str) or '/' in version or '\\' in version or version.startswith('.'):
+        raise errors.ArchiveError(f'Invalid version in archive manifest: {version}')
+
+    return _utils.ROOT_CACHE_DIR / version
+
+
+def _is_present(entry: Dict[str, Any]) -> bool:
+    if entry['type'] == 'nodeenv':
+        return _get_nodeenv_binary(node._get_env_dir()).exists()
+
+    version = entry['version']
+    return node.get_pkg_version(_get_target(entry) / 'node_modules' / 'pyright' / 'package.json') == version
+
+
+def _is_within(path: str, root: str) -> bool:
+    return os.path.commonpath([path, root]) == root
+
+
+def _filter_member(member: tarfile.TarInfo, root: Path, name: str) -> tarfile.TarInfo:
+    """Raises an error if extracting the member would write or link outside of `root`.
+
+    Paths are resolved with `os.path.realpath()` so that symlinks extracted by earlier members are
+    followed, e.g. `d/l -> ..` followed by `d/m -> l/..` would otherwise escape the directory.
+    """
+    real_root = os.path.realpath(str(root))
+    target = os.path.realpath(os.path.join(real_root, *PurePosixPath(name).parts))
+    if not _is_within(target, real_root):
+        raise errors.ArchiveError(f'Refusing to extract archive member outside of the archive: {member.name}')
+
+    if member.issym():
+        link = os.path.realpath(os.path.join(os.path.dirname(target), member.linkname))
+        if os.path.isabs(member.linkname) or not _is_within(link, real_root):
+            raise errors.ArchiveError(f'Refusing to extract symlink pointing outside of the archive: {member.name}')
+
+    data_filter = getattr(tarfile, 'data_filter', None)
+    if data_filter is None:
+        return member
+
+    # hard links refer to the full member name, which includes the entry path
+    linkname = _split_member(member.linkname)[1] if member.islnk() else member.linkname
+    try:
+        return cast(tarfile.TarInfo, data_filter(member.replace(name=name, linkname=linkname), real_root))
+    except tarfile.FilterError as exc:
+        raise errors.ArchiveError(f'Refusing to extract unsafe archive member {member.name}: {exc}') from exc
+
+
+def _extract_member(tar: tarfile.TarFile, member: tarfile.TarInfo, root: Path, name: str) -> None:
+    path = root.joinpath(*PurePosixPath(name).parts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    filtered = _filter_member(member, root, name)
+
+    if member.issym():
+        os.symlink(member.linkname, str(path))
+    elif member.isfile() or member.islnk():
+        source = tar.extractfile(member)
+        if source is None:
+            raise errors.ArchiveError(f'Could not read archive member: {member.name}')
+
+        with source, path.open('wb') as f:
+            shutil.copyfileobj(source, f, CHUNK_SIZE)
+
+        path.chmod(filtered.mode & 0o777)
+
+
+def _verify(entry: Dict[str, Any], root: Path) -> None:
+    actual = _describe_tree(root)
+    if actual['symlinks'] != entry['symlinks']:
+        raise errors.ArchiveError(f'Symlinks for {entry["path"]} do not match the manifest')
+
+    if set(actual['files']) != set(entry['files']):
+        raise errors.ArchiveError(f'Files for {entry["path"]} do not match the manifest')
+
+    for name, info in entry['files'].items():
+        if actual['files'][name] != info:
+            raise errors.ArchiveError(f'Checksum mismatch for {entry["path"]}/{name}')
+
+
+def _check_replaceable(entry: Dict[str, Any]) -> None:
+    """Raises an error if importing the entry would replace a directory that is not managed by Pyright for Python.
+
+    An existing directory without a usable install is replaced, but this is only done inside of the cache
+    directory, e.g. `PYRIGHT_PYTHON_ENV_DIR` may point to an environment that is managed by the user.
+    """
+    target = _get_target(entry)
+    if target.exists() and not _is_within(os.path.realpath(str(target)), os.path.realpath(str(_utils.ROOT_CACHE_DIR))):
+        raise errors.ArchiveError(
+            f'Refusing to replace {target} with {entry["path"]} from the archive as it is outside of the cache directory'
+        )
+
+
+def _move_into_place(entry: Dict[str, Any], tmp_dir: Path) -> None:
+    target = _get_target(entry)
+    lock_path = _utils.get_lock_path(entry['version'] if entry['type'] == 'version' else 'nodeenv')
+
+    with FileLock(lock_path):
+        if _is_present(entry):
+            return
+
+        if target.exists():
+            _check_replaceable(entry)
+
+            # partial or corrupted entry, directories cannot be atomically replaced
+            old = tmp_dir.with_name(f'{tmp_dir.name}.old.tmp')
+            target.rename(old)
+            shutil.rmtree(old, ignore_errors=True)
+
+        tmp_dir.rename(target)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+import logging
+import subprocess
+from typing import Tuple, Mapping, Iterable, Optional
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from . import node, _config
+from .utils import env_to_int
+from .results import BatchResult, ProjectResult, parse_output
+
+log: logging.Logger = logging.getLogger(__name__)
+
+# a rough upper bound for the memory used by a single pyright process on a large project
+MEMORY_PER_PROCESS = 1024 * 1024 * 1024
+
+
+def get_default_jobs() -> int:
+    """Returns the number of pyright processes that can run in parallel on this machine.
+
+    This is bounded by the CPUs that this process can run on and the available memory, it can be
+    overridden by setting `PYRIGHT_PYTHON_JOBS`.
+    """
+    jobs = env_to_int('PYRIGHT_PYTHON_JOBS', default=0)
+    if jobs > 0:
+        return jobs
+
+    jobs = get_cpu_count()
+    memory = _get_available_memory()
+    if memory is not None:
+        jobs = min(jobs, memory // MEMORY_PER_PROCESS)
+
+    return max(jobs, 1)
+
+
+def get_cpu_count() -> int:
+    """Returns the number of CPUs that this process can run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _get_available_memory() -> Optional[int]:
+    try:
+        with open('/proc/meminfo', encoding='utf-8') as file:
+            for line in file:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def run(
+    paths: Iterable[Path],
+    *,
+    args: Tuple[str, ...] = (),
+    jobs: Optional[int] = None,
+    env: Optional[Mapping[str, str]] = None,
+) -> BatchResult:
+    started = time.perf_counter()
+    projects = _config.find_projects(paths)
+    if not projects:
+        return BatchResult([], time_in_sec=0)
+
+    # pyright is resolved once and shared between every project
+    from .cli import _get_script
+
+    command = node.get_command('node', str(_get_script(args)), '--outputjson', *args, env=env)
+    jobs = min(jobs or get_default_jobs(), len(projects))
+    log.debug('Checking %s projects with %s jobs', len(projects), jobs)
+
+    # the largest projects are started first so that they are not left running on their own at the end
+    scheduled = sorted(projects, key=lambda project: project[1], reverse=True)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {root: executor.submit(_check, command, root) for root, _ in scheduled}
+        results = [futures[root].result() for root, _ in projects]
+
+    return BatchResult(results, time_in_sec=round(time.perf_counter() - started, 3))
+
+
+def _check(command: node.Command, root: Path) -> ProjectResult:
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [*command.args, '--project', str(root)],
+        cwd=root,
+        env=command.env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    duration = round(time.perf_counter() - started, 3)
+    log.debug('Checked %s in %ss', root, duration)
+
+    try:
+        result = parse_output(proc.stdout, returncode=proc.returncode)
+    except ValueError:
+        output = (proc.stderr or proc.stdout).decode('utf-8', errors='replace').strip()
+        return ProjectResult(
+            str(root),
+            result=None,
+            returncode=proc.returncode,
+            time_in_sec=duration,
+            error=output or f'pyright exited with code {proc.returncode}',
+        )
+
+    return ProjectResult(str(root), result=result, returncode=proc.returncode, time_in_sec=duration)
+
+
+def print_report(result: BatchResult) -> None:
+    """Prints the batch result in a format similar to the pyright CLI"""
+    from ._report import format_summary, format_diagnostics
+
+    for line in format_diagnostics(result.diagnostics):
+        print(line)
+
+    for project in result.projects:
+        if project.result is None:
+            print(f'{project.root}: failed with code {project.returncode} ({project.time_in_sec}s)')
+            print(f'  {project.error}', file=sys.stderr)
+        else:
+            print(f'{project.root}: {format_summary(project.result.summary)}({project.time_in_sec}s)')
+
+    print(f'{len(result.projects)} projects, {format_summary(result.summary)}({result.time_in_sec}s)')
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import os
+import json
+import logging
+from typing import Any
+from pathlib import Path
+
+log: logging.Logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def read_json(path: Path) -> Any:
+    """Read and parse the given JSON cache file.
+
+    Returns `None` if the file does not exist or could not be parsed for any reason,
+    callers should treat this the same as a cache miss.
+    """
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+    except Exception:
+        log.debug('Ignoring error while reading cache file %s', path, exc_info=True)
+        return None
+
+
+def write_json(path: Path, data: Any) -> None:
+    """Atomically write the given data to a JSON cache file.
+
+    The data is written to a temporary file in the same directory first and then moved
+    into place so that concurrent readers never observe a partially written file.
+
+    Errors are logged and ignored as failing to write to the cache should never be fatal.
+    """
+    import tempfile
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f'.{path.name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except Exception:
+        log.debug('Ignoring error while writing cache file %s', path, exc_info=True)
+
+
+def hash_file(path: Path) -> str:
+    """Returns the hex encoded SHA-256 digest of the given file's contents"""
+    import hashlib
+
+    hasher = hashlib.sha256()
+    with path.open('rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
@@ -0,0 +1,143 @@
+"""A minimal HTTP server that can be used as a remote result cache, see `pyright-python-tools cache serve`.
+
+Entries are stored as files in a directory, `PUT /<key>` stores the request body and `GET /<key>`
+returns it. This is intended as a reference implementation for local use and tests, it does not
+implement authentication or eviction, use a dedicated cache server when sharing results in CI.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import logging
+import tempfile
+from typing import Any, Tuple, Optional, cast
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+log: logging.Logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+DEFAULT_MAX_SIZE = 10 * 1024 * 1024
+
+# keys can contain multiple path segments so that the cache URL can include a prefix
+KEY_RE = re.compile(r'[A-Za-z0-9_-][A-Za-z0-9._-]*(/[A-Za-z0-9_-][A-Za-z0-9._-]*)*')
+
+
+def get_default_directory() -> Path:
+    from . import _utils
+
+    return _utils.ROOT_CACHE_DIR / 'server'
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    @property
+    def cache_server(self) -> CacheServer:
+        return cast(CacheServer, self.server)
+
+    def do_GET(self) -> None:
+        self._send_entry(head=False)
+
+    def do_HEAD(self) -> None:
+        self._send_entry(head=True)
+
+    def do_PUT(self) -> None:
+        path = self._get_path()
+        if path is None:
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.send_error(411)
+            return
+
+        if length < 0 or length > self.cache_server.max_size:
+            self.send_error(413)
+            return
+
+        body = self.rfile.read(length)
+        if len(body) != length:
+            self.send_error(400, 'Incomplete request body')
+            return
+
+        try:
+            _write(path, body)
+        except OSError as exc:
+            log.debug('Could not store %s', path, exc_info=True)
+            self.send_error(500, f'Could not store the entry: {exc.strerror}')
+            return
+
+        self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _send_entry(self, *, head: bool) -> None:
+        path = self._get_path()
+        if path is None:
+            return
+
+        try:
+            body = path.read_bytes()
+        except OSError:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _get_path(self) -> Optional[Path]:
+        key = self.path.split('?', 1)[0].lstrip('/')
+        if not KEY_RE.fullmatch(key):
+            self.send_error(400, 'Invalid cache key')
+            return None
+
+        return self.cache_server.directory.joinpath(*key.split('/'))
+
+    def log_message(self, format: str, *args: Any) -> None:
+        log.debug('%s - %s', self.address_string(), format % args)
+
+
+def _write(path: Path, body: bytes) -> None:
+    # entries are written atomically so that concurrent readers never receive a partial entry
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(body)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class CacheServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], *, directory: Path, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        super().__init__(address, CacheRequestHandler)
+        self.directory = directory
+        self.max_size = max_size
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def create_server(
+    *,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    directory: Optional[Path] = None,
+    max_size: int = DEFAULT_MAX_SIZE,
+) -> CacheServer:
+    """Create a cache server storing entries in the given directory, pass `port=0` to use any free port"""
+    directory = get_default_directory() if directory is None else directory
+    directory.mkdir(parents=True, exist_ok=True)
+    return CacheServer((host, port), directory=directory, max_size=max_size)
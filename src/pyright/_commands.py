@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import sys
+import argparse
+from typing import List, NoReturn, Optional
+from pathlib import Path
+
+from . import cli, errors
+
+
+def entrypoint() -> NoReturn:
+    """Entrypoint for the `pyright-python-tools` command.
+
+    This supports commands that are specific to Pyright for Python, e.g. `pyright-python-tools cache refresh`.
+    These are kept out of the `pyright-python` command so that they can never be confused with paths to check.
+    """
+    sys.exit(main(sys.argv[1:]))
+
+
+def main(args: List[str]) -> int:
+    parser = _create_parser()
+    namespace = parser.parse_args(args)
+    return namespace.func(namespace)
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='pyright-python-tools')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    cache = commands.add_parser('cache', help='manage the Pyright for Python cache')
+    cache_commands = cache.add_subparsers(dest='cache_command', metavar='command')
+    cache_commands.required = True
+
+    refresh = cache_commands.add_parser(
+        'refresh',
+        help='re-resolve the latest pyright and Pyright for Python versions, ignoring any cached results',
+    )
+    refresh.set_defaults(func=_cache_refresh)
+
+    export = cache_commands.add_parser(
+        'export',
+        help='pack the nodeenv and installed pyright versions into an archive that can be imported elsewhere',
+    )
+    export.add_argument('archive', type=Path, help='the path to write the archive to, e.g. pyright-cache.tar.gz')
+    export.add_argument(
+        '--version',
+        action='append',
+        dest='versions',
+        metavar='VERSION',
+        help='the pyright version to export, can be passed multiple times, defaults to every installed version',
+    )
+    export.add_argument('--no-nodeenv', action='store_true', help='do not include the nodeenv in the archive')
+    export.set_defaults(func=_cache_export)
+
+    prune = cache_commands.add_parser('prune', help='remove the least recently used pyright versions from the cache')
+    prune.add_argument(
+        '--max-size',
+        help='remove versions until the cache is at most this size, e.g. 500M, defaults to PYRIGHT_PYTHON_CACHE_MAX_SIZE',
+    )
+    prune.add_argument(
+        '--max-age',
+        help='remove versions that have not been used for this long, e.g. 30d, defaults to PYRIGHT_PYTHON_CACHE_MAX_AGE',
+    )
+    prune.add_argument('--dry-run', action='store_true', help='only print the versions that would be removed')
+    prune.set_defaults(func=_cache_prune)
+
+    import_ = cache_commands.add_parser(
+        'import', help='unpack an archive created by `pyright-python-tools cache export`'
+    )
+    import_.add_argument('archive', type=Path)
+    import_.set_defaults(func=_cache_import)
+
+    serve = cache_commands.add_parser(
+        'serve',
+        help='run a minimal HTTP server that can be used as PYRIGHT_PYTHON_REMOTE_CACHE_URL',
+    )
+    serve.add_argument('--host', default='127.0.0.1', help='the address to listen on, defaults to 127.0.0.1')
+    serve.add_argument('--port', type=int, default=8080, help='the port to listen on, defaults to 8080')
+    serve.add_argument(
+        '--directory',
+        type=Path,
+        help='the directory to store results in, defaults to a directory in the Pyright for Python cache',
+    )
+    serve.add_argument('--max-size', default='10M', help='the maximum size of a single result, defaults to 10M')
+    serve.set_defaults(func=_cache_serve)
+
+    batch = commands.add_parser(
+        'batch',
+        help='check every pyright project under the given paths in parallel',
+        description='Check every directory with a pyrightconfig.json file or a pyproject.toml file with a '
+        + '[tool.pyright] section, the largest projects are checked first.',
+    )
+    batch.add_argument('paths', nargs='*', default=['.'], help='the directories to search for projects in')
+    batch.add_argument(
+        '--jobs',
+        '-j',
+        type=int,
+        help='the maximum number of pyright processes to run at the same time, defaults to the number of CPUs',
+    )
+    batch.add_argument(
+        '--outputjson', action='store_true', help='output an aggregated report in the same format as pyright'
+    )
+    batch.set_defaults(func=_run_batch)
+
+    merge = commands.add_parser(
+        'merge',
+        help='combine the --outputjson results of separate pyright runs, e.g. from --shard',
+    )
+    merge.add_argument('files', nargs='+', type=Path, help='the JSON files to merge, e.g. shard-*.json')
+    merge.add_argument('--outputjson', action='store_true', help='output the merged results as JSON')
+    merge.set_defaults(func=_merge)
+
+    return parser
+
+
+def _cache_refresh(_: argparse.Namespace) -> int:
+    from .utils import refresh_latest_version
+    from ._utils import get_latest_pyright_version
+
+    try:
+        pyright_version = get_latest_pyright_version(refresh=True)
+    except errors.PyrightError as exc:
+        print(f'error: {exc.message}', file=sys.stderr)
+        return 1
+
+    print(f'latest pyright version: {pyright_version}')
+
+    python_version: Optional[str] = refresh_latest_version()
+    print(f'latest pyright-python version: {python_version or "unknown"}')
+    return 0
+
+
+def _cache_export(namespace: argparse.Namespace) -> int:
+    from ._archive import export_cache
+
+    try:
+        manifest = export_cache(namespace.archive, versions=namespace.versions, nodeenv=not namespace.no_nodeenv)
+    except errors.PyrightError as exc:
+        print(f'error: {exc.message}', file=sys.stderr)
+        return 1
+
+    for entry in manifest['entries']:
+        print(f'exported {entry["path"]}')
+
+    print(f'wrote {namespace.archive}')
+    return 0
+
+
+def _cache_import(namespace: argparse.Namespace) -> int:
+    from ._archive import import_cache
+
+    try:
+        result = import_cache(namespace.archive)
+    except errors.PyrightError as exc:
+        print(f'error: {exc.message}', file=sys.stderr)
+        return 1
+
+    for path in result['imported']:
+        print(f'imported {path}')
+
+    for path in result['skipped']:
+        print(f'skipped {path}, already present')
+
+    for path in result['incompatible']:
+        print(f'skipped {path}, built for a different platform')
+
+    return 0
+
+
+def _cache_serve(namespace: argparse.Namespace) -> int:
+    from . import _gc, _cache_server
+
+    try:
+        max_size = _gc.parse_size(namespace.max_size)
+    except ValueError as exc:
+        print(f'error: {exc}', file=sys.stderr)
+        return 1
+
+    try:
+        server = _cache_server.create_server(
+            host=namespace.host,
+            port=namespace.port,
+            directory=namespace.directory,
+            max_size=max_size,
+        )
+    except OSError as exc:
+        print(f'error: could not start the cache server: {exc.strerror}', file=sys.stderr)
+        return 1
+
+    print(f'serving {server.directory} on {server.url}', flush=True)
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    return 0
+
+
+def _cache_prune(namespace: argparse.Namespace) -> int:
+    from . import _gc
+
+    try:
+        max_size = _gc.get_max_size() if namespace.max_size is None else _gc.parse_size(namespace.max_size)
+        max_age = _gc.get_max_age() if namespace.max_age is None else _gc.parse_duration(namespace.max_age)
+    except ValueError as exc:
+        print(f'error: {exc}', file=sys.stderr)
+        return 1
+
+    if max_size is None and max_age is None:
+        print('error: one of --max-size or --max-age is required', file=sys.stderr)
+        return 1
+
+    result = _gc.prune(max_size=max_size, max_age=max_age, dry_run=namespace.dry_run)
+    action = 'would remove' if namespace.dry_run else 'removed'
+    for entry in result.removed:
+        print(f'{action} {entry.version} ({_gc.format_size(entry.size)})')
+
+    for entry in result.skipped:
+        print(f'skipped {entry.version}, in use')
+
+    print(f'{"would reclaim" if namespace.dry_run else "reclaimed"} {_gc.format_size(result.reclaimed)}')
+    return 0
+
+
+def _run_batch(namespace: argparse.Namespace) -> int:
+    import json
+
+    from . import _batch
+
+    if namespace.jobs is not None and namespace.jobs < 1:
+        print('error: --jobs must be at least 1', file=sys.stderr)
+        return 1
+
+    try:
+        result = cli.batch(namespace.paths, jobs=namespace.jobs)
+    except errors.PyrightError as exc:
+        print(f'error: {exc.message}', file=sys.stderr)
+        return 1
+
+    if not result.projects:
+        print('error: no pyright projects found', file=sys.stderr)
+        return 1
+
+    if namespace.outputjson:
+        print(json.dumps(result.to_json(), indent=2))
+    else:
+        _batch.print_report(result)
+
+    return result.returncode
+
+
+def _merge(namespace: argparse.Namespace) -> int:
+    import glob
+
+    from ._report import format_result
+    from .results import CheckResult, parse_output, merge_results
+
+    paths: List[Path] = []
+    for path in namespace.files:
+        # shells on Windows do not expand wildcards
+        matches = sorted(glob.glob(str(path)))
+        if matches and not path.exists():
+            paths.extend(Path(match) for match in matches)
+        else:
+            paths.append(path)
+
+    results: List[CheckResult] = []
+    for path in paths:
+        try:
+            result = parse_output(path.read_bytes())
+        except OSError as exc:
+            print(f'error: could not read {path}: {exc.strerror}', file=sys.stderr)
+            return 1
+        except ValueError:
+            print(f'error: {path} does not contain the output of pyright --outputjson', file=sys.stderr)
+            return 1
+
+        # the exit code is not included in the output
+        result.returncode = 1 if result.summary.error_count else 0
+        results.append(result)
+
+    merged = merge_results(results)
+    sys.stdout.write(format_result(merged, output_json=namespace.outputjson))
+    return merged.returncode
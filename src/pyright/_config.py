@@ -0,0 +1,408 @@
+"""Helpers for reading pyright configuration files.
+
+Parsing `pyproject.toml` requires `tomllib`, which was added in Python 3.11, or the `tomli` package.
+If neither are available then project roots are still detected but the configuration is not loaded.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+import json
+import logging
+import contextlib
+from typing import Any, Dict, List, Tuple, Pattern, Iterable, Optional, Sequence, Generator, cast
+from pathlib import Path
+
+log: logging.Logger = logging.getLogger(__name__)
+
+CONFIG_FILENAME = 'pyrightconfig.json'
+PYPROJECT_FILENAME = 'pyproject.toml'
+SOURCE_SUFFIXES = ('.py', '.pyi')
+
+# directories that never contain projects or source files that should be checked
+IGNORED_DIRS = {'node_modules', '__pycache__', 'site-packages'}
+
+# pyright excludes these if the configuration does not specify `exclude`
+DEFAULT_EXCLUDES = ('**/node_modules', '**/__pycache__', '**/.*')
+PYPROJECT_SECTION_RE = re.compile(r'^\s*\[\s*tool\s*\.\s*pyright\s*[\].]', re.MULTILINE)
+
+
+def _load_toml(path: Path) -> Optional[Dict[str, Any]]:
+    if sys.version_info >= (3, 11):
+        import tomllib
+    else:
+        import importlib
+
+        # tomli is an optional dependency so it is imported dynamically, it may not be installed when type checking
+        try:
+            tomllib = importlib.import_module('tomli')
+        except ImportError:
+            log.debug('Cannot parse %s as neither tomllib or tomli are available', path)
+            return None
+
+    try:
+        with path.open('rb') as file:
+            return tomllib.load(file)
+    except (OSError, ValueError) as exc:
+        log.debug('Could not parse %s: %s', path, exc)
+        return None
+
+
+def has_pyproject_config(path: Path) -> bool:
+    """Returns whether or not the given `pyproject.toml` file contains a `[tool.pyright]` section"""
+    try:
+        content = path.read_text('utf-8')
+    except (OSError, UnicodeDecodeError):
+        return False
+
+    return PYPROJECT_SECTION_RE.search(content) is not None
+
+
+def is_project_root(directory: Path) -> bool:
+    if directory.joinpath(CONFIG_FILENAME).is_file():
+        return True
+
+    return has_pyproject_config(directory / PYPROJECT_FILENAME)
+
+
+def load_config(root: Path) -> Dict[str, Any]:
+    """Returns the pyright configuration for the given project root.
+
+    `pyrightconfig.json` takes precedence over `pyproject.toml`, which matches pyright itself.
+    An empty dictionary is returned if the configuration could not be loaded.
+    """
+    config_path = root / CONFIG_FILENAME
+    if config_path.is_file():
+        return load_config_file(config_path)
+
+    return load_config_file(root / PYPROJECT_FILENAME)
+
+
+def load_config_file(path: Path) -> Dict[str, Any]:
+    """Returns the pyright configuration from the given JSON or `pyproject.toml` file, e.g. from `--project`"""
+    if path.name == PYPROJECT_FILENAME:
+        data = _load_toml(path)
+        if data is None:
+            return {}
+
+        config = data.get('tool', {}).get('pyright', {})
+        return cast(Dict[str, Any], config) if isinstance(config, dict) else {}
+
+    try:
+        data = json.loads(_strip_json_comments(path.read_text('utf-8')))
+    except (OSError, ValueError) as exc:
+        log.debug('Could not parse %s: %s', path, exc)
+        return {}
+
+    return cast(Dict[str, Any], data) if isinstance(data, dict) else {}
+
+
+def has_toml_parser() -> bool:
+    if sys.version_info >= (3, 11):
+        return True
+
+    import importlib.util
+
+    return importlib.util.find_spec('tomli') is not None
+
+
+def _strip_json_comments(content: str) -> str:
+    # pyright allows comments in its JSON configuration file
+    return re.sub(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/', lambda m: m.group(1) or '', content, flags=re.DOTALL)
+
+
+def is_ignored_dir(name: str) -> bool:
+    return name.startswith('.') or name in IGNORED_DIRS
+
+
+def find_projects(paths: Iterable[Path]) -> List[Tuple[Path, int]]:
+    """Returns every pyright project root under the given paths along with the total size of its source files.
+
+    Source files are attributed to the closest project root that contains them, virtual environments
+    and hidden directories are skipped.
+    """
+    sizes: Dict[Path, int] = {}
+    for path in paths:
+        owners: Dict[str, Optional[Path]] = {}
+        for dirpath, dirnames, filenames in os.walk(os.path.abspath(path)):
+            directory = Path(dirpath)
+            owner = directory if is_project_root(directory) else owners.get(dirpath)
+            if owner is not None:
+                sizes.setdefault(owner, 0)
+                for name in filenames:
+                    if name.endswith(SOURCE_SUFFIXES):
+                        try:
+                            sizes[owner] += os.stat(os.path.join(dirpath, name)).st_size
+                        except OSError:
+                            pass
+
+            dirnames[:] = [
+                name
+                for name in dirnames
+                if not is_ignored_dir(name) and not os.path.exists(os.path.join(dirpath, name, 'pyvenv.cfg'))
+            ]
+            for name in dirnames:
+                owners[os.path.join(dirpath, name)] = owner
+
+    return sorted(sizes.items())
+
+
+def find_project_root(directory: Path) -> Path:
+    """Returns the closest project root that contains the given directory or the directory itself if there isn't one"""
+    directory = directory.absolute()
+    for parent in (directory, *directory.parents):
+        if is_project_root(parent):
+            return parent
+
+    return directory
+
+
+def compile_glob(pattern: str, root: Path) -> Pattern[str]:
+    """Compile a pyright include or exclude pattern into a regex that matches paths relative to the given root.
+
+    Patterns support `**`, `*` and `?` wildcards, a pattern that matches a directory also matches everything in it.
+    """
+    pattern = pattern.replace('\\', '/')
+    if os.path.isabs(pattern):
+        pattern = os.path.relpath(pattern, root).replace(os.sep, '/')
+
+    regex = ''
+    for segment in pattern.split('/'):
+        if segment in ('', '.'):
+            continue
+        if segment == '**':
+            regex += '(?:[^/]*/)*'
+            continue
+
+        for char in segment:
+            if char == '*':
+                regex += '[^/]*'
+            elif char == '?':
+                regex += '[^/]'
+            else:
+                regex += re.escape(char)
+        regex += '/'
+
+    return re.compile(f'^{regex.rstrip("/")}(?:/.*)?$' if regex else '^.*$')
+
+
+def get_static_prefix(pattern: str) -> str:
+    """Returns the leading directories of a pattern that do not contain any wildcards"""
+    segments: List[str] = []
+    for segment in pattern.replace('\\', '/').split('/'):
+        if '*' in segment or '?' in segment:
+            break
+        segments.append(segment)
+
+    return '/'.join(segments)
+
+
+def find_sources(root: Path, config: Dict[str, Any]) -> List[Path]:
+    """Returns the source files that pyright would check for the given project configuration"""
+    includes = config.get('include') or ['.']
+    excludes = config.get('exclude') or list(DEFAULT_EXCLUDES)
+    include_patterns = [compile_glob(pattern, root) for pattern in includes]
+    exclude_patterns = [compile_glob(pattern, root) for pattern in excludes]
+
+    def is_excluded(relative: str) -> bool:
+        return any(pattern.match(relative) for pattern in exclude_patterns)
+
+    def is_included(relative: str) -> bool:
+        return any(pattern.match(relative) for pattern in include_patterns)
+
+    sources: Dict[Path, None] = {}
+    for pattern in includes:
+        base = root / get_static_prefix(pattern)
+        if base.is_file():
+            if not is_excluded(_relative(base, root)):
+                sources[base] = None
+            continue
+
+        for dirpath, dirnames, filenames in os.walk(base):
+            directory = Path(dirpath)
+            dirnames[:] = sorted(
+                name
+                for name in dirnames
+                if not is_excluded(_relative(directory / name, root))
+                and not os.path.exists(os.path.join(dirpath, name, 'pyvenv.cfg'))
+            )
+            for name in sorted(filenames):
+                if not name.endswith(SOURCE_SUFFIXES):
+                    continue
+
+                path = directory / name
+                relative = _relative(path, root)
+                if is_included(relative) and not is_excluded(relative):
+                    sources[path] = None
+
+    return list(sources)
+
+
+def _relative(path: Path, root: Path) -> str:
+    return os.path.relpath(path, root).replace(os.sep, '/')
+
+
+def get_project_option(options: Sequence[str]) -> Optional[str]:
+    """Returns the value of the `-p` or `--project` option"""
+    project: Optional[str] = None
+    for index, option in enumerate(options):
+        name, _, value = option.partition('=')
+        if name in ('-p', '--project'):
+            if not value and index + 1 < len(options):
+                value = options[index + 1]
+            project = value
+
+    return project
+
+
+def remove_project_option(options: Sequence[str]) -> List[str]:
+    remaining: List[str] = []
+    iterator = iter(options)
+    for option in iterator:
+        if option in ('-p', '--project'):
+            next(iterator, None)
+        elif not option.startswith(('-p=', '--project=')):
+            remaining.append(option)
+
+    return remaining
+
+
+def load_project_config(options: Sequence[str], *, cwd: Path, root: Path) -> Dict[str, Any]:
+    """Returns the configuration that pyright would use when ran with the given options.
+
+    Raises `errors.PyrightError` if the configuration is in a `pyproject.toml` file that cannot be parsed
+    as neither `tomllib` or `tomli` are available.
+    """
+    from . import errors
+
+    project = get_project_option(options)
+    if project is not None and cwd.joinpath(project).is_file():
+        path = cwd / project
+    elif root.joinpath(CONFIG_FILENAME).is_file():
+        path = root / CONFIG_FILENAME
+    else:
+        path = root / PYPROJECT_FILENAME
+
+    if not path.is_file():
+        return {}
+
+    if path.name == PYPROJECT_FILENAME and not has_toml_parser():
+        raise errors.PyrightError(f'Reading {path} requires Python 3.11 or the tomli package')
+
+    return load_config_file(path)
+
+
+# settings that contain a path relative to the project root
+PATH_SETTINGS = ('stubPath', 'typeshedPath', 'venvPath')
+
+# settings that contain a list of paths or globs relative to the project root
+PATH_LIST_SETTINGS = ('include', 'exclude', 'ignore', 'strict', 'extraPaths')
+
+
+def _resolve(path: Any, root: Path) -> Any:
+    return os.path.join(str(root), path) if isinstance(path, str) else path
+
+
+def _resolve_list(paths: Any, root: Path) -> Any:
+    return [_resolve(path, root) for path in cast(List[Any], paths)] if isinstance(paths, list) else paths
+
+
+def _resolve_paths(config: Dict[str, Any], *, root: Path) -> Dict[str, Any]:
+    config = dict(config)
+    for key in PATH_SETTINGS:
+        config[key] = _resolve(config.get(key), root)
+    for key in PATH_LIST_SETTINGS:
+        config[key] = _resolve_list(config.get(key), root)
+
+    if 'executionEnvironments' in config:
+        config['executionEnvironments'] = _resolve_environments(config['executionEnvironments'], root)
+
+    return {key: value for key, value in config.items() if value is not None}
+
+
+def _resolve_environments(environments: Any, root: Path) -> List[Dict[str, Any]]:
+    if not isinstance(environments, list):
+        return []
+
+    resolved: List[Dict[str, Any]] = []
+    for environment in cast(List[Any], environments):
+        if isinstance(environment, dict):
+            environment = dict(cast(Dict[str, Any], environment))
+            environment['root'] = _resolve(environment.get('root'), root)
+            environment['extraPaths'] = _resolve_list(environment.get('extraPaths'), root)
+            resolved.append({key: value for key, value in environment.items() if value is not None})
+
+    return resolved
+
+
+def resolve_extends(config: Dict[str, Any], *, root: Path, seen: Tuple[Path, ...] = ()) -> Dict[str, Any]:
+    """Returns a copy of the configuration merged with the configuration that it `extends`, if any.
+
+    The extended configuration is resolved relative to the configuration file and its paths are made absolute
+    as pyright resolves them relative to the extended file. Settings in the configuration take precedence.
+    """
+    config = dict(config)
+    extends = config.pop('extends', None)
+    if not isinstance(extends, str):
+        return config
+
+    path = Path(_resolve(extends, root)).resolve()
+    if path in seen:
+        log.debug('Ignoring circular extends of %s', path)
+        return config
+
+    base = resolve_extends(load_config_file(path), root=path.parent, seen=(*seen, path))
+    return {**_resolve_paths(base, root=path.parent), **config}
+
+
+def make_absolute(config: Dict[str, Any], *, root: Path) -> Dict[str, Any]:
+    """Returns a copy of the configuration with every path made absolute, so that it can be moved out of the root.
+
+    Settings that pyright would resolve relative to the project root by default are set explicitly, and
+    the project root is kept as the root of the execution environment so that imports resolve the same.
+    Any configuration that is extended is merged in as `extends` would be relative to the new location.
+    """
+    config = _resolve_paths(resolve_extends(config, root=root), root=root)
+    for key in (*PATH_SETTINGS, *PATH_LIST_SETTINGS):
+        config.setdefault(key, None)
+
+    config['stubPath'] = config['stubPath'] or str(root / 'typings')
+    if config.get('venv'):
+        config['venvPath'] = config['venvPath'] or str(root)
+    config['exclude'] = config['exclude'] or [_resolve(pattern, root) for pattern in DEFAULT_EXCLUDES]
+
+    # pyright adds `src` to the search paths if it is not a package, relative to the configuration file
+    if (
+        config.get('autoSearchPaths', True)
+        and root.joinpath('src').is_dir()
+        and not root.joinpath('src', '__init__.py').exists()
+    ):
+        extra_paths = cast(List[Any], config['extraPaths']) if isinstance(config['extraPaths'], list) else []
+        config['extraPaths'] = [str(root / 'src'), *extra_paths]
+    config['autoSearchPaths'] = False
+
+    # execution environments are matched in order so this only applies to files that no other environment matches
+    config['executionEnvironments'] = [*config.get('executionEnvironments', []), {'root': str(root)}]
+
+    return {key: value for key, value in config.items() if value is not None}
+
+
+@contextlib.contextmanager
+def temporary_config(config: Dict[str, Any], *, root: Path) -> Generator[str, None, None]:
+    """Writes the given configuration to a temporary file and yields its path, the file is removed on exit.
+
+    The file is created in the temporary directory so that it is never left behind in the project, paths
+    in the configuration are made absolute as they would otherwise be relative to the configuration file.
+    """
+    import tempfile
+
+    fd, path = tempfile.mkstemp(prefix='pyrightconfig-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as file:
+            json.dump(make_absolute(config, root=root), file, default=str)
+
+        yield path
+    finally:
+        os.unlink(path)
@@ -0,0 +1,120 @@
+"""Support for passing large numbers of files to pyright.
+
+If `PYRIGHT_PYTHON_RESPONSE_FILES` is set then files can be read from a response file with `@path`
+or from stdin with `@-`, one file per line or separated by null characters, e.g. from `git ls-files -z`.
+
+If the files would exceed the maximum command line length then they are written to the `include`
+setting of a temporary configuration file instead, so that every file is still checked by a single
+pyright process.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import logging
+import subprocess
+from typing import IO, Any, List, Union, Optional, Sequence
+from pathlib import Path
+
+from .utils import env_to_bool
+
+log: logging.Logger = logging.getLogger(__name__)
+
+STDIN_ARGUMENT = '@-'
+WINDOWS_MAX_COMMAND_LENGTH = 32767
+DEFAULT_ARG_MAX = 128 * 1024
+
+# leave room for the node binary, the pyright script and any options
+COMMAND_LENGTH_MARGIN = 8 * 1024
+
+
+def is_enabled() -> bool:
+    """Returns whether or not `@path` arguments are read as response files, these could also be paths"""
+    return env_to_bool('PYRIGHT_PYTHON_RESPONSE_FILES', default=False)
+
+
+def has_response_files(args: Sequence[str]) -> bool:
+    return any(arg.startswith('@') and len(arg) > 1 for arg in args)
+
+
+def expand(
+    args: Sequence[str],
+    *,
+    cwd: Optional[Union[str, os.PathLike[str]]] = None,
+    stdin: Optional[IO[bytes]] = None,
+) -> List[str]:
+    """Replaces every `@path` argument with the files listed in the given file, `@-` reads from stdin.
+
+    Response files are relative to `cwd`, the files that they list are not changed.
+    """
+    from . import errors
+
+    expanded: List[str] = []
+    for arg in args:
+        if not arg.startswith('@') or len(arg) == 1:
+            expanded.append(arg)
+            continue
+
+        if arg == STDIN_ARGUMENT:
+            data = (stdin or sys.stdin.buffer).read()
+        else:
+            try:
+                data = Path(cwd or os.getcwd()).joinpath(arg[1:]).read_bytes()
+            except OSError as exc:
+                raise errors.PyrightError(f'Could not read the response file {arg[1:]}: {exc.strerror}') from exc
+
+        expanded.extend(parse(data))
+
+    return expanded
+
+
+def parse(data: bytes) -> List[str]:
+    content = os.fsdecode(data)
+    lines = content.split('\0') if '\0' in content else content.splitlines()
+    return [line for line in lines if line.strip()]
+
+
+def get_max_command_length() -> int:
+    if sys.platform == 'win32':
+        return WINDOWS_MAX_COMMAND_LENGTH - COMMAND_LENGTH_MARGIN // 2
+
+    try:
+        arg_max = os.sysconf('SC_ARG_MAX')
+    except (AttributeError, ValueError, OSError):
+        arg_max = DEFAULT_ARG_MAX
+
+    # the environment variables count towards the same limit
+    environment = sum(len(key) + len(value) + 2 for key, value in os.environ.items())
+    return max(arg_max - environment - COMMAND_LENGTH_MARGIN, COMMAND_LENGTH_MARGIN)
+
+
+def is_too_long(args: Sequence[str]) -> bool:
+    return sum(len(arg) + 1 for arg in args) > get_max_command_length()
+
+
+def run(
+    args: Sequence[str], **kwargs: Any
+) -> Union[subprocess.CompletedProcess[bytes], subprocess.CompletedProcess[str]]:
+    """Run pyright with the files listed in a temporary configuration file, accepts the same arguments as `cli.run()`"""
+    from . import cli, _shard, errors, _config
+    from ._report import complete_process
+
+    split = _shard.split_args(args)
+    if split is None:
+        return cli._execute(tuple(args), **kwargs)
+
+    options, files = split
+    cwd = Path(kwargs.get('cwd') or os.getcwd()).absolute()
+    root = _shard.get_project_root(options, cwd)
+
+    try:
+        config = _config.load_project_config(options, cwd=cwd, root=root)
+    except errors.PyrightError as exc:
+        message = f'Too many files to pass to pyright directly: {exc.message}\n'
+        return complete_process(args, 4, b'', message.encode(), kwargs)
+
+    config['include'] = [str(cwd / file) for file in files]
+    with _config.temporary_config(config, root=root) as path:
+        log.debug('Passing %s files to pyright through %s', len(files), path)
+        return cli._execute((*_config.remove_project_option(options), '--project', path), **kwargs)
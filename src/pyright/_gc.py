@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import os
+import re
+import time
+import shutil
+import logging
+from typing import Dict, List, Tuple, Optional, NamedTuple
+from pathlib import Path
+
+from . import _utils
+from ._lock import FileLock
+
+SIZE_RE = re.compile(r'(?i)^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*$')
+DURATION_RE = re.compile(r'(?i)^\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*$')
+SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024**2, 'g': 1024**3, 't': 1024**4}
+DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24, 'w': 60 * 60 * 24 * 7}
+
+log: logging.Logger = logging.getLogger(__name__)
+
+
+class CachedVersion(NamedTuple):
+    version: str
+    path: Path
+    size: int
+    last_used: float
+
+
+class PruneResult(NamedTuple):
+    removed: List[CachedVersion]
+    skipped: List[CachedVersion]
+    reclaimed: int
+
+
+def get_cached_versions() -> List[CachedVersion]:
+    """Returns every version that is installed in the cache directory, ordered from least to most recently used.
+
+    As installs share files through the store, the size of each version is the number of bytes that would
+    be reclaimed by removing only that version.
+    """
+    return [entry for entry, _ in _scan_versions()]
+
+
+def prune(*, max_size: Optional[int] = None, max_age: Optional[float] = None, dry_run: bool = False) -> PruneResult:
+    """Remove the least recently used versions from the cache.
+
+    Versions that have not been used for `max_age` seconds are removed and then versions are removed,
+    oldest first, until the total size of the cache is at most `max_size` bytes. Files that are shared
+    between versions are only counted once.
+
+    Versions that are currently in use, being installed or that are configured with
+    `PYRIGHT_PYTHON_FORCE_VERSION` are never removed and are returned in `PruneResult.skipped` instead.
+    """
+    versions = _scan_versions()
+    protected = os.environ.get('PYRIGHT_PYTHON_FORCE_VERSION')
+    now = time.time()
+
+    # the number of remaining versions that reference each file
+    references: Dict[Tuple[int, int], int] = {}
+    sizes: Dict[Tuple[int, int], int] = {}
+    for _, inodes in versions:
+        for inode, (size, _, _) in inodes.items():
+            references[inode] = references.get(inode, 0) + 1
+            sizes[inode] = size
+
+    total = sum(sizes.values())
+    initial_total = total
+
+    removed: List[CachedVersion] = []
+    skipped: List[CachedVersion] = []
+    for entry, inodes in versions:
+        expired = max_age is not None and now - entry.last_used > max_age
+        oversized = max_size is not None and total > max_size
+        if not expired and not oversized:
+            continue
+
+        if entry.version == protected or not _remove(entry, dry_run=dry_run):
+            log.debug('Not removing version %s as it is in use', entry.version)
+            skipped.append(entry)
+            continue
+
+        log.debug('Removed version %s', entry.version)
+        removed.append(entry)
+        for inode in inodes:
+            references[inode] -= 1
+            if references[inode] == 0:
+                total -= sizes[inode]
+
+    if removed and not dry_run:
+        # the store entries for files that are no longer used by any version can now be removed
+        from . import _store
+
+        _store.prune()
+
+    return PruneResult(removed=removed, skipped=skipped, reclaimed=initial_total - total)
+
+
+def auto_prune() -> Optional[PruneResult]:
+    """Prune the cache using the limits configured with `PYRIGHT_PYTHON_CACHE_MAX_SIZE` and `PYRIGHT_PYTHON_CACHE_MAX_AGE`.
+
+    This does nothing if neither limit is configured.
+    """
+    max_size = get_max_size()
+    max_age = get_max_age()
+    if max_size is None and max_age is None:
+        return None
+
+    try:
+        result = prune(max_size=max_size, max_age=max_age)
+    except OSError as exc:
+        log.debug('Could not prune the cache: %s', exc)
+        return None
+
+    if result.removed:
+        log.debug('Pruned %s versions, reclaimed %s', len(result.removed), format_size(result.reclaimed))
+
+    return result
+
+
+def get_max_size() -> Optional[int]:
+    value = os.environ.get('PYRIGHT_PYTHON_CACHE_MAX_SIZE')
+    if not value:
+        return None
+
+    try:
+        return parse_size(value)
+    except ValueError:
+        log.debug('Ignoring invalid PYRIGHT_PYTHON_CACHE_MAX_SIZE value: %s', value)
+        return None
+
+
+def get_max_age() -> Optional[int]:
+    value = os.environ.get('PYRIGHT_PYTHON_CACHE_MAX_AGE')
+    if not value:
+        return None
+
+    try:
+        return parse_duration(value)
+    except ValueError:
+        log.debug('Ignoring invalid PYRIGHT_PYTHON_CACHE_MAX_AGE value: %s', value)
+        return None
+
+
+def parse_size(value: str) -> int:
+    """Parse a size in bytes with an optional binary unit suffix, e.g. `1048576`, `500M` or `2GiB`"""
+    match = SIZE_RE.match(value)
+    if match is None:
+        raise ValueError(f'Invalid size: {value}')
+
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+
+def parse_duration(value: str) -> int:
+    """Parse a duration in seconds with an optional unit suffix, e.g. `3600`, `12h` or `30d`"""
+    match = DURATION_RE.match(value)
+    if match is None:
+        raise ValueError(f'Invalid duration: {value}')
+
+    return int(float(match.group(1)) * DURATION_UNITS[match.group(2).lower()])
+
+
+def format_size(size: int) -> str:
+    value = float(size)
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if value < 1024:
+            return f'{value:.1f} {unit}' if unit != 'B' else f'{size} B'
+        value /= 1024
+
+    return f'{value:.1f} TiB'
+
+
+def _scan_versions() -> List[Tuple[CachedVersion, Dict[Tuple[int, int], Tuple[int, int, int]]]]:
+    versions: List[Tuple[CachedVersion, Dict[Tuple[int, int], Tuple[int, int, int]]]] = []
+    if not _utils.ROOT_CACHE_DIR.exists():
+        return versions
+
+    for path in _utils.ROOT_CACHE_DIR.iterdir():
+        # every install directory contains the `package.json` written by `_install()`, even if it is corrupted
+        if path.name.startswith('.') or not path.joinpath('package.json').is_file():
+            continue
+
+        inodes = _scan(path)
+
+        # a file is exclusive to this version if the only other link to it is the store entry
+        size = sum(size for size, nlink, count in inodes.values() if nlink - count <= 1)
+        entry = CachedVersion(version=path.name, path=path, size=size, last_used=_get_last_used(path))
+        versions.append((entry, inodes))
+
+    return sorted(versions, key=lambda item: item[0].last_used)
+
+
+def _scan(path: Path) -> Dict[Tuple[int, int], Tuple[int, int, int]]:
+    """Returns the size, link count and number of links within the given directory for every file in the directory"""
+    inodes: Dict[Tuple[int, int], Tuple[int, int, int]] = {}
+    for dirpath, _, filenames in os.walk(str(path)):
+        for name in filenames:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+
+            key = (st.st_dev, st.st_ino)
+            count = inodes[key][2] if key in inodes else 0
+            inodes[key] = (st.st_size, st.st_nlink, count + 1)
+
+    return inodes
+
+
+def _get_last_used(path: Path) -> float:
+    for candidate in (path / _utils.LAST_USED_FILENAME, path):
+        try:
+            return candidate.stat().st_mtime
+        except OSError:
+            pass
+
+    return 0
+
+
+def _remove(entry: CachedVersion, *, dry_run: bool) -> bool:
+    install_lock = FileLock(_utils.get_lock_path(entry.version))
+    if not install_lock.acquire(blocking=False):
+        return False
+
+    try:
+        # every process that uses this version holds a shared lock on this file
+        in_use_lock = FileLock(_utils.get_in_use_lock_path(entry.version))
+        if not in_use_lock.acquire(blocking=False):
+            return False
+
+        try:
+            if dry_run:
+                return True
+
+            # rename first so that other processes never observe a partially removed install,
+            # the name matches the temporary directories that `_install()` cleans up
+            tmp_dir = entry.path.with_name(f'.{entry.version}.{os.getpid()}.prune.tmp')
+            try:
+                entry.path.rename(tmp_dir)
+            except OSError as exc:
+                log.debug('Could not remove %s: %s', entry.path, exc)
+                return False
+
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return True
+        finally:
+            in_use_lock.release()
+    finally:
+        install_lock.release()
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+import logging
+from types import TracebackType
+from typing import Optional
+from pathlib import Path
+
+log: logging.Logger = logging.getLogger(__name__)
+
+
+class FileLock:
+    """A cross-process advisory lock backed by a file.
+
+    Shared and exclusive locks are supported on all platforms, using `flock()` on POSIX systems and
+    `LockFileEx()` on Windows.
+    """
+
+    path: Path
+    shared: bool
+
+    def __init__(self, path: Path, *, shared: bool = False) -> None:
+        self.path = path
+        self.shared = shared
+        self._fd: Optional[int] = None
+
+    @property
+    def fd(self) -> Optional[int]:
+        """The file descriptor holding the lock, or `None` if the lock is not held"""
+        return self._fd
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        """Acquire the lock, returns `False` if `blocking` is `False` and the lock is held elsewhere."""
+        if self._fd is not None:
+            raise RuntimeError(f'Lock at {self.path} is already acquired')
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            acquired = _lock(fd, shared=self.shared, blocking=blocking)
+        except BaseException:
+            os.close(fd)
+            raise
+
+        if not acquired:
+            os.close(fd)
+            return False
+
+        log.debug('Acquired %s lock at %s', 'shared' if self.shared else 'exclusive', self.path)
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        fd = self._fd
+        if fd is None:
+            return
+
+        self._fd = None
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+
+        log.debug('Released lock at %s', self.path)
+
+    def __enter__(self) -> FileLock:
+        self.acquire()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.release()
+
+
+# `sys.platform` is used instead of `os.name` so that type checkers understand the branch
+if sys.platform == 'win32':
+    import ctypes
+    import msvcrt
+    from ctypes import wintypes
+
+    LOCKFILE_FAIL_IMMEDIATELY = 0x1
+    LOCKFILE_EXCLUSIVE_LOCK = 0x2
+    ERROR_LOCK_VIOLATION = 33
+
+    class _Overlapped(ctypes.Structure):
+        _fields_ = [
+            ('Internal', ctypes.c_void_p),
+            ('InternalHigh', ctypes.c_void_p),
+            ('Offset', wintypes.DWORD),
+            ('OffsetHigh', wintypes.DWORD),
+            ('hEvent', wintypes.HANDLE),
+        ]
+
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    _kernel32.LockFileEx.argtypes = [
+        wintypes.HANDLE,
+        wintypes.DWORD,
+        wintypes.DWORD,
+        wintypes.DWORD,
+        wintypes.DWORD,
+        ctypes.POINTER(_Overlapped),
+    ]
+    _kernel32.LockFileEx.restype = wintypes.BOOL
+    _kernel32.UnlockFileEx.argtypes = [
+        wintypes.HANDLE,
+        wintypes.DWORD,
+        wintypes.DWORD,
+        wintypes.DWORD,
+        ctypes.POINTER(_Overlapped),
+    ]
+    _kernel32.UnlockFileEx.restype = wintypes.BOOL
+
+    def _lock(fd: int, *, shared: bool, blocking: bool) -> bool:
+        # the first byte is locked, which is the same region that `msvcrt.locking()` locks
+        handle = msvcrt.get_osfhandle(fd)
+        flags = LOCKFILE_FAIL_IMMEDIATELY if shared else LOCKFILE_FAIL_IMMEDIATELY | LOCKFILE_EXCLUSIVE_LOCK
+        while True:
+            if _kernel32.LockFileEx(handle, flags, 0, 1, 0, ctypes.byref(_Overlapped())):
+                return True
+
+            error = ctypes.get_last_error()
+            if error != ERROR_LOCK_VIOLATION:
+                raise ctypes.WinError(error)
+
+            if not blocking:
+                return False
+
+            # polled instead of blocking in `LockFileEx()` so that the process can still be interrupted
+            time.sleep(0.1)
+
+    def _unlock(fd: int) -> None:
+        if not _kernel32.UnlockFileEx(msvcrt.get_osfhandle(fd), 0, 1, 0, ctypes.byref(_Overlapped())):
+            raise ctypes.WinError(ctypes.get_last_error())
+
+else:
+    import fcntl
+
+    def _lock(fd: int, *, shared: bool, blocking: bool) -> bool:
+        flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+
+        try:
+            fcntl.flock(fd, flags)
+        except BlockingIOError:
+            return False
+
+        return True
+
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
@@ -12,7 +12,8 @@ import socket
 import ssl
 import sys
 import urllib.parse
-from http.client import HTTPConnection, HTTPSConnection, HTTPMessage, HTTPException
+from typing import Any, Iterator, Optional
+from http.client import HTTPConnection, HTTPSConnection, HTTPMessage, HTTPException, HTTPResponse
 
 # This version of mureq has been modified to include type hints for all public
 # functions and methods that we use
@@ -59,12 +60,12 @@ def post(url, body=None, **kwargs):
     return request('POST', url=url, body=body, **kwargs)
 
 
-def head(url, **kwargs):
+def head(url: str, **kwargs: object) -> 'Response':
     """head performs an HTTP HEAD request."""
     return request('HEAD', url=url, **kwargs)
 
 
-def put(url, body=None, **kwargs):
+def put(url: str, body: Optional[bytes] = None, **kwargs: object) -> 'Response':
     """put performs an HTTP PUT request."""
     return request('PUT', url=url, body=body, **kwargs)
 
@@ -80,9 +81,11 @@ def delete(url, **kwargs):
 
 
 @contextlib.contextmanager
-def yield_response(method, url, *, unix_socket=None, timeout=DEFAULT_TIMEOUT, headers=None,
-                   params=None, body=None, form=None, json=None, verify=True, source_address=None,
-                   max_redirects=None, ssl_context=None):
+def yield_response(method: str, url: str, *, unix_socket: Optional[str] = None,
+                   timeout: Optional[float] = DEFAULT_TIMEOUT, headers: Any = None, params: Any = None,
+                   body: Optional[bytes] = None, form: Any = None, json: Any = None, verify: bool = True,
+                   source_address: Any = None, max_redirects: Optional[int] = None,
+                   ssl_context: Optional[ssl.SSLContext] = None) -> Iterator[HTTPResponse]:
     """yield_response is a low-level API that exposes the actual
     http.client.HTTPResponse via a contextmanager.
 
@@ -163,14 +166,14 @@ class Response:
 
     __slots__ = ('url', 'status_code', 'headers', 'body')
 
-    def __init__(self, url, status_code, headers, body):
+    def __init__(self, url: str, status_code: int, headers: HTTPMessage, body: bytes) -> None:
         self.url, self.status_code, self.headers, self.body = url, status_code, headers, body
 
     def __repr__(self):
         return f"Response(status_code={self.status_code:d})"
 
     @property
-    def ok(self):
+    def ok(self) -> bool:
         """ok returns whether the response had a successful status code
         (anything other than a 40x or 50x)."""
         return not (400 <= self.status_code < 600)
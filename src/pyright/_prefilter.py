@@ -0,0 +1,145 @@
+"""Removes files that the pyright configuration excludes before node is started, see `PYRIGHT_PYTHON_PREFILTER`.
+
+This is mostly useful for pre-commit, which passes every staged Python file to pyright even if
+the configuration excludes it. Pyright does not check files that are named on the command line if
+they match the `exclude` setting, so these files are removed beforehand and if none of the given
+files would be checked then the run is skipped entirely without starting node. Files that pyright
+would check, including files outside of the `include` setting or the project root, are never removed.
+
+The relevant configuration settings are cached by the size and mtime of the configuration files
+so that the configuration does not have to be parsed on every run.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import hashlib
+import logging
+from typing import Any, Dict, List, Tuple, Union, Optional, Sequence, cast
+from pathlib import Path
+
+from .utils import env_to_bool
+
+log: logging.Logger = logging.getLogger(__name__)
+
+CONFIG_KEYS = ('exclude',)
+CACHE_VERSION = 2
+
+
+def is_enabled() -> bool:
+    return env_to_bool('PYRIGHT_PYTHON_PREFILTER', default=False)
+
+
+class Matcher:
+    """Matches paths against the `exclude` setting of a project"""
+
+    def __init__(self, root: Path, config: Dict[str, Any]) -> None:
+        from ._config import DEFAULT_EXCLUDES, compile_glob
+
+        self.root = root
+        self.excludes = [
+            compile_glob(pattern, root) for pattern in _get_patterns(config, 'exclude') or DEFAULT_EXCLUDES
+        ]
+
+    def is_relevant(self, path: Path) -> bool:
+        """Returns whether or not pyright would check the given file if it was passed on the command line"""
+        try:
+            relative = os.path.relpath(path, self.root).replace(os.sep, '/')
+        except ValueError:
+            # the path is on a different drive
+            return True
+
+        # files outside of the project root are checked as the exclude patterns are relative to it
+        if relative == '..' or relative.startswith('../'):
+            return True
+
+        return not any(pattern.match(relative) for pattern in self.excludes)
+
+
+def _get_patterns(config: Dict[str, Any], key: str) -> List[str]:
+    value = config.get(key)
+    if not isinstance(value, list):
+        return []
+    return [pattern for pattern in cast(List[Any], value) if isinstance(pattern, str)]
+
+
+def _stat(path: Path) -> Optional[List[int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def load_config(root: Path) -> Dict[str, Any]:
+    """Returns the `exclude` setting for the given project root.
+
+    The settings are cached by the size and mtime of the configuration files, so the configuration
+    is only parsed again when it changes.
+    """
+    from . import _cache, _utils, _config
+    from ._result_cache import RACY_INTERVAL_NS
+
+    cache_path = _utils.ROOT_CACHE_DIR / 'config' / f'{hashlib.sha256(str(root).encode("utf-8")).hexdigest()[:16]}.json'
+    stats = [_stat(root / _config.CONFIG_FILENAME), _stat(root / _config.PYPROJECT_FILENAME)]
+
+    data = _cache.read_json(cache_path)
+    if isinstance(data, dict):
+        cached = cast(Dict[str, Any], data)
+        if cached.get('version') == CACHE_VERSION and cached.get('stats') == stats:
+            config = cached.get('config')
+            if isinstance(config, dict):
+                return {key: _get_patterns(cast(Dict[str, Any], config), key) for key in CONFIG_KEYS}
+
+    log.debug('Loading the pyright configuration for %s', root)
+    config = {key: _get_patterns(_config.load_config(root), key) for key in CONFIG_KEYS}
+
+    now = time.time_ns()
+    if all(stat is None or now - stat[0] > RACY_INTERVAL_NS for stat in stats):
+        _cache.write_json(cache_path, {'version': CACHE_VERSION, 'stats': stats, 'config': config})
+
+    return config
+
+
+def filter_args(
+    args: Sequence[str], *, cwd: Optional[Union[str, os.PathLike[str]]] = None
+) -> Optional[Tuple[str, ...]]:
+    """Returns the arguments without the source files that pyright would not check.
+
+    `None` is returned if every file was removed, i.e. pyright does not have to be ran at all.
+    Files are only removed if the project has a pyright configuration file, other arguments, such as
+    directories, are always kept.
+    """
+    from . import _shard, _config
+
+    split = _shard.split_args(args)
+    if split is None:
+        return tuple(args)
+
+    options, files = split
+    if not files:
+        return tuple(args)
+
+    directory = Path(cwd or os.getcwd()).absolute()
+    root = _shard.get_project_root(options, directory)
+    if not _config.is_project_root(root):
+        return tuple(args)
+
+    matcher = Matcher(root, load_config(root))
+    removed = {
+        file
+        for file in files
+        if file.endswith(_config.SOURCE_SUFFIXES)
+        and os.path.isfile(directory / file)
+        and not matcher.is_relevant(directory / file)
+    }
+    if not removed:
+        return tuple(args)
+
+    log.debug('Skipping %s files that are excluded by the pyright configuration', len(removed))
+    if len(removed) == len(set(files)):
+        return None
+
+    # options are kept in their original position in case their order matters
+    return tuple(arg for arg in args if arg not in removed or arg in options)
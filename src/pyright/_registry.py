@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import os
+import base64
+import hashlib
+import logging
+import tarfile
+import tempfile
+from typing import IO, TYPE_CHECKING, Any, Dict, Tuple, Optional, cast
+from pathlib import Path, PurePosixPath
+
+from . import errors
+
+if TYPE_CHECKING:
+    from ._store import Store
+
+DEFAULT_REGISTRY_URL = 'https://registry.npmjs.org'
+CHUNK_SIZE = 64 * 1024
+
+# the abbreviated metadata format only includes the data required for installing packages
+ABBREVIATED_METADATA = 'application/vnd.npm.install-v1+json; q=1.0, application/json; q=0.8, */*'
+
+log: logging.Logger = logging.getLogger(__name__)
+
+
+def get_registry_url() -> str:
+    """Returns the npm registry URL, this can be configured with `PYRIGHT_PYTHON_REGISTRY_URL`"""
+    return os.environ.get('PYRIGHT_PYTHON_REGISTRY_URL', DEFAULT_REGISTRY_URL).rstrip('/')
+
+
+def get_metadata(package: str) -> Dict[str, Any]:
+    """Fetch the abbreviated registry metadata for the given package"""
+    from . import _mureq as mureq
+
+    url = f'{get_registry_url()}/{package}'
+    log.debug('Fetching registry metadata from %s', url)
+
+    response = mureq.get(url, headers={'Accept': ABBREVIATED_METADATA}, timeout=10, max_redirects=5)
+    if not response.ok:
+        raise errors.RegistryError(f'Could not fetch metadata for {package} from {url}: HTTP {response.status_code}')
+
+    return cast(Dict[str, Any], response.json())
+
+
+def latest(package: str) -> str:
+    """Return the latest version for the given package using the registry `latest` dist-tag"""
+    try:
+        return get_metadata(package)['dist-tags']['latest']
+    except KeyError as exc:
+        raise errors.RegistryError(f'Could not find the latest version for {package}') from exc
+
+
+def install(package: str, version: str, *, dest: Path, store: Optional[Store] = None) -> Path:
+    """Install the given package version into `dest/node_modules/<package>` without using npm.
+
+    This only supports packages without any runtime dependencies, such as pyright. The tarball is
+    streamed to a temporary file, verified against the registry `dist.integrity` and then extracted.
+
+    If a `store` is given then files that are already stored are hardlinked instead of written.
+
+    Returns the path to the installed package.
+    """
+    tarball_url, integrity = _get_dist(package, version)
+    pkg_dir = dest / 'node_modules' / package
+
+    with tempfile.TemporaryFile() as f:
+        _download(tarball_url, f, integrity=integrity)
+        f.seek(0)
+        _extract(f, pkg_dir, store=store)
+
+    log.debug('Installed %s@%s to %s', package, version, pkg_dir)
+    return pkg_dir
+
+
+def _get_dist(package: str, version: str) -> Tuple[str, str]:
+    metadata = get_metadata(package)
+    try:
+        dist = metadata['versions'][version]['dist']
+    except KeyError as exc:
+        raise errors.RegistryError(f'Could not find {package}@{version} in the registry') from exc
+
+    integrity = dist.get('integrity')
+    if integrity is None and dist.get('shasum'):
+        # older packages only include a hex encoded sha1 checksum
+        integrity = 'sha1-' + base64.b64encode(bytes.fromhex(dist['shasum'])).decode('ascii')
+
+    if integrity is None:
+        raise errors.RegistryError(f'The registry did not return an integrity hash for {package}@{version}')
+
+    return dist['tarball'], integrity
+
+
+def _parse_integrity(integrity: str) -> Tuple[str, bytes]:
+    """Parse a Subresource Integrity string, returns the strongest supported hash"""
+    hashes: Dict[str, bytes] = {}
+    for entry in integrity.split():
+        algorithm, _, digest = entry.partition('-')
+        if algorithm in {'sha512', 'sha384', 'sha256', 'sha1'}:
+            hashes[algorithm] = base64.b64decode(digest)
+
+    for algorithm in ('sha512', 'sha384', 'sha256', 'sha1'):
+        if algorithm in hashes:
+            return algorithm, hashes[algorithm]
+
+    raise errors.RegistryError(f'Unsupported integrity hash: {integrity}')
+
+
+def _download(url: str, f: IO[bytes], *, integrity: str) -> None:
+    from . import _mureq as mureq
+
+    algorithm, expected = _parse_integrity(integrity)
+    hasher = hashlib.new(algorithm)
+
+    log.debug('Downloading tarball from %s', url)
+    with mureq.yield_response('GET', url, timeout=30, max_redirects=5) as response:
+        if response.status != 200:
+            raise errors.RegistryError(f'Could not download {url}: HTTP {response.status}')
+
+        while True:
+            chunk = response.read(CHUNK_SIZE)
+            if not chunk:
+                break
+
+            hasher.update(chunk)
+            f.write(chunk)
+
+    if hasher.digest() != expected:
+        raise errors.RegistryError(f'Integrity check failed for {url}')
+
+
+def _extract(f: IO[bytes], pkg_dir: Path, *, store: Optional[Store] = None) -> None:
+    with tarfile.open(fileobj=f, mode='r:gz') as tar:
+        for member in tar:
+            # npm tarballs will always output one top level directory, usually `package/`,
+            # which is not necessary for our case so we strip it out
+            parts = PurePosixPath(member.name).parts[1:]
+            if not parts:
+                continue
+
+            if member.name.startswith('/') or '..' in parts:
+                raise errors.RegistryError(f'Refusing to extract unsafe tarball member: {member.name}')
+
+            path = pkg_dir.joinpath(*parts)
+            if member.isdir():
+                path.mkdir(parents=True, exist_ok=True)
+            elif member.isfile():
+                source = tar.extractfile(member)
+                assert source is not None
+
+                path.parent.mkdir(parents=True, exist_ok=True)
+                mode = 0o755 if member.mode & 0o111 else 0o644
+                if store is not None:
+                    with source:
+                        store.write(source, path, size=member.size, mode=mode)
+                    continue
+
+                with source, path.open('wb') as target:
+                    while True:
+                        chunk = source.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+
+                path.chmod(mode)
+            else:
+                log.debug('Skipping unsupported tarball member: %s', member.name)
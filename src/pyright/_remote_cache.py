@@ -0,0 +1,153 @@
+"""Shares cached results between machines through a remote HTTP cache, see `PYRIGHT_PYTHON_REMOTE_CACHE_URL`.
+
+Results are stored with a `PUT` request to `<url>/<fingerprint>` and looked up with a `GET` request
+to the same URL, using the fingerprint from the local result cache. Any HTTP server that supports
+this protocol can be used, e.g. the server started by `pyright-python-tools cache serve`.
+
+The remote cache is only ever an optimisation, if it is unavailable, slow or returns invalid data
+then pyright is ran locally instead.
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import logging
+from typing import Dict, Tuple, Optional
+
+from .utils import env_to_bool
+
+log: logging.Logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_MAX_SIZE = 10 * 1024 * 1024
+
+# set once a request fails so that an unavailable cache only slows down a single request
+_unavailable = False
+
+
+def get_url() -> Optional[str]:
+    url = os.environ.get('PYRIGHT_PYTHON_REMOTE_CACHE_URL')
+    if not url:
+        return None
+    return url.rstrip('/')
+
+
+def is_enabled() -> bool:
+    return get_url() is not None
+
+
+def is_read_only() -> bool:
+    return env_to_bool('PYRIGHT_PYTHON_REMOTE_CACHE_READ_ONLY', default=False)
+
+
+def get_timeout() -> float:
+    value = os.environ.get('PYRIGHT_PYTHON_REMOTE_CACHE_TIMEOUT')
+    if not value:
+        return DEFAULT_TIMEOUT
+
+    try:
+        return float(value)
+    except ValueError:
+        log.debug('Ignoring invalid PYRIGHT_PYTHON_REMOTE_CACHE_TIMEOUT value: %s', value)
+        return DEFAULT_TIMEOUT
+
+
+def get_max_size() -> int:
+    from ._gc import parse_size
+
+    value = os.environ.get('PYRIGHT_PYTHON_REMOTE_CACHE_MAX_SIZE')
+    if not value:
+        return DEFAULT_MAX_SIZE
+
+    try:
+        return parse_size(value)
+    except ValueError:
+        log.debug('Ignoring invalid PYRIGHT_PYTHON_REMOTE_CACHE_MAX_SIZE value: %s', value)
+        return DEFAULT_MAX_SIZE
+
+
+def get_headers() -> Dict[str, str]:
+    """Returns the headers to send with every request, `PYRIGHT_PYTHON_REMOTE_CACHE_HEADER` can be used for authentication"""
+    value = os.environ.get('PYRIGHT_PYTHON_REMOTE_CACHE_HEADER')
+    if not value:
+        return {}
+
+    name, sep, header = value.partition(':')
+    if not sep or not name.strip():
+        log.debug('Ignoring invalid PYRIGHT_PYTHON_REMOTE_CACHE_HEADER value')
+        return {}
+
+    return {name.strip(): header.strip()}
+
+
+def fetch(fingerprint: str) -> Optional[Tuple[int, bytes, bytes]]:
+    """Returns the cached result for the given fingerprint or `None` if it is not in the remote cache"""
+    global _unavailable
+
+    from . import _mureq as mureq
+    from ._result_cache import decode_entry
+
+    url = get_url()
+    if url is None or _unavailable:
+        return None
+
+    max_size = get_max_size()
+    try:
+        response = mureq.get(
+            f'{url}/{fingerprint}',
+            headers=get_headers(),
+            timeout=get_timeout(),
+            read_limit=max_size + 1,
+        )
+    except Exception as exc:
+        log.debug('Could not fetch %s from the remote cache: %s - %s', fingerprint, type(exc), exc)
+        _unavailable = True
+        return None
+
+    if response.status_code == 404:
+        log.debug('Remote cache miss for %s', fingerprint)
+        return None
+
+    if response.status_code != 200:
+        log.debug('Remote cache returned HTTP %s for %s', response.status_code, fingerprint)
+        return None
+
+    if len(response.body) > max_size:
+        log.debug('Ignoring remote cache entry %s as it is larger than %s bytes', fingerprint, max_size)
+        return None
+
+    try:
+        return decode_entry(json.loads(response.body))
+    except ValueError:
+        log.debug('Ignoring invalid remote cache entry %s', fingerprint)
+        return None
+
+
+def publish(fingerprint: str, returncode: int, stdout: bytes, stderr: bytes) -> None:
+    """Upload the given result to the remote cache, errors are logged and ignored"""
+    from . import _mureq as mureq
+    from ._result_cache import encode_entry
+
+    url = get_url()
+    if url is None or _unavailable or is_read_only():
+        return
+
+    body = json.dumps(encode_entry(returncode, stdout, stderr)).encode('utf-8')
+    if len(body) > get_max_size():
+        log.debug('Not uploading %s as it is larger than the maximum remote cache entry size', fingerprint)
+        return
+
+    try:
+        response = mureq.put(
+            f'{url}/{fingerprint}',
+            body=body,
+            headers={**get_headers(), 'Content-Type': 'application/json'},
+            timeout=get_timeout(),
+        )
+    except Exception as exc:
+        log.debug('Could not upload %s to the remote cache: %s - %s', fingerprint, type(exc), exc)
+        return
+
+    if not response.ok:
+        log.debug('Remote cache returned HTTP %s when uploading %s', response.status_code, fingerprint)
@@ -0,0 +1,138 @@
+"""Formats results in the same way as the pyright CLI.
+
+This is used when the output of pyright cannot be printed directly, e.g. when results from multiple
+pyright processes are merged or when a previous result is replayed from the cache.
+"""
+
+from __future__ import annotations
+
+import sys
+import subprocess
+from typing import Any, Dict, List, Union, Iterable, Optional, Sequence
+
+from .results import Summary, Diagnostic, CheckResult
+
+
+def format_diagnostic(diagnostic: Diagnostic, *, prefix: str = '  ') -> str:
+    message = prefix
+    if diagnostic.file:
+        message += f'{diagnostic.file}:'
+
+    # pyright omits the position for empty ranges
+    range = diagnostic.range
+    if range is not None and (range.start_line or range.start_character or range.end_line or range.end_character):
+        message += f'{range.start_line + 1}:{range.start_character + 1} - '
+
+    first_line, *remaining_lines = diagnostic.message.split('\n')
+    message += f'{diagnostic.severity}: {first_line}'
+    if remaining_lines:
+        message += '\n' + prefix + ('\n' + prefix).join(remaining_lines)
+
+    if diagnostic.rule:
+        message += f' ({diagnostic.rule})'
+
+    return message
+
+
+def format_summary(summary: Summary) -> str:
+    return (
+        f'{summary.error_count} {"error" if summary.error_count == 1 else "errors"}, '
+        + f'{summary.warning_count} {"warning" if summary.warning_count == 1 else "warnings"}, '
+        + f'{summary.information_count} {"information" if summary.information_count == 1 else "informations"} '
+    )
+
+
+def format_diagnostics(diagnostics: Iterable[Diagnostic]) -> List[str]:
+    """Returns the lines for the given diagnostics grouped by file"""
+    files: Dict[str, List[Diagnostic]] = {}
+    for diagnostic in diagnostics:
+        files.setdefault(diagnostic.file, []).append(diagnostic)
+
+    lines: List[str] = []
+    for file, file_diagnostics in files.items():
+        if file:
+            lines.append(file)
+        lines.extend(format_diagnostic(diagnostic) for diagnostic in file_diagnostics)
+
+    return lines
+
+
+def format_result(result: CheckResult, *, output_json: bool) -> str:
+    """Returns the output that pyright would print for the given result"""
+    if output_json:
+        import json
+
+        return json.dumps(result.to_json(), indent=4) + '\n'
+
+    return '\n'.join([*format_diagnostics(result.diagnostics), format_summary(result.summary)]) + '\n'
+
+
+def complete_process(
+    args: Sequence[str],
+    returncode: int,
+    stdout: bytes,
+    stderr: bytes,
+    kwargs: Any,
+) -> Union[subprocess.CompletedProcess[bytes], subprocess.CompletedProcess[str]]:
+    """Writes the output to the streams given in the `subprocess.run()` style arguments"""
+    capture = kwargs.get('capture_output', False)
+    stdout_target = subprocess.PIPE if capture else kwargs.get('stdout')
+    stderr_target = subprocess.PIPE if capture else kwargs.get('stderr')
+    if stderr_target == subprocess.STDOUT:
+        stdout, stderr = stdout + stderr, b''
+        stderr_target = subprocess.DEVNULL
+
+    captured_stdout = _write(stdout, stdout_target, sys.stdout)
+    captured_stderr = _write(stderr, stderr_target, sys.stderr)
+
+    if kwargs.get('check', False) and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, list(args), captured_stdout, captured_stderr)
+
+    if kwargs.get('text') or kwargs.get('universal_newlines') or kwargs.get('encoding'):
+        encoding = kwargs.get('encoding') or 'utf-8'
+        return subprocess.CompletedProcess(
+            list(args),
+            returncode,
+            captured_stdout.decode(encoding) if captured_stdout is not None else None,
+            captured_stderr.decode(encoding) if captured_stderr is not None else None,
+        )
+
+    return subprocess.CompletedProcess(list(args), returncode, captured_stdout, captured_stderr)
+
+
+def complete_empty(
+    args: Sequence[str], kwargs: Any
+) -> Union[subprocess.CompletedProcess[bytes], subprocess.CompletedProcess[str]]:
+    """Completes a run without any files to check with the output that pyright would print"""
+    result = CheckResult(diagnostics=[], summary=Summary(), returncode=0)
+    output = format_result(result, output_json='--outputjson' in args)
+    return complete_process(args, 0, output.encode('utf-8'), b'', kwargs)
+
+
+def _write(data: bytes, target: Any, default: Any) -> Optional[bytes]:
+    if target == subprocess.PIPE:
+        return data
+
+    if target == subprocess.DEVNULL or not data:
+        return None
+
+    if target is None:
+        default.flush()
+        fd = default.fileno() if _has_fileno(default) else None
+        if fd is None:
+            default.write(data.decode('utf-8', errors='replace'))
+            return None
+    else:
+        fd = target if isinstance(target, int) else target.fileno()
+
+    with open(fd, 'wb', closefd=False) as file:
+        file.write(data)
+    return None
+
+
+def _has_fileno(stream: Any) -> bool:
+    try:
+        stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        return False
+    return True
@@ -0,0 +1,366 @@
+"""Caches the output of pyright runs, see `PYRIGHT_PYTHON_RESULT_CACHE`.
+
+Results are stored by a fingerprint of everything that can change the output of pyright:
+
+- the pyright version and the Pyright for Python version
+- the arguments, working directory and relevant environment variables
+- the pyright configuration files of the project
+- the installed distributions of the current interpreter
+- the contents of every file in the project, hashes are re-used if the size and mtime of a file have not changed
+- the contents of every file in the import roots, i.e. directories on the path that are outside of the interpreter
+  such as editable installs or `PYTHONPATH`
+
+If the fingerprint matches a previous run then its output and exit code are replayed without running node.
+Results can also be shared between machines through a remote cache, see `_remote_cache`.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import base64
+import hashlib
+import logging
+import subprocess
+from typing import Any, Dict, List, Tuple, Union, Mapping, Optional, Sequence, cast
+from pathlib import Path
+
+from .utils import env_to_int, env_to_bool
+
+log: logging.Logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 256
+
+# hashes for files that were modified this recently are not stored in the index, as the file could
+# be modified again without changing its mtime due to the timestamp resolution of the filesystem
+RACY_INTERVAL_NS = 2 * 1000 * 1000 * 1000
+
+# environment variables that can change how pyright resolves imports
+ENV_VARS = ('PATH', 'PYTHONPATH', 'VIRTUAL_ENV', 'CONDA_PREFIX')
+
+# pyright only prints a result with these exit codes, anything else is a fatal or configuration error
+CACHEABLE_RETURNCODES = (0, 1)
+
+
+def is_enabled() -> bool:
+    return env_to_bool('PYRIGHT_PYTHON_RESULT_CACHE', default=False)
+
+
+def is_active() -> bool:
+    """Returns whether or not pyright should be ran through this module, i.e. if the local or remote cache is enabled"""
+    from . import _remote_cache
+
+    return is_enabled() or _remote_cache.is_enabled()
+
+
+def supports(kwargs: Mapping[str, Any]) -> bool:
+    return kwargs.get('stdin') is None and kwargs.get('input') is None
+
+
+def get_cache_dir() -> Path:
+    from . import _utils
+
+    return _utils.ROOT_CACHE_DIR / 'results'
+
+
+def get_max_entries() -> int:
+    return env_to_int('PYRIGHT_PYTHON_RESULT_CACHE_MAX_ENTRIES', default=DEFAULT_MAX_ENTRIES)
+
+
+def get_fingerprint(
+    args: Sequence[str],
+    *,
+    script: Path,
+    cwd: Path,
+    env: Mapping[str, str],
+) -> Optional[str]:
+    """Returns the fingerprint for running pyright with the given arguments or `None` if the result cannot be cached"""
+    from . import _shard, _config
+    from ._version import __version__
+
+    split = _shard.split_args(args)
+    if split is None:
+        return None
+
+    options, files = split
+    root = _shard.get_project_root(options, cwd)
+    config = _config.load_config(root)
+
+    sources = set(_config.find_sources(root, config))
+    sources.update(_shard.find_files(options, files, cwd=cwd))
+    directories: List[Any] = [config.get('stubPath') or 'typings', *(config.get('extraPaths') or [])]
+    for directory in directories:
+        if isinstance(directory, str) and root.joinpath(directory).is_dir():
+            sources.update(_config.find_sources(root / directory, {}))
+
+    # editable installs are not reflected in the installed distributions when their sources change
+    for directory in get_import_roots(env):
+        sources.update(_config.find_sources(directory, {}))
+
+    hasher = hashlib.sha256()
+    metadata = {
+        'pyright-python': __version__,
+        'pyright': _read_bytes(script.parent / 'package.json').hex(),
+        'args': list(args),
+        'cwd': str(cwd),
+        'env': {name: env.get(name) for name in ENV_VARS},
+        'config': [
+            _read_bytes(root / _config.CONFIG_FILENAME).hex(),
+            _read_bytes(root / _config.PYPROJECT_FILENAME).hex(),
+        ],
+        'environment': _get_environment(),
+    }
+    hasher.update(json.dumps(metadata, sort_keys=True).encode('utf-8'))
+
+    for path, digest in sorted(hash_files(root, sorted(sources)).items()):
+        hasher.update(f'\0{path}\0{digest}'.encode('utf-8'))
+
+    return hasher.hexdigest()
+
+
+def _read_bytes(path: Path) -> bytes:
+    try:
+        return path.read_bytes()
+    except OSError:
+        return b''
+
+
+def _get_environment() -> List[str]:
+    """Returns the installed distributions of the current interpreter.
+
+    This only lists the metadata directories as that is much faster than reading the metadata itself,
+    `.pth` files are included with their mtime as they can add arbitrary directories to the path.
+    """
+    entries = [sys.executable, sys.version]
+    for entry in sys.path:
+        if not entry or not os.path.isdir(entry):
+            continue
+
+        try:
+            names = sorted(os.listdir(entry))
+        except OSError:
+            continue
+
+        for name in names:
+            if name.endswith(('.dist-info', '.egg-info', '.egg-link')):
+                entries.append(name)
+            elif name.endswith('.pth'):
+                try:
+                    entries.append(f'{name}:{os.stat(os.path.join(entry, name)).st_mtime_ns}')
+                except OSError:
+                    pass
+
+    return entries
+
+
+def get_import_roots(env: Mapping[str, str]) -> List[Path]:
+    """Returns the directories that imports can be resolved from that are not part of the interpreter.
+
+    These are added to the path by `PYTHONPATH`, `.pth` files and editable installs and can contain sources
+    from outside of the project. Editable installs that use an import hook are not included as pyright
+    cannot resolve imports through them either.
+    """
+    import site
+
+    prefixes = {os.path.realpath(prefix) for prefix in (sys.prefix, sys.base_prefix, sys.exec_prefix)}
+    user_site = site.getusersitepackages() if site.ENABLE_USER_SITE else None
+
+    python_path = env.get('PYTHONPATH')
+    entries = [*sys.path, *(python_path.split(os.pathsep) if python_path else [])]
+
+    roots: Dict[Path, None] = {}
+    for entry in entries:
+        if not entry or not os.path.isdir(entry):
+            continue
+
+        path = os.path.realpath(entry)
+        if user_site is not None and path == os.path.realpath(user_site):
+            continue
+
+        if any(path == prefix or path.startswith(prefix + os.sep) for prefix in prefixes):
+            continue
+
+        roots[Path(path)] = None
+
+    return list(roots)
+
+
+def hash_files(root: Path, paths: Sequence[Path]) -> Dict[str, str]:
+    """Returns the sha256 digest of every given file.
+
+    Files are hashed in parallel, files whose size and mtime match the previous run are not read again.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from . import _cache
+
+    index_path = get_cache_dir() / 'index' / f'{hashlib.sha256(str(root).encode("utf-8")).hexdigest()[:16]}.json'
+    data = _cache.read_json(index_path)
+    index: Dict[str, Any] = cast(Dict[str, Any], data) if isinstance(data, dict) else {}
+
+    digests: Dict[str, str] = {}
+    stats: Dict[str, Tuple[int, int]] = {}
+    pending: List[str] = []
+    for path in paths:
+        key = str(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            digests[key] = 'missing'
+            continue
+
+        stats[key] = (stat.st_mtime_ns, stat.st_size)
+        entry = index.get(key)
+        if isinstance(entry, list) and len(cast(List[Any], entry)) == 3:
+            *stat_key, digest = cast(List[Any], entry)
+            if tuple(stat_key) == stats[key] and isinstance(digest, str):
+                digests[key] = digest
+                continue
+
+        pending.append(key)
+
+    if pending:
+        log.debug('Hashing %s files', len(pending))
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as executor:
+            for key, digest in zip(pending, executor.map(_hash_file, pending)):
+                digests[key] = digest
+
+    now = time.time_ns()
+    new_index = {
+        key: [mtime, size, digests[key]] for key, (mtime, size) in stats.items() if now - mtime > RACY_INTERVAL_NS
+    }
+    if new_index != index:
+        _cache.write_json(index_path, new_index)
+
+    return digests
+
+
+def _hash_file(path: str) -> str:
+    from . import _cache
+
+    try:
+        return _cache.hash_file(Path(path))
+    except OSError:
+        return 'missing'
+
+
+def get_entry_path(fingerprint: str) -> Path:
+    return get_cache_dir() / f'{fingerprint}.json'
+
+
+def encode_entry(returncode: int, stdout: bytes, stderr: bytes) -> Dict[str, Any]:
+    return {
+        'returncode': returncode,
+        'stdout': base64.b64encode(stdout).decode('ascii'),
+        'stderr': base64.b64encode(stderr).decode('ascii'),
+    }
+
+
+def decode_entry(data: Any) -> Tuple[int, bytes, bytes]:
+    """Returns the exit code and output of a cached result, raises `ValueError` if the entry is invalid"""
+    try:
+        return int(data['returncode']), base64.b64decode(data['stdout']), base64.b64decode(data['stderr'])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise ValueError('Invalid cache entry') from exc
+
+
+def load(fingerprint: str) -> Optional[Tuple[int, bytes, bytes]]:
+    from . import _cache
+
+    path = get_entry_path(fingerprint)
+    data = _cache.read_json(path)
+    if data is None:
+        return None
+
+    try:
+        entry = decode_entry(data)
+    except ValueError:
+        return None
+
+    # the mtime is used to evict the least recently used entries
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    return entry
+
+
+def store(fingerprint: str, returncode: int, stdout: bytes, stderr: bytes) -> None:
+    from . import _cache
+
+    _cache.write_json(get_entry_path(fingerprint), encode_entry(returncode, stdout, stderr))
+    _evict(get_max_entries())
+
+
+def _evict(max_entries: int) -> None:
+    try:
+        entries = [path for path in get_cache_dir().iterdir() if path.suffix == '.json']
+    except OSError:
+        return
+
+    if len(entries) <= max_entries:
+        return
+
+    def get_mtime(path: Path) -> float:
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            return 0
+
+    entries.sort(key=get_mtime)
+    for path in entries[: len(entries) - max_entries]:
+        log.debug('Evicting cached result %s', path.name)
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def run(
+    args: Sequence[str], **kwargs: Any
+) -> Union[subprocess.CompletedProcess[bytes], subprocess.CompletedProcess[str]]:
+    """Run pyright through the local and remote result caches, this accepts the same arguments as `cli.run()`"""
+    from . import cli, _remote_cache
+    from ._report import complete_process
+
+    cwd = Path(kwargs.get('cwd') or os.getcwd()).absolute()
+    env = kwargs.get('env')
+    script = cli._get_script(tuple(args))
+    try:
+        fingerprint = get_fingerprint(args, script=script, cwd=cwd, env=os.environ if env is None else env)
+    except Exception:
+        log.debug('Could not compute the result fingerprint', exc_info=True)
+        fingerprint = None
+
+    if fingerprint is None:
+        return cli._run(tuple(args), **kwargs)
+
+    # the local cache is checked first and remote results are stored locally for the next run
+    local = is_enabled()
+    entry = load(fingerprint) if local else None
+    if entry is None and _remote_cache.is_enabled():
+        entry = _remote_cache.fetch(fingerprint)
+        if entry is not None and local:
+            store(fingerprint, *entry)
+
+    if entry is not None:
+        log.debug('Replaying cached result %s', fingerprint)
+        return complete_process(args, *entry, kwargs)
+
+    captured = {**kwargs, 'stdout': subprocess.PIPE, 'stderr': subprocess.PIPE, 'check': False}
+    for name in ('capture_output', 'text', 'universal_newlines', 'encoding', 'errors'):
+        captured.pop(name, None)
+
+    # the output is always captured as bytes as the text options are removed
+    proc = cast('subprocess.CompletedProcess[bytes]', cli._run(tuple(args), **captured))
+    stdout = proc.stdout or b''
+    stderr = proc.stderr or b''
+    if proc.returncode in CACHEABLE_RETURNCODES:
+        if local:
+            store(fingerprint, proc.returncode, stdout, stderr)
+        _remote_cache.publish(fingerprint, proc.returncode, stdout, stderr)
+
+    return complete_process(args, proc.returncode, stdout, stderr, kwargs)
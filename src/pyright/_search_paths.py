@@ -0,0 +1,228 @@
+"""Passes the import search paths of the current interpreter to pyright, see `PYRIGHT_PYTHON_SEARCH_PATHS`.
+
+By default pyright starts a Python subprocess to find the search paths and the Python version. As
+Pyright for Python is already running in the target interpreter, the search paths can be found
+in-process and passed to pyright through a temporary configuration file instead:
+
+- `venvPath` and `venv` point to the interpreter prefix so that pyright finds `site-packages` itself,
+  including any `.pth` files
+- `extraPaths` contains any other search paths, e.g. `dist-packages` directories
+- `--pythonversion` is set to the version of the current interpreter
+
+The search paths are cached by the interpreter path and the mtimes of its search path directories, so
+they are only found again when packages are installed or removed.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import hashlib
+import logging
+import contextlib
+from typing import Any, Dict, List, Union, Mapping, Optional, Sequence, Generator, cast
+from pathlib import Path
+
+from .utils import env_to_bool
+
+log: logging.Logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+# options that already tell pyright where to find the search paths
+INTERPRETER_OPTIONS = {'--pythonpath', '-v', '--venvpath', '--venv-path'}
+
+# pyright only looks for `site-packages` in these directories of a virtual environment
+LIB_DIRS = ('lib', 'lib64', 'Lib')
+
+
+def is_enabled() -> bool:
+    return env_to_bool('PYRIGHT_PYTHON_SEARCH_PATHS', default=False)
+
+
+def get_env(env: Optional[Mapping[str, str]] = None) -> Dict[str, str]:
+    """Returns the given environment with the directory of the current interpreter at the start of `PATH`.
+
+    The language server is configured by the client so the search paths cannot be passed to it, this
+    ensures that it at least finds the same interpreter when it looks for `python` on the `PATH`.
+    """
+    new_env = dict(env) if env is not None else os.environ.copy()
+    directory = os.path.dirname(sys.executable)
+    path = new_env.get('PATH', '')
+    if directory and path.split(os.pathsep)[0] != directory:
+        new_env['PATH'] = f'{directory}{os.pathsep}{path}' if path else directory
+    return new_env
+
+
+def get_python_version() -> str:
+    return f'{sys.version_info[0]}.{sys.version_info[1]}'
+
+
+def _get_sys_path() -> List[str]:
+    """Returns `sys.path` as pyright would see it, pyright runs the interpreter in isolated mode"""
+    paths = list(sys.path)
+
+    # the first entry is the directory of the script that is being ran or the working directory
+    if paths and not sys.flags.isolated and not getattr(sys.flags, 'safe_path', False):
+        paths = paths[1:]
+
+    excluded = {os.path.abspath(path) for path in os.environ.get('PYTHONPATH', '').split(os.pathsep) if path}
+    excluded.add(os.getcwd())
+
+    result: List[str] = []
+    for path in paths:
+        if not path:
+            continue
+
+        path = os.path.abspath(path)
+        if path not in excluded and path not in result and os.path.isdir(path):
+            result.append(path)
+
+    return result
+
+
+def _get_mtimes(paths: Sequence[str]) -> List[Optional[int]]:
+    mtimes: List[Optional[int]] = []
+    for path in paths:
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return mtimes
+
+
+def _is_site_packages(path: str, prefix: str) -> bool:
+    """Returns whether or not pyright would find the given directory when `venv` points to the given prefix"""
+    try:
+        parts = Path(os.path.relpath(path, prefix)).parts
+    except ValueError:
+        return False
+
+    if len(parts) == 2:
+        return parts[0] in LIB_DIRS and parts[1] == 'site-packages'
+
+    return len(parts) == 3 and parts[0] in LIB_DIRS and parts[1].startswith('python3') and parts[2] == 'site-packages'
+
+
+def _read_pth_files(directory: str) -> List[str]:
+    """Returns the paths added by the `.pth` files in the given directory, pyright also reads these"""
+    paths: List[str] = []
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith('.pth'))
+    except OSError:
+        return paths
+
+    for name in names:
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8', errors='replace') as file:
+                lines = file.read().splitlines()
+        except OSError:
+            continue
+
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith(('#', 'import ', 'import\t')):
+                paths.append(os.path.abspath(os.path.join(directory, line)))
+
+    return paths
+
+
+def _compute(sys_path: Sequence[str]) -> Optional[Dict[str, Any]]:
+    import sysconfig
+
+    prefix = os.path.abspath(sys.prefix)
+    site_packages = [path for path in sys_path if _is_site_packages(path, prefix)]
+    if not site_packages:
+        log.debug('Could not find a site-packages directory that pyright can find in %s', prefix)
+        return None
+
+    # pyright uses its bundled typeshed stubs for the standard library
+    stdlib = {os.path.abspath(sysconfig.get_path(name)) for name in ('stdlib', 'platstdlib')}
+    pth_paths = {path for directory in site_packages for path in _read_pth_files(directory)}
+
+    def is_stdlib(path: str) -> bool:
+        return any(path == directory or path.startswith(directory + os.sep) for directory in stdlib) and not any(
+            part in ('site-packages', 'dist-packages') for part in Path(path).parts
+        )
+
+    return {
+        'venvPath': os.path.dirname(prefix),
+        'venv': os.path.basename(prefix),
+        'extraPaths': [
+            path for path in sys_path if path not in site_packages and path not in pth_paths and not is_stdlib(path)
+        ],
+    }
+
+
+def get_search_paths() -> Optional[Dict[str, Any]]:
+    """Returns the `venvPath`, `venv` and `extraPaths` settings for the current interpreter.
+
+    `None` is returned if the interpreter does not use a layout that pyright can find by itself.
+    """
+    from . import _cache, _utils
+    from ._result_cache import RACY_INTERVAL_NS
+
+    sys_path = _get_sys_path()
+    mtimes = _get_mtimes(sys_path)
+    key = {'version': CACHE_VERSION, 'executable': sys.executable, 'sys_path': sys_path, 'mtimes': mtimes}
+    cache_path = (
+        _utils.ROOT_CACHE_DIR
+        / 'interpreters'
+        / f'{hashlib.sha256(sys.executable.encode("utf-8")).hexdigest()[:16]}.json'
+    )
+
+    data = _cache.read_json(cache_path)
+    if isinstance(data, dict) and cast(Dict[str, Any], data).get('key') == key:
+        return cast(Dict[str, Any], data).get('search_paths')
+
+    log.debug('Finding the search paths for %s', sys.executable)
+    search_paths = _compute(sys_path)
+
+    now = time.time_ns()
+    if all(mtime is None or now - mtime > RACY_INTERVAL_NS for mtime in mtimes):
+        _cache.write_json(cache_path, {'key': key, 'search_paths': search_paths})
+
+    return search_paths
+
+
+@contextlib.contextmanager
+def configure(
+    args: Sequence[str], *, cwd: Optional[Union[str, os.PathLike[str]]] = None
+) -> Generator[Sequence[str], None, None]:
+    """Yields the arguments to run pyright with so that it uses the search paths of the current interpreter"""
+    from . import _shard, errors, _config
+
+    split = _shard.split_args(args)
+    if split is None or any(option.split('=', 1)[0] in INTERPRETER_OPTIONS for option in split[0]):
+        yield args
+        return
+
+    options, files = split
+    directory = Path(cwd or os.getcwd()).absolute()
+    root = _shard.get_project_root(options, directory)
+    try:
+        config = _config.load_project_config(options, cwd=directory, root=root)
+    except errors.PyrightError as exc:
+        log.debug('Not passing the search paths to pyright: %s', exc.message)
+        yield args
+        return
+
+    # the settings are merged with the search paths so any extended configuration has to be merged first
+    config = _config.resolve_extends(config, root=root)
+
+    if not any(option.split('=', 1)[0] == '--pythonversion' for option in options) and 'pythonVersion' not in config:
+        options = [*options, '--pythonversion', get_python_version()]
+
+    search_paths = get_search_paths() if not config.get('venv') else None
+    if search_paths is None:
+        yield (*options, *files)
+        return
+
+    extra_paths = config.get('extraPaths')
+    config.update(search_paths)
+    if isinstance(extra_paths, list):
+        config['extraPaths'] = [*extra_paths, *search_paths['extraPaths']]
+
+    with _config.temporary_config(config, root=root) as path:
+        yield (*_config.remove_project_option(options), '--project', path, *files)
@@ -0,0 +1,309 @@
+"""Splits a single pyright run across multiple node processes or machines, see `--jobs` and `--shard`.
+
+The source files are split into balanced shards weighted by their size, each shard is checked by
+a separate pyright process and the results are merged back into a single result.
+"""
+
+from __future__ import annotations
+
+import os
+import heapq
+import logging
+import subprocess
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Union, Mapping, Iterable, Optional, Sequence, cast
+from pathlib import Path
+
+if TYPE_CHECKING:
+    from .results import CheckResult
+
+log: logging.Logger = logging.getLogger(__name__)
+
+JOBS_OPTION = '--jobs'
+SHARD_OPTION = '--shard'
+
+# pyright options that take a value, these are needed to tell the file arguments apart
+VALUE_OPTIONS = {
+    '-p',
+    '--project',
+    '--pythonpath',
+    '--pythonplatform',
+    '--pythonversion',
+    '-t',
+    '--typeshedpath',
+    '--typeshed-path',
+    '-v',
+    '--venvpath',
+    '--venv-path',
+    '--level',
+    JOBS_OPTION,
+    SHARD_OPTION,
+    '--changed-since',
+}
+
+# these options change what pyright outputs so the run cannot be split
+UNSUPPORTED_OPTIONS = {
+    '-h',
+    '--help',
+    '--version',
+    '-w',
+    '--watch',
+    '--createstub',
+    '--verifytypes',
+    '--dependencies',
+    '--stats',
+    '--verbose',
+}
+
+
+def has_options(args: Sequence[str]) -> bool:
+    """Returns whether or not pyright should be ran by this module, i.e. if `--jobs` or `--shard` were given"""
+    return any(arg == option or arg.startswith(f'{option}=') for arg in args for option in (JOBS_OPTION, SHARD_OPTION))
+
+
+def _pop_option(args: Sequence[str], option: str) -> Tuple[Optional[str], Tuple[str, ...]]:
+    remaining: List[str] = []
+    value: Optional[str] = None
+    iterator = iter(args)
+    for arg in iterator:
+        if arg == option:
+            value = next(iterator, '')
+        elif arg.startswith(f'{option}='):
+            value = arg[len(option) + 1 :]
+        else:
+            remaining.append(arg)
+
+    return value, tuple(remaining)
+
+
+def pop_jobs(args: Sequence[str]) -> Tuple[int, Tuple[str, ...]]:
+    """Removes `--jobs` from the given arguments and returns its value, `auto` is resolved to the default number of jobs"""
+    from . import errors
+
+    value, remaining = _pop_option(args, JOBS_OPTION)
+    if value is None:
+        return 1, remaining
+
+    if value == 'auto':
+        from ._batch import get_default_jobs
+
+        return get_default_jobs(), remaining
+
+    try:
+        jobs = int(value)
+    except ValueError:
+        jobs = 0
+
+    if jobs < 1:
+        raise errors.PyrightError(f'Expected {JOBS_OPTION} to be a positive number or `auto` but got {value!r}')
+
+    return jobs, remaining
+
+
+def pop_shard(args: Sequence[str]) -> Tuple[Optional[Tuple[int, int]], Tuple[str, ...]]:
+    """Removes `--shard i/N` from the given arguments and returns the one-based shard index and the number of shards"""
+    from . import errors
+
+    value, remaining = _pop_option(args, SHARD_OPTION)
+    if value is None:
+        return None, remaining
+
+    index, _, count = value.partition('/')
+    if not index.isdigit() or not count.isdigit() or not 1 <= int(index) <= int(count):
+        raise errors.PyrightError(f'Expected {SHARD_OPTION} to be in the form i/N, e.g. 1/4, but got {value!r}')
+
+    return (int(index), int(count)), remaining
+
+
+def split_args(args: Sequence[str]) -> Optional[Tuple[List[str], List[str]]]:
+    """Split the pyright arguments into options and files, returns `None` if the run cannot be sharded"""
+    options: List[str] = []
+    files: List[str] = []
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        name = arg.split('=', 1)[0]
+        if name in UNSUPPORTED_OPTIONS:
+            return None
+
+        if arg.startswith('-'):
+            options.append(arg)
+            has_value = name in VALUE_OPTIONS or (
+                # `--threads` takes an optional value
+                name == '--threads' and index + 1 < len(args) and args[index + 1].isdigit()
+            )
+            if has_value and '=' not in arg and index + 1 < len(args):
+                index += 1
+                options.append(args[index])
+        else:
+            files.append(arg)
+
+        index += 1
+
+    return options, files
+
+
+def get_project_root(options: Sequence[str], cwd: Path) -> Path:
+    from . import _config
+
+    value = _config.get_project_option(options)
+    if value is not None:
+        project = cwd / value
+        return project if project.is_dir() else project.parent
+
+    return _config.find_project_root(cwd)
+
+
+def find_files(options: Sequence[str], files: Sequence[str], cwd: Path) -> List[Path]:
+    """Returns the source files that pyright would check when ran with the given arguments"""
+    from . import _config
+
+    root = get_project_root(options, cwd)
+    config = _config.load_config(root)
+    if not files:
+        return _config.find_sources(root, config)
+
+    sources: List[Path] = []
+    directories: List[str] = []
+    for file in files:
+        path = cwd / file
+        if path.is_dir():
+            directories.append(str(path.absolute()))
+        else:
+            sources.append(path)
+
+    if directories:
+        sources.extend(_config.find_sources(root, {'include': directories, 'exclude': config.get('exclude')}))
+
+    return sources
+
+
+def plan(files: Sequence[Path], count: int) -> List[List[Path]]:
+    """Split the files into `count` shards so that the total size of each shard is as close as possible.
+
+    The largest files are assigned first to the shard with the smallest total size, ties are broken by
+    the file path so that the same files always produce the same shards, even on different machines.
+    Shards can be empty if there are fewer files than shards.
+    """
+    sizes: List[Tuple[int, str, Path]] = []
+    for path in files:
+        try:
+            size = path.stat().st_size
+        except OSError:
+            size = 0
+        sizes.append((size, path.as_posix(), path))
+
+    sizes.sort(key=lambda item: (-item[0], item[1]))
+    shards: List[List[Path]] = [[] for _ in range(count)]
+    loads = [(0, index) for index in range(count)]
+    for size, _, path in sizes:
+        load, index = heapq.heappop(loads)
+        shards[index].append(path)
+        heapq.heappush(loads, (load + size, index))
+
+    return shards
+
+
+def check(
+    options: Sequence[str],
+    shards: Sequence[Sequence[Path]],
+    *,
+    cwd: Path,
+    env: Optional[Mapping[str, str]] = None,
+) -> Tuple[Optional[CheckResult], List[subprocess.CompletedProcess[bytes]]]:
+    """Check every shard in parallel, returns the merged result or `None` if a shard did not output any results.
+
+    If a shard did not output any results then its process is the first of the returned processes.
+    """
+    import contextvars
+    from concurrent.futures import ThreadPoolExecutor
+
+    from . import cli
+    from .results import parse_output, merge_results
+
+    def run(shard: Sequence[Path]) -> subprocess.CompletedProcess[bytes]:
+        # this goes through the same command line length handling as `cli.run()`
+        proc = cli._run(
+            ('--outputjson', *options, *(str(path) for path in shard)),
+            cwd=cwd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        return cast('subprocess.CompletedProcess[bytes]', proc)
+
+    log.debug('Checking %s shards', len(shards))
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        # every shard is ran in a copy of the current context so that it is spawned in the same way as `cli.run()`
+        futures = [executor.submit(contextvars.copy_context().run, run, shard) for shard in shards]
+        procs = [future.result() for future in futures]
+
+    results: List[CheckResult] = []
+    for index, proc in enumerate(procs):
+        try:
+            results.append(parse_output(proc.stdout, returncode=proc.returncode))
+        except ValueError:
+            # the failed shard is moved to the front so that its output can be reported
+            return None, [proc, *procs[:index], *procs[index + 1 :]]
+
+    return merge_results(results), procs
+
+
+def run(
+    args: Sequence[str], **kwargs: Any
+) -> Union[subprocess.CompletedProcess[bytes], subprocess.CompletedProcess[str]]:
+    """Run pyright with `--jobs` or `--shard`, this accepts the same arguments as `cli.run()`"""
+    from . import cli, errors
+    from ._report import format_result, complete_empty, complete_process
+
+    try:
+        jobs, args = pop_jobs(args)
+        shard, args = pop_shard(args)
+    except errors.PyrightError as exc:
+        return complete_process(args, 4, b'', f'{exc.message}\n'.encode(), kwargs)
+
+    split = split_args(args)
+    if split is None:
+        log.debug('Not splitting the pyright run as it contains unsupported options')
+        return cli._run(args, **kwargs)
+
+    cwd = Path(kwargs.get('cwd') or os.getcwd())
+    options, _ = split
+    output_json = '--outputjson' in options
+    files = find_files(*split, cwd=cwd)
+
+    if shard is not None:
+        index, count = shard
+        files = plan(files, count)[index - 1]
+        log.debug('Checking %s files in shard %s of %s', len(files), index, count)
+        if not files:
+            return complete_empty(args, kwargs)
+
+        # the files are passed explicitly so that pyright only checks the files in this shard
+        args = (*options, *(str(path) for path in files))
+
+    if jobs < 2 or len(files) < 2:
+        log.debug('Not splitting the pyright run')
+        return cli._run(args, **kwargs)
+
+    options = [option for option in options if option != '--outputjson']
+    shards = [shard for shard in plan(files, jobs) if shard]
+    result, procs = check(options, shards, cwd=cwd, env=kwargs.get('env'))
+
+    stderr = _merge_lines(proc.stderr for proc in procs)
+    if result is None:
+        failed = procs[0]
+        # a shard that exits successfully without any results has still failed
+        return complete_process(args, failed.returncode or 4, failed.stdout, stderr or failed.stdout, kwargs)
+
+    return complete_process(
+        args, result.returncode, format_result(result, output_json=output_json).encode('utf-8'), stderr, kwargs
+    )
+
+
+def _merge_lines(outputs: Iterable[bytes]) -> bytes:
+    # every process reports the same configuration messages
+    lines: Dict[bytes, None] = {}
+    for output in outputs:
+        for line in output.splitlines(keepends=True):
+            lines.setdefault(line, None)
+    return b''.join(lines)
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import os
+import stat
+import hashlib
+import logging
+import contextlib
+from typing import IO, Dict, Optional, Generator
+from pathlib import Path
+
+from . import _cache, _utils
+from ._lock import FileLock
+from .utils import env_to_bool
+
+CHUNK_SIZE = 64 * 1024
+
+# files up to this size are hashed in memory before they are written so that files
+# which are already in the store are never written to disk
+MAX_BUFFERED_SIZE = 16 * 1024 * 1024
+
+log: logging.Logger = logging.getLogger(__name__)
+
+
+class Store:
+    """A content-addressed store of files that installed pyright versions are hardlinked into.
+
+    Entries are keyed by their sha256 digest and file mode, as hardlinks share the same mode.
+    An entry is only referenced by the store itself once every install that used it has been
+    removed, these orphaned entries are removed by `prune()`.
+
+    If the filesystem does not support hardlinks then files are left as they are.
+    """
+
+    path: Path
+    enabled: bool
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.enabled = True
+
+    def write(self, source: IO[bytes], path: Path, *, size: int, mode: int) -> None:
+        """Write the contents of `source` to `path`, re-using the stored file if its contents are already stored"""
+        # never write through an existing hardlink as that would modify the stored file
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+        if size <= MAX_BUFFERED_SIZE:
+            data = source.read()
+            digest = hashlib.sha256(data).hexdigest()
+            if self.enabled and size and self._link_existing(digest, mode, path):
+                return
+
+            path.write_bytes(data)
+        else:
+            hasher = hashlib.sha256()
+            with path.open('wb') as f:
+                while True:
+                    chunk = source.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    f.write(chunk)
+
+            digest = hasher.hexdigest()
+
+        path.chmod(mode)
+        self.add(path, digest=digest)
+
+    def add(self, path: Path, *, digest: Optional[str] = None) -> None:
+        """Add an existing file to the store, replacing it with a hardlink if its contents are already stored"""
+        if not self.enabled:
+            return
+
+        st = os.lstat(str(path))
+        if not stat.S_ISREG(st.st_mode) or st.st_size == 0 or st.st_nlink > 1:
+            return
+
+        mode = stat.S_IMODE(st.st_mode)
+        entry = self._get_entry_path(digest or _cache.hash_file(path), mode)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        try:
+            os.link(str(path), str(entry))
+            return
+        except FileExistsError:
+            pass
+        except OSError as exc:
+            log.debug('Disabling deduplication as hardlinks could not be created: %s', exc)
+            self.enabled = False
+            return
+
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        try:
+            os.link(str(entry), str(tmp))
+        except OSError as exc:
+            # e.g. the maximum number of links for the entry has been reached
+            log.debug('Could not link %s to %s: %s', path, entry, exc)
+            return
+
+        os.replace(str(tmp), str(path))
+
+    def dedupe(self, root: Path, *, hashes: Optional[Dict[str, str]] = None) -> None:
+        """Replace every file in the given directory with a hardlink into the store.
+
+        `hashes` can be given to avoid re-hashing files, it maps POSIX paths relative to `root` to sha256 digests.
+        """
+        for dirpath, _, filenames in os.walk(str(root)):
+            for name in filenames:
+                path = Path(dirpath, name)
+                digest = hashes.get(path.relative_to(root).as_posix()) if hashes is not None else None
+                self.add(path, digest=digest)
+                if not self.enabled:
+                    return
+
+    def _link_existing(self, digest: str, mode: int, path: Path) -> bool:
+        try:
+            os.link(str(self._get_entry_path(digest, mode)), str(path))
+        except OSError:
+            return False
+
+        return True
+
+    def _get_entry_path(self, digest: str, mode: int) -> Path:
+        return self.path / digest[:2] / f'{digest[2:]}-{mode:o}'
+
+
+def get_store_dir() -> Path:
+    return _utils.ROOT_CACHE_DIR / '.store'
+
+
+def get_lock_path() -> Path:
+    return _utils.ROOT_CACHE_DIR / '.locks' / 'store.lock'
+
+
+def is_enabled(*, default: bool = True) -> bool:
+    """Whether or not installs should be deduplicated, this can be configured with `PYRIGHT_PYTHON_CACHE_DEDUPE`"""
+    return env_to_bool('PYRIGHT_PYTHON_CACHE_DEDUPE', default=default)
+
+
+@contextlib.contextmanager
+def use(*, default: bool = True) -> Generator[Optional[Store], None, None]:
+    """Returns the store if deduplication is enabled, `default` is used if `PYRIGHT_PYTHON_CACHE_DEDUPE` is not set.
+
+    A shared lock is held while the store is in use so that entries cannot be pruned while they are being linked.
+    """
+    if not is_enabled(default=default):
+        yield None
+        return
+
+    with FileLock(get_lock_path(), shared=True):
+        yield Store(get_store_dir())
+
+
+def prune() -> int:
+    """Remove every store entry that is no longer used by an install, returns the number of bytes reclaimed.
+
+    This does nothing if the store is currently in use by another process.
+    """
+    store_dir = get_store_dir()
+    if not store_dir.exists():
+        return 0
+
+    lock = FileLock(get_lock_path())
+    if not lock.acquire(blocking=False):
+        log.debug('Not pruning the store as it is in use')
+        return 0
+
+    reclaimed = 0
+    try:
+        for dirpath, _, filenames in os.walk(str(store_dir)):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.lstat(path)
+                    if st.st_nlink == 1:
+                        os.unlink(path)
+                        reclaimed += st.st_size
+                except OSError as exc:
+                    log.debug('Could not remove store entry %s: %s', path, exc)
+    finally:
+        lock.release()
+
+    log.debug('Pruned %s bytes from the store', reclaimed)
+    return reclaimed
@@ -1,18 +1,26 @@
 from __future__ import annotations
 
 import os
+import re
 import sys
 import json
+import time
 import logging
+import threading
 import subprocess
-from typing import Any
+from typing import Any, Dict, Tuple, Mapping, Optional, cast
 from pathlib import Path
+from typing_extensions import Literal
 
-from . import node, _mureq as mureq
-from .utils import env_to_bool, get_cache_dir, get_latest_version
+from . import node, _cache
+from ._lock import FileLock
+from .utils import env_to_int, env_to_bool, get_cache_dir, get_latest_version
 from ._version import __version__, __pyright_version__
 
 ROOT_CACHE_DIR = get_cache_dir() / 'pyright-python'
+DEFAULT_LATEST_VERSION_TTL = 60 * 60
+DEFAULT_PYLANCE_VERSION_TTL = 60 * 10
+PYLANCE_RELEASE_RE = re.compile(r'\d+\.\d+\.\d+')
 DEFAULT_PACKAGE_JSON: dict[str, Any] = {
     'name': 'pyright-binaries',
     'version': '1.0.0',
@@ -22,8 +30,13 @@ DEFAULT_PACKAGE_JSON: dict[str, Any] = {
     'author': 'RobertCraigie',
     'license': 'Apache-2.0',
 }
+LAST_USED_FILENAME = '.last-used'
+LAST_USED_INTERVAL = 60 * 60
 log: logging.Logger = logging.getLogger(__name__)
 
+_IN_USE_LOCKS: Dict[Path, FileLock] = {}
+_IN_USE_LOCKS_LOCK = threading.Lock()
+
 
 def install_pyright(args: tuple[object, ...], *, quiet: bool | None) -> Path:
     """Internal helper function to install the Pyright npm package to a cache.
@@ -35,7 +48,7 @@ def install_pyright(args: tuple[object, ...], *, quiet: bool | None) -> Path:
     """
     version = _get_configured_pyright_version()
     if version == 'latest':
-        version = node.latest('pyright')
+        version = get_latest_pyright_version()
     else:
         if _should_warn_version(args=args, quiet=quiet):
             print(
@@ -50,33 +63,251 @@ def install_pyright(args: tuple[object, ...], *, quiet: bool | None) -> Path:
             return bundled_path
 
     cache_dir = ROOT_CACHE_DIR / version
-    cache_dir.mkdir(exist_ok=True, parents=True)
-
     pkg_dir = cache_dir / 'node_modules' / 'pyright'
-    package_json = cache_dir / 'package.json'
-    current_version = node.get_pkg_version(pkg_dir / 'package.json')
 
-    if current_version is None or current_version != version:
+    # this must happen before checking the install so that it cannot be pruned in between
+    _hold_version(version)
+
+    if node.get_pkg_version(pkg_dir / 'package.json') == version:
+        _mark_used(cache_dir)
+        return pkg_dir
+
+    # Only one process should install a given version at a time, any other processes
+    # wait for the install to finish and then re-use it.
+    installed = False
+    with FileLock(get_lock_path(version)):
+        if node.get_pkg_version(pkg_dir / 'package.json') != version:
+            _install(version, cache_dir=cache_dir, args=args)
+            installed = True
+
+    _mark_used(cache_dir)
+
+    if installed:
+        from . import _gc
+
+        _gc.auto_prune()
+
+    return pkg_dir
+
+
+def get_installer() -> Literal['npm', 'tarball']:
+    """Returns the method that should be used to install pyright, configured with `PYRIGHT_PYTHON_INSTALLER`.
+
+    - `npm`: runs `npm install`, this is the default and respects any npm configuration
+    - `tarball`: downloads the package tarball from the registry directly, this does not require npm
+    """
+    installer = os.environ.get('PYRIGHT_PYTHON_INSTALLER', 'npm').lower()
+    if installer == 'tarball':
+        return 'tarball'
+
+    if installer != 'npm':
+        log.debug('Ignoring unknown PYRIGHT_PYTHON_INSTALLER value: %s', installer)
+
+    return 'npm'
+
+
+def get_lock_path(version: str) -> Path:
+    """Returns the path to the lock file that guards the cache directory for the given version"""
+    return ROOT_CACHE_DIR / '.locks' / f'{version}.lock'
+
+
+def get_in_use_lock_path(version: str) -> Path:
+    """Returns the path to the lock file that every process using the given version holds a shared lock on"""
+    return ROOT_CACHE_DIR / '.locks' / f'{version}.in-use.lock'
+
+
+def _hold_version(version: str) -> None:
+    """Hold a shared lock for the given version until this process exits so that it is never pruned while in use.
+
+    The lock file descriptor is inheritable so that the lock is kept when the process is replaced with node.
+    """
+    path = get_in_use_lock_path(version)
+
+    # installs can happen concurrently from multiple threads, e.g. with `--jobs`
+    with _IN_USE_LOCKS_LOCK:
+        if path in _IN_USE_LOCKS:
+            return
+
+        lock = FileLock(path, shared=True)
+        try:
+            lock.acquire()
+        except OSError as exc:
+            log.debug('Could not acquire the in use lock for version %s: %s', version, exc)
+            return
+
+        if lock.fd is not None:
+            os.set_inheritable(lock.fd, True)
+
+        _IN_USE_LOCKS[path] = lock
+
+
+def _mark_used(cache_dir: Path) -> None:
+    """Record that the given install was used, this is used to prune the least recently used versions.
+
+    The timestamp is only updated at most once every `LAST_USED_INTERVAL` seconds to avoid a write on every run.
+    """
+    path = cache_dir / LAST_USED_FILENAME
+    try:
+        if time.time() - path.stat().st_mtime < LAST_USED_INTERVAL:
+            return
+    except FileNotFoundError:
+        pass
+    except OSError:
+        return
+
+    try:
+        path.touch()
+    except OSError as exc:
+        log.debug('Could not update %s: %s', path, exc)
+
+
+def _install(version: str, *, cache_dir: Path, args: tuple[object, ...]) -> None:
+    """Install the given pyright version into the cache directory.
+
+    The package is installed into a temporary directory first and then renamed into place
+    so that other processes can never observe a partial install.
+
+    This must only be called while holding the lock for the given version.
+    """
+    import shutil
+    import tempfile
+
+    ROOT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    # clean up any temporary directories left behind by processes that were killed mid-install
+    for path in ROOT_CACHE_DIR.glob(f'.{version}.*.tmp'):
+        log.debug('Removing stale temporary install directory %s', path)
+        shutil.rmtree(path, ignore_errors=True)
+
+    tmp_dir = Path(tempfile.mkdtemp(dir=str(ROOT_CACHE_DIR), prefix=f'.{version}.', suffix='.tmp'))
+    try:
         # We need to create a dummy `package.json` file so that `npm` doesn't try
         # and search for it elsewhere.
         #
         # If it finds a different `package.json` file then the `pyright` package
         # will be installed there instead of our cache directory.
-        if not package_json.exists():
-            package_json.write_text(json.dumps(DEFAULT_PACKAGE_JSON, indent=2))
-
-        silent = '--outputjson' in args
-        node.run(
-            'npm',
-            'install',
-            f'pyright@{version}',
-            cwd=str(cache_dir),
-            check=True,
-            stdout=subprocess.PIPE if silent else sys.stdout,
-            stderr=subprocess.PIPE if silent else sys.stderr,
-        )
+        tmp_dir.joinpath('package.json').write_text(json.dumps(DEFAULT_PACKAGE_JSON, indent=2))
+
+        from . import _store
+
+        if get_installer() == 'tarball':
+            from . import _registry
+
+            with _store.use() as store:
+                _registry.install('pyright', version, dest=tmp_dir, store=store)
+        else:
+            silent = '--outputjson' in args
+            node.run(
+                'npm',
+                'install',
+                f'pyright@{version}',
+                cwd=str(tmp_dir),
+                check=True,
+                stdout=subprocess.PIPE if silent else sys.stdout,
+                stderr=subprocess.PIPE if silent else sys.stderr,
+            )
+
+            # npm has already written every file so deduplicating only saves disk space and not any
+            # I/O, this is opt-in as it requires hashing the entire install
+            with _store.use(default=False) as store:
+                if store is not None:
+                    store.dedupe(tmp_dir / 'node_modules')
+
+        if cache_dir.exists():
+            # this is either a corrupted install or an install from an older version of pyright-python,
+            # move it out of the way first as directories cannot be atomically replaced
+            log.debug('Replacing existing install at %s', cache_dir)
+            try:
+                cache_dir.rename(tmp_dir.with_name(f'{tmp_dir.name}.old.tmp'))
+            except OSError:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+        tmp_dir.rename(cache_dir)
+    finally:
+        for path in (tmp_dir, tmp_dir.with_name(f'{tmp_dir.name}.old.tmp')):
+            if path.exists():
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def get_latest_pyright_version(*, refresh: bool = False) -> str:
+    """Resolve the latest pyright version that is available on npm.
+
+    The resolved version is cached on disk for `PYRIGHT_PYTHON_LATEST_VERSION_TTL` seconds so that
+    `PYRIGHT_PYTHON_FORCE_VERSION=latest` does not have to query the registry on every invocation.
+
+    If the registry cannot be reached then this falls back to the previously cached version or the
+    newest version that has already been installed, unless `refresh` is given.
+    """
+    cache_path = ROOT_CACHE_DIR / 'latest-pyright-version.json'
+    data = _cache.read_json(cache_path)
+    entry = cast(Dict[str, Any], data) if isinstance(data, dict) else {}
+    cached = entry.get('version')
+    checked_at = entry.get('checked_at')
+
+    if not refresh and isinstance(cached, str) and isinstance(checked_at, (int, float)):
+        ttl = env_to_int('PYRIGHT_PYTHON_LATEST_VERSION_TTL', default=DEFAULT_LATEST_VERSION_TTL)
+        if time.time() - checked_at <= ttl:
+            log.debug('Using cached latest pyright version: %s', cached)
+            return cached
+
+    try:
+        if get_installer() == 'tarball':
+            from . import _registry
+
+            version = _registry.latest('pyright')
+        else:
+            version = node.latest('pyright')
+    except Exception as exc:
+        log.debug('Could not resolve the latest pyright version: %s - %s', type(exc), exc)
+
+        fallback = cached if isinstance(cached, str) else _get_newest_installed_version()
+        if fallback is None or refresh:
+            raise
+
+        log.debug('Falling back to pyright version %s', fallback)
+        return fallback
+
+    _cache.write_json(cache_path, {'version': version, 'checked_at': time.time()})
+    return version
 
-    return pkg_dir
+
+def _get_newest_installed_version() -> Optional[str]:
+    versions: list[str] = []
+    if ROOT_CACHE_DIR.exists():
+        for path in ROOT_CACHE_DIR.iterdir():
+            if path.name.startswith('.'):
+                continue
+
+            version = node.get_pkg_version(path / 'node_modules' / 'pyright' / 'package.json')
+            if version is not None:
+                versions.append(version)
+
+    if Path(__file__).parent.joinpath('dist').exists():
+        versions.append(__pyright_version__)
+
+    if not versions:
+        return None
+
+    return max(versions, key=_version_key)
+
+
+def _version_key(version: str) -> Tuple[int, ...]:
+    match = node.VERSION_RE.search(version)
+    if match is None:
+        return ()
+    return tuple(int(value) for value in match.group(0).split('.'))
+
+
+def should_exec() -> bool:
+    """Whether or not the CLI entrypoints should replace the current process with node.
+
+    This is enabled by default on POSIX systems and can be disabled by setting `PYRIGHT_PYTHON_EXEC`
+    to a non-truthy value. It is never used on Windows as `os.execve()` does not replace the process.
+    """
+    if os.name != 'posix':
+        return False
+
+    return env_to_bool('PYRIGHT_PYTHON_EXEC', default=True)
 
 
 def _get_configured_pyright_version() -> str:
@@ -92,10 +323,45 @@ def _get_configured_pyright_version() -> str:
 
 
 def _get_pylance_pyright_version(pylance_version: str) -> str:
+    """Resolve the pyright version that the given Pylance version uses.
+
+    The result is cached on disk. Pylance release versions are immutable and are cached forever while
+    aliases such as `latest-release` are revalidated after `PYRIGHT_PYTHON_PYLANCE_VERSION_TTL` seconds
+    using a conditional request. If the metadata cannot be downloaded then a stale cached entry is used.
+    """
     url = f'https://raw.githubusercontent.com/microsoft/pylance-release/main/releases/{pylance_version}.json'
+    cache_path = ROOT_CACHE_DIR / 'pylance' / f'{re.sub(r"[^A-Za-z0-9._-]", "_", pylance_version)}.json'
+
+    data = _cache.read_json(cache_path)
+    entry = cast(Dict[str, Any], data) if isinstance(data, dict) else {}
+    cached = entry.get('pyright_version')
+    checked_at = entry.get('checked_at')
+    if not isinstance(cached, str) or not isinstance(checked_at, (int, float)):
+        entry = {}
+        cached = None
+    elif PYLANCE_RELEASE_RE.fullmatch(pylance_version):
+        log.debug(f'Using cached pyright version {cached} for Pylance {pylance_version}')
+        return cached
+    else:
+        ttl = env_to_int('PYRIGHT_PYTHON_PYLANCE_VERSION_TTL', default=DEFAULT_PYLANCE_VERSION_TTL)
+        if time.time() - checked_at <= ttl:
+            log.debug(f'Using cached pyright version {cached} for Pylance {pylance_version}')
+            return cached
+
+    from . import _mureq as mureq
+
+    headers: Dict[str, str] = {}
+    etag = entry.get('etag')
+    if cached is not None and isinstance(etag, str):
+        headers['If-None-Match'] = etag
 
     try:
-        response = mureq.get(url, timeout=1)
+        response = mureq.get(url, timeout=1, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            log.debug(f'Pylance {pylance_version} release metadata has not changed')
+            _cache.write_json(cache_path, {**entry, 'checked_at': time.time()})
+            return cached
+
         response.raise_for_status()
 
         data = response.json()
@@ -103,11 +369,18 @@ def _get_pylance_pyright_version(pylance_version: str) -> str:
         version = data['pyrightVersion']
 
         log.debug(f'Pylance {pylance_version} uses pyright version {version}')
-        return version
     except Exception as exc:
         log.debug(f'Failed to download release metadata for Pylance {pylance_version} from {url}: {type(exc)} - {exc}')
+        if cached is not None:
+            log.debug(f'Falling back to cached pyright version {cached} for Pylance {pylance_version}')
+            return cached
         raise
 
+    # the vendored HTTP client is untyped, the headers are an `http.client.HTTPMessage`
+    etag = cast(Mapping[str, str], response.headers).get('ETag')
+    _cache.write_json(cache_path, {'pyright_version': version, 'etag': etag, 'checked_at': time.time()})
+    return version
+
 
 def _should_warn_version(
     *,
@@ -1,31 +1,340 @@
+import os
 import sys
 import logging
-import subprocess
-from typing import Any, List, Union, NoReturn
+import contextvars
+from typing import TYPE_CHECKING, Any, Set, List, Tuple, Union, Mapping, Iterable, NoReturn, Optional, cast
+from pathlib import Path
 
-from . import node
-from ._utils import install_pyright
+if TYPE_CHECKING:
+    import asyncio
+    import subprocess
+
+    from .results import BatchResult, CheckResult, DiagnosticStream
 
 __all__ = (
     'run',
+    'arun',
     'main',
+    'check',
+    'acheck',
+    'check_stream',
+    'batch',
 )
 
 log: logging.Logger = logging.getLogger(__name__)
 
+# set while the `run()` pipeline is ran by `arun()`, pyright is then spawned on the calling event loop
+_spawner: 'contextvars.ContextVar[Optional[_EventLoopSpawner]]' = contextvars.ContextVar('_spawner', default=None)
+
 
 def main(args: List[str], **kwargs: Any) -> int:
     return run(*args, **kwargs).returncode
 
 
 def run(*args: str, **kwargs: Any) -> Union['subprocess.CompletedProcess[bytes]', 'subprocess.CompletedProcess[str]']:
+    # imported lazily so that `import pyright` does not have to import the node helpers
+    from . import _affected, _file_list, _prefilter, _result_cache
+
+    if _file_list.is_enabled() and _file_list.has_response_files(args):
+        from . import errors
+
+        try:
+            args = tuple(_file_list.expand(args, cwd=kwargs.get('cwd')))
+        except errors.PyrightError as exc:
+            from ._report import complete_process
+
+            return complete_process(args, 4, b'', f'{exc.message}\n'.encode(), kwargs)
+
+    if _prefilter.is_enabled():
+        filtered = _prefilter.filter_args(args, cwd=kwargs.get('cwd'))
+        if filtered is None:
+            from ._report import complete_empty
+
+            return complete_empty(args, kwargs)
+
+        args = filtered
+
+    # the affected files have to be resolved first so that they are included in the cache fingerprint
+    if _affected.has_options(args):
+        return _affected.run(args, **kwargs)
+
+    if _result_cache.is_active() and _result_cache.supports(kwargs):
+        return _result_cache.run(args, **kwargs)
+
+    return _run(args, **kwargs)
+
+
+def _run(
+    args: Tuple[str, ...], **kwargs: Any
+) -> Union['subprocess.CompletedProcess[bytes]', 'subprocess.CompletedProcess[str]']:
+    from . import _shard, _file_list
+
+    if _shard.has_options(args):
+        return _shard.run(args, **kwargs)
+
+    if _file_list.is_too_long(args):
+        return _file_list.run(args, **kwargs)
+
+    return _execute(args, **kwargs)
+
+
+def _execute(
+    args: Tuple[str, ...], **kwargs: Any
+) -> Union['subprocess.CompletedProcess[bytes]', 'subprocess.CompletedProcess[str]']:
+    from . import _search_paths
+
+    if _search_paths.is_enabled():
+        with _search_paths.configure(args, cwd=kwargs.get('cwd')) as configured:
+            return _spawn(tuple(configured), **kwargs)
+
+    return _spawn(args, **kwargs)
+
+
+def _spawn(
+    args: Tuple[str, ...], **kwargs: Any
+) -> Union['subprocess.CompletedProcess[bytes]', 'subprocess.CompletedProcess[str]']:
+    from . import node
+
+    script = _get_script(args)
+    spawner = _spawner.get()
+    if spawner is not None:
+        return spawner.spawn(str(script), *args, **kwargs)
+
+    return node.run('node', str(script), *args, **kwargs)
+
+
+class _EventLoopSpawner:
+    """Spawns node processes on an event loop from the thread that `arun()` runs the `run()` pipeline in.
+
+    Every process is ran with `node.arun()` so that it is killed when the pipeline is cancelled.
+    """
+
+    def __init__(self, loop: 'asyncio.AbstractEventLoop') -> None:
+        self._loop = loop
+        self._tasks: Set['asyncio.Future[subprocess.CompletedProcess[bytes]]'] = set()
+        self._cancelled = False
+
+    def spawn(self, *args: str, **kwargs: Any) -> 'subprocess.CompletedProcess[bytes]':
+        import asyncio
+
+        return asyncio.run_coroutine_threadsafe(self._spawn(*args, **kwargs), self._loop).result()
+
+    async def _spawn(self, *args: str, **kwargs: Any) -> 'subprocess.CompletedProcess[bytes]':
+        import asyncio
+
+        from . import node
+
+        # this is always ran on the event loop so the tasks cannot change while they are being cancelled
+        if self._cancelled:
+            raise asyncio.CancelledError()
+
+        task = asyncio.ensure_future(node.arun('node', *args, **kwargs))
+        self._tasks.add(task)
+        try:
+            return await task
+        finally:
+            self._tasks.discard(task)
+
+    def cancel(self) -> None:
+        """Kills every running process, this must be called from the event loop"""
+        self._cancelled = True
+        for task in self._tasks:
+            task.cancel()
+
+
+def check(
+    paths: Iterable[Union[str, 'os.PathLike[str]']] = (),
+    *,
+    args: Iterable[str] = (),
+    cwd: Optional[Union[str, 'os.PathLike[str]']] = None,
+    env: Optional[Mapping[str, str]] = None,
+) -> 'CheckResult':
+    """Run pyright with `--outputjson` on the given paths and return the parsed results.
+
+    `args` are passed to pyright before the paths, e.g. `args=['--project', 'pyproject.toml']`.
+
+    Raises `errors.CheckError` if pyright did not output any results, e.g. if the configuration is invalid.
+    """
+    import subprocess
+
+    proc = run(
+        '--outputjson',
+        *args,
+        *(os.fspath(path) for path in paths),
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    return _parse_result(cast('subprocess.CompletedProcess[bytes]', proc))
+
+
+async def arun(*args: str, **kwargs: Any) -> 'subprocess.CompletedProcess[bytes]':
+    """Asynchronous version of `run()`, see `node.arun()` for the supported arguments.
+
+    The arguments are handled in the same way as `run()`. Many instances can be run concurrently on the same
+    event loop, cancelling the calling task kills pyright.
+    """
+    import asyncio
+    import functools
+    from concurrent.futures import ThreadPoolExecutor
+
+    loop = asyncio.get_running_loop()
+    spawner = _EventLoopSpawner(loop)
+    context = contextvars.copy_context()
+    context.run(_spawner.set, spawner)
+
+    # installing pyright and preparing the arguments is blocking so the pipeline is ran in a thread, a dedicated
+    # thread is used so that the number of concurrent runs is not limited by the default executor
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = loop.run_in_executor(executor, functools.partial(context.run, run, *args, **kwargs))
+    executor.shutdown(wait=False)
+    try:
+        proc = await asyncio.shield(future)
+    except asyncio.CancelledError:
+        spawner.cancel()
+        # the pipeline is waited for so that any temporary files are removed before returning
+        await asyncio.gather(future, return_exceptions=True)
+        raise
+
+    return cast('subprocess.CompletedProcess[bytes]', proc)
+
+
+async def acheck(
+    paths: Iterable[Union[str, 'os.PathLike[str]']] = (),
+    *,
+    args: Iterable[str] = (),
+    cwd: Optional[Union[str, 'os.PathLike[str]']] = None,
+    env: Optional[Mapping[str, str]] = None,
+) -> 'CheckResult':
+    """Asynchronous version of `check()`"""
+    import subprocess
+
+    proc = await arun(
+        '--outputjson',
+        *args,
+        *(os.fspath(path) for path in paths),
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    return _parse_result(proc)
+
+
+def _parse_result(proc: 'subprocess.CompletedProcess[bytes]') -> 'CheckResult':
+    from . import errors
+    from .results import parse_output
+
+    try:
+        return parse_output(proc.stdout, returncode=proc.returncode)
+    except ValueError as exc:
+        output = (proc.stderr or proc.stdout).decode('utf-8', errors='replace').strip()
+        raise errors.CheckError(
+            f'pyright exited with code {proc.returncode}: {output}', returncode=proc.returncode
+        ) from exc
+
+
+def check_stream(
+    paths: Iterable[Union[str, 'os.PathLike[str]']] = (),
+    *,
+    args: Iterable[str] = (),
+    cwd: Optional[Union[str, 'os.PathLike[str]']] = None,
+    env: Optional[Mapping[str, str]] = None,
+) -> 'DiagnosticStream':
+    """Like `check()` but diagnostics are parsed and yielded while pyright is writing them.
+
+    This should be preferred for very large projects as the full output is never held in memory.
+    The returned stream should be closed, e.g. by using it as a context manager, to ensure that
+    pyright is killed if iteration is stopped early.
+
+    Raises `errors.CheckError` during iteration if pyright did not output any results.
+    """
+    import tempfile
+    import subprocess
+
+    from . import node
+    from .results import DiagnosticStream
+
+    all_args = ('--outputjson', *args, *(os.fspath(path) for path in paths))
+    command = node.get_command('node', str(_get_script(all_args)), *all_args, env=env)
+
+    # stderr is spooled to a file so that pyright cannot block on a full pipe while we are reading stdout
+    stderr = tempfile.TemporaryFile()
+    try:
+        process = subprocess.Popen(command.args, cwd=cwd, env=command.env, stdout=subprocess.PIPE, stderr=stderr)
+    except BaseException:
+        stderr.close()
+        raise
+
+    assert process.stdout is not None
+    return DiagnosticStream(process.stdout, process=process, stderr=stderr)
+
+
+def batch(
+    paths: Iterable[Union[str, 'os.PathLike[str]']] = ('.',),
+    *,
+    args: Iterable[str] = (),
+    jobs: Optional[int] = None,
+    env: Optional[Mapping[str, str]] = None,
+) -> 'BatchResult':
+    """Check every pyright project under the given paths in parallel.
+
+    A project is any directory with a `pyrightconfig.json` file or a `pyproject.toml` file with a `[tool.pyright]`
+    section. Each project is checked by a separate pyright process, at most `jobs` processes are ran at the same
+    time which defaults to the number of CPUs, bounded by the available memory.
+    """
+    from . import _batch
+
+    return _batch.run([Path(path) for path in paths], args=tuple(args), jobs=jobs, env=env)
+
+
+def _get_script(args: Tuple[str, ...]) -> Path:
+    from ._utils import install_pyright
+
     pkg_dir = install_pyright(args, quiet=None)
     script = pkg_dir / 'index.js'
     if not script.exists():
         raise RuntimeError(f'Expected CLI entrypoint: {script} to exist')
 
-    return node.run('node', str(script), *args, **kwargs)
+    return script
 
 
 def entrypoint() -> NoReturn:
-    sys.exit(main(sys.argv[1:]))
+    from . import _file_list, _prefilter
+
+    args = sys.argv[1:]
+    if _file_list.is_enabled() and _file_list.has_response_files(args):
+        from . import errors
+
+        try:
+            args = _file_list.expand(args)
+        except errors.PyrightError as exc:
+            print(exc.message, file=sys.stderr)
+            sys.exit(4)
+
+    if _prefilter.is_enabled():
+        # this is checked before anything else so that skipped runs are as fast as possible
+        filtered = _prefilter.filter_args(args)
+        if filtered is None:
+            from ._report import complete_empty
+
+            complete_empty(args, {})
+            sys.exit(0)
+
+        args = list(filtered)
+
+    from . import node, _shard, _affected, _result_cache, _search_paths
+    from ._utils import should_exec
+
+    if (
+        should_exec()
+        and not _search_paths.is_enabled()
+        and not _shard.has_options(args)
+        and not _affected.has_options(args)
+        and not _result_cache.is_active()
+        and not _file_list.is_too_long(args)
+    ):
+        node.execute('node', str(_get_script(tuple(args))), *args)
+
+    sys.exit(main(args))
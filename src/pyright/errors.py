@@ -24,3 +24,19 @@ class BinaryNotFound(NodeError):
 
 class VersionCheckFailed(NodeError):
     pass
+
+
+class RegistryError(PyrightError):
+    pass
+
+
+class ArchiveError(PyrightError):
+    pass
+
+
+class CheckError(PyrightError):
+    returncode: int
+
+    def __init__(self, message: str, *, returncode: int) -> None:
+        super().__init__(message)
+        self.returncode = returncode
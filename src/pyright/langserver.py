@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 import sys
-import subprocess
-from typing import Any, NoReturn
+from typing import TYPE_CHECKING, Any, NoReturn
+from pathlib import Path
 
-from . import node
-from ._utils import install_pyright
+if TYPE_CHECKING:
+    import subprocess
 
 
 def main(*args: str, **kwargs: Any) -> int:
@@ -16,17 +16,51 @@ def run(
     *args: str,
     **kwargs: Any,
 ) -> subprocess.CompletedProcess[bytes] | subprocess.CompletedProcess[str]:
+    # imported lazily so that `import pyright` does not have to import the node helpers
+    from . import node, _search_paths
+
+    binary = _get_binary(args)
+    if _search_paths.is_enabled():
+        kwargs['env'] = _search_paths.get_env(kwargs.get('env'))
+
+    # TODO: remove `--`?
+    return node.run('node', str(binary), '--', *args, **kwargs)
+
+
+async def arun(*args: str, **kwargs: Any) -> subprocess.CompletedProcess[bytes]:
+    """Asynchronous version of `run()`, see `node.arun()` for the supported arguments"""
+    import asyncio
+
+    from . import node, _search_paths
+
+    binary = await asyncio.get_running_loop().run_in_executor(None, _get_binary, args)
+    if _search_paths.is_enabled():
+        kwargs['env'] = _search_paths.get_env(kwargs.get('env'))
+
+    return await node.arun('node', str(binary), '--', *args, **kwargs)
+
+
+def _get_binary(args: tuple[str, ...]) -> Path:
+    from ._utils import install_pyright
+
     pkg_dir = install_pyright(args, quiet=True)
     binary = pkg_dir / 'langserver.index.js'
     if not binary.exists():
         raise RuntimeError(f'Expected language server entrypoint: {binary} to exist')
 
-    # TODO: remove `--`?
-    return node.run('node', str(binary), '--', *args, **kwargs)
+    return binary
 
 
 def entrypoint() -> NoReturn:
-    sys.exit(main(*sys.argv[1:]))
+    from . import node, _search_paths
+    from ._utils import should_exec
+
+    args = sys.argv[1:]
+    if should_exec():
+        env = _search_paths.get_env() if _search_paths.is_enabled() else None
+        node.execute('node', str(_get_binary(tuple(args))), '--', *args, env=env)
+
+    sys.exit(main(*args))
 
 
 if __name__ == '__main__':
@@ -5,29 +5,55 @@ import re
 import sys
 import json
 import shutil
+import hashlib
 import logging
 import platform
 import subprocess
-import importlib.util
-from typing import Any, Dict, Tuple, Union, Mapping, Optional, NamedTuple, cast
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Union, Mapping, NoReturn, Optional, NamedTuple, cast
 from pathlib import Path
 from functools import lru_cache
 from typing_extensions import Literal, assert_never
 
-from . import errors
+from . import _cache, errors
 from .types import Target, check_target
-from .utils import env_to_bool, get_bin_dir, get_env_dir, maybe_decode
+from .utils import env_to_bool, get_bin_dir, get_env_dir, maybe_decode, get_cache_dir
+
+if TYPE_CHECKING:
+    import asyncio
 
 log: logging.Logger = logging.getLogger(__name__)
 
-ENV_DIR: Path = get_env_dir()
-BINARIES_DIR: Path = get_bin_dir(env_dir=ENV_DIR)
+# these are resolved lazily by `__getattr__()` as they're only needed when using nodeenv
+ENV_DIR: Path
+BINARIES_DIR: Path
 USE_GLOBAL_NODE = env_to_bool('PYRIGHT_PYTHON_GLOBAL_NODE', default=True)
 USE_NODEJS_WHEEL = env_to_bool('PYRIGHT_PYTHON_NODEJS_WHEEL', default=True)
+USE_STRATEGY_CACHE = env_to_bool('PYRIGHT_PYTHON_STRATEGY_CACHE', default=True)
 NODE_VERSION = os.environ.get('PYRIGHT_PYTHON_NODE_VERSION', default=None)
+STRATEGY_CACHE_MAX_ENTRIES = 32
 VERSION_RE = re.compile(r'\d+\.\d+\.\d+')
 
 
+def __getattr__(name: str) -> Any:
+    if name == 'ENV_DIR':
+        value = get_env_dir()
+    elif name == 'BINARIES_DIR':
+        value = get_bin_dir(env_dir=_get_env_dir())
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    globals()[name] = value
+    return value
+
+
+def _get_env_dir() -> Path:
+    return globals().get('ENV_DIR') or __getattr__('ENV_DIR')
+
+
+def _get_binaries_dir() -> Path:
+    return globals().get('BINARIES_DIR') or __getattr__('BINARIES_DIR')
+
+
 def _is_windows() -> bool:
     return platform.system().lower() == 'windows'
 
@@ -59,7 +85,7 @@ def _ensure_node_env(target: Target) -> Path:
 
 
 def _get_nodeenv_path(target: Target) -> Path:
-    return BINARIES_DIR.joinpath(target + _postfix_for_target(target))
+    return _get_binaries_dir().joinpath(target + _postfix_for_target(target))
 
 
 def _get_global_binary(target: Target) -> Optional[Path]:
@@ -81,12 +107,13 @@ def _get_global_binary(target: Target) -> Optional[Path]:
 
 
 def _install_node_env() -> None:
-    log.debug('Installing nodeenv to %s', ENV_DIR)
+    env_dir = _get_env_dir()
+    log.debug('Installing nodeenv to %s', env_dir)
     args = [sys.executable, '-m', 'nodeenv']
     if NODE_VERSION:
         log.debug(f'Using user specified node version: {NODE_VERSION}')
         args += ['--node', NODE_VERSION, '--force']
-    args.append(str(ENV_DIR))
+    args.append(str(env_dir))
     log.debug('Running command with args: %s', args)
 
     try:
@@ -115,7 +142,24 @@ Strategy = Union[GlobalStrategy, NodeJSWheelStrategy, NodeenvStrategy]
 
 
 def _resolve_strategy(target: Target) -> Strategy:
+    if not USE_STRATEGY_CACHE:
+        return _probe_strategy(target)
+
+    key = _strategy_cache_key(target)
+    strategy = _get_cached_strategy(key)
+    if strategy is not None:
+        log.debug('Using cached %s strategy for %s', strategy.type, target)
+        return strategy
+
+    strategy = _probe_strategy(target)
+    _cache_strategy(key, strategy)
+    return strategy
+
+
+def _probe_strategy(target: Target) -> Strategy:
     if USE_NODEJS_WHEEL:
+        import importlib.util
+
         if importlib.util.find_spec('nodejs_wheel') is not None:
             log.debug('Using nodejs_wheel package for resolving binaries')
             return NodeJSWheelStrategy(type='nodejs_wheel')
@@ -130,6 +174,104 @@ def _resolve_strategy(target: Target) -> Strategy:
     return NodeenvStrategy(type='nodeenv', path=_ensure_node_env(target))
 
 
+def _get_strategy_cache_path() -> Path:
+    return get_cache_dir() / 'pyright-python' / 'strategies.json'
+
+
+def _strategy_cache_key(target: Target) -> str:
+    """Returns a key that identifies all of the inputs that strategy resolution depends on."""
+    inputs = {
+        'target': target,
+        'use_nodejs_wheel': USE_NODEJS_WHEEL,
+        'use_global_node': USE_GLOBAL_NODE,
+        'node_version': NODE_VERSION,
+        'env_dir': str(_get_env_dir()),
+        'binaries_dir': str(_get_binaries_dir()),
+        'executable': sys.executable,
+        'path': os.environ.get('PATH', ''),
+        'env': sorted((key, value) for key, value in os.environ.items() if key.startswith('PYRIGHT_PYTHON_')),
+        # installing or removing `nodejs_wheel` modifies the site-packages directory
+        'sys_path': [(entry, _get_mtime(Path(entry))) for entry in sys.path if entry] if USE_NODEJS_WHEEL else None,
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _get_strategy_binary(strategy: Strategy) -> Optional[Path]:
+    if strategy.type == 'nodejs_wheel':
+        import importlib.util
+
+        spec = importlib.util.find_spec('nodejs_wheel')
+        if spec is None or not spec.submodule_search_locations:
+            return None
+
+        root = Path(list(spec.submodule_search_locations)[0])
+        if _is_windows():
+            return root / 'node.exe'
+        return root / 'bin' / 'node'
+
+    return strategy.path
+
+
+def _get_mtime(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _get_cached_strategy(key: str) -> Optional[Strategy]:
+    data = _cache.read_json(_get_strategy_cache_path())
+    if not isinstance(data, dict):
+        return None
+
+    value = cast(Dict[str, Any], data).get(key)
+    if not isinstance(value, dict):
+        return None
+
+    entry = cast(Dict[str, Any], value)
+
+    try:
+        path = Path(entry['path'])
+        if _get_mtime(path) != entry['mtime']:
+            log.debug('Cached binary at %s has changed, ignoring cached strategy', path)
+            return None
+
+        if entry['type'] == 'global':
+            return GlobalStrategy(type='global', path=path)
+        elif entry['type'] == 'nodejs_wheel':
+            return NodeJSWheelStrategy(type='nodejs_wheel')
+        elif entry['type'] == 'nodeenv':
+            return NodeenvStrategy(type='nodeenv', path=path)
+    except (KeyError, TypeError):
+        log.debug('Ignoring malformed strategy cache entry: %s', entry)
+
+    return None
+
+
+def _cache_strategy(key: str, strategy: Strategy) -> None:
+    path = _get_strategy_binary(strategy)
+    if path is None:
+        return
+
+    path = path.absolute()
+    mtime = _get_mtime(path)
+    if mtime is None:
+        return
+
+    cache_path = _get_strategy_cache_path()
+    data = _cache.read_json(cache_path)
+    entries: Dict[str, Any] = cast(Dict[str, Any], data) if isinstance(data, dict) else {}
+
+    # remove the oldest entries, this ensures the cache does not grow unbounded
+    # when the PATH or environment variables are frequently changing
+    entries.pop(key, None)
+    while len(entries) >= STRATEGY_CACHE_MAX_ENTRIES:
+        entries.pop(next(iter(entries)))
+
+    entries[key] = {'type': strategy.type, 'path': str(path), 'mtime': mtime}
+    _cache.write_json(cache_path, entries)
+
+
 def run(
     target: Target, *args: str, **kwargs: Any
 ) -> Union['subprocess.CompletedProcess[bytes]', 'subprocess.CompletedProcess[str]']:
@@ -159,23 +301,154 @@ def run(
         else:
             assert_never(target)
     elif strategy.type == 'nodeenv':
-        env = kwargs.pop('env', None) or os.environ.copy()
-        env.update(get_env_variables())
+        command = _get_command(target, strategy, args, env=kwargs.pop('env', None))
+        log.debug('Running nodeenv command with args: %s', command.args)
+        return cast(
+            'subprocess.CompletedProcess[str] | subprocess.CompletedProcess[bytes]',
+            subprocess.run(command.args, env=command.env, **kwargs),
+        )
+    else:
+        assert_never(strategy)
+
+
+async def arun(
+    target: Target,
+    *args: str,
+    input: Optional[bytes] = None,
+    check: bool = False,
+    env: Optional[Mapping[str, str]] = None,
+    **kwargs: Any,
+) -> 'subprocess.CompletedProcess[bytes]':
+    """Asynchronous version of `run()`, the target binary is resolved in the same way.
+
+    Keyword arguments are passed to `asyncio.create_subprocess_exec()`, output is always returned as bytes.
+
+    If the calling task is cancelled then the node process is killed, on POSIX systems node is started in
+    its own session so that any processes it spawned are killed as well.
+    """
+    import asyncio
+
+    check_target(target)
+    command = get_command(target, *args, env=env)
+    if not _is_windows():
+        kwargs.setdefault('start_new_session', True)
+
+    log.debug('Running async command with args: %s', command.args)
+    process = await asyncio.create_subprocess_exec(*command.args, env=command.env, **kwargs)
+    try:
+        stdout, stderr = await process.communicate(input)
+    except BaseException:
+        await _kill_tree(process, process_group=bool(kwargs.get('start_new_session')))
+        raise
+
+    returncode = cast(int, process.returncode)
+    if check and returncode:
+        raise subprocess.CalledProcessError(returncode, command.args, stdout, stderr)
+
+    return subprocess.CompletedProcess(command.args, returncode, stdout, stderr)
+
+
+async def _kill_tree(process: 'asyncio.subprocess.Process', *, process_group: bool) -> None:
+    if process.returncode is not None:
+        return
+
+    log.debug('Killing process %s', process.pid)
+    try:
+        if _is_windows():
+            import asyncio
+
+            taskkill = await asyncio.create_subprocess_exec(
+                'taskkill',
+                '/F',
+                '/T',
+                '/PID',
+                str(process.pid),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            await taskkill.wait()
+        elif process_group:
+            import signal
+
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except OSError as exc:
+        log.debug('Could not kill process %s: %s', process.pid, exc)
+
+    await process.wait()
+
+
+class Command(NamedTuple):
+    args: List[str]
+
+    # `None` means that the current environment should be inherited
+    env: Optional[Dict[str, str]]
+
+
+def get_command(target: Target, *args: str, env: Optional[Mapping[str, str]] = None) -> Command:
+    """Returns the arguments and environment variables required to run the given target binary.
+
+    This uses the same binary resolution and environment setup as `run()` but does not spawn anything.
+    """
+    check_target(target)
+    return _get_command(target, _resolve_strategy(target), args, env=env)
+
+
+def _get_command(
+    target: Target,
+    strategy: Strategy,
+    args: Tuple[str, ...],
+    *,
+    env: Optional[Mapping[str, str]],
+) -> Command:
+    if strategy.type == 'global':
+        return Command(args=[str(strategy.path), *args], env=dict(env) if env is not None else None)
+    elif strategy.type == 'nodejs_wheel':
+        binary = _get_strategy_binary(strategy)
+        if binary is None:
+            raise errors.NodeError('Could not resolve the nodejs_wheel package')
+
+        if target == 'node':
+            node_args = [str(binary), *args]
+        elif target == 'npm':
+            npm_cli = binary.parents[0 if _is_windows() else 1] / 'lib' / 'node_modules' / 'npm' / 'bin' / 'npm-cli.js'
+            node_args = [str(binary), str(npm_cli), *args]
+        else:
+            assert_never(target)
+
+        return Command(args=node_args, env=dict(env) if env is not None else None)
+    elif strategy.type == 'nodeenv':
+        new_env = dict(env) if env else os.environ.copy()
+        new_env.update(get_env_variables())
 
         # If we're using `nodeenv` to resolve the node binary then we also need
         # to ensure that `node` is in the PATH so that any install scripts that
         # assume it is present will work.
-        env.update(PATH=_update_path_env(env=env, target_bin=strategy.path.parent))
-        node_args = [str(strategy.path), *args]
-        log.debug('Running nodeenv command with args: %s', node_args)
-        return cast(
-            'subprocess.CompletedProcess[str] | subprocess.CompletedProcess[bytes]',
-            subprocess.run(node_args, env=env, **kwargs),
-        )
+        new_env.update(PATH=_update_path_env(env=new_env, target_bin=strategy.path.parent))
+        return Command(args=[str(strategy.path), *args], env=new_env)
     else:
         assert_never(strategy)
 
 
+def execute(target: Target, *args: str, env: Optional[Mapping[str, str]] = None) -> NoReturn:
+    """Replace the current process with the given target binary.
+
+    This avoids keeping a Python interpreter alive as the parent of the node process, signals
+    are delivered directly to node and its exit code becomes the exit code of the process.
+
+    This is only supported on POSIX systems as `os.execve()` does not replace the process on Windows.
+    """
+    command = get_command(target, *args, env=env)
+    log.debug('Replacing the current process with args: %s', command.args)
+
+    # anything that has been buffered would otherwise be lost
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    os.execve(command.args[0], command.args, command.env if command.env is not None else os.environ)
+
+
 def version(target: Target) -> Tuple[int, ...]:
     proc = run(target, '--version', stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
     output = maybe_decode(proc.stdout)
@@ -220,10 +493,11 @@ def get_env_variables() -> Dict[str, Any]:
     """Return the environmental variables that should be passed to a binary"""
     # NOTE: I do not actually know if these result in the intended behaviour
     #       I simply copied them from bin/shim in nodeenv
+    env_dir = _get_env_dir()
     return {
-        'NODE_PATH': str(ENV_DIR / 'lib' / 'node_modules'),
-        'NPM_CONFIG_PREFIX': str(ENV_DIR),
-        'npm_config_prefix': str(ENV_DIR),
+        'NODE_PATH': str(env_dir / 'lib' / 'node_modules'),
+        'NPM_CONFIG_PREFIX': str(env_dir),
+        'npm_config_prefix': str(env_dir),
     }
 
 
@@ -0,0 +1,615 @@
+"""Typed records for the output of `pyright --outputjson`.
+
+These are designed to use as little memory as possible as large projects can report hundreds of thousands
+of diagnostics, every record uses `__slots__` and repeated strings such as file paths and rule names are interned.
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import json
+import codecs
+from types import TracebackType
+from typing import IO, TYPE_CHECKING, Any, Set, Dict, List, Tuple, Union, Iterable, Iterator, Optional, cast
+from typing_extensions import Literal, Protocol
+
+if TYPE_CHECKING:
+    import subprocess
+
+__all__ = (
+    'Severity',
+    'Position',
+    'Range',
+    'Diagnostic',
+    'Summary',
+    'CheckResult',
+    'ProjectResult',
+    'BatchResult',
+    'DiagnosticStream',
+    'parse_output',
+    'parse_stream',
+    'merge_results',
+)
+
+Severity = Literal['error', 'warning', 'information']
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+
+
+class _BinaryReader(Protocol):
+    """A binary stream that the output can be read from, e.g. a file, a pipe or an `io.RawIOBase`"""
+
+    def read(self, __size: int = ...) -> Optional[bytes]: ...
+
+    def close(self) -> None: ...
+
+
+class Position:
+    """A zero-based position in a file"""
+
+    __slots__ = ('line', 'character')
+
+    line: int
+    character: int
+
+    def __init__(self, line: int, character: int) -> None:
+        self.line = line
+        self.character = character
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Position):
+            return NotImplemented
+        return self.line == other.line and self.character == other.character
+
+    def __hash__(self) -> int:
+        return hash((self.line, self.character))
+
+    def __repr__(self) -> str:
+        return f'Position(line={self.line}, character={self.character})'
+
+
+class Range:
+    """The range in a file that a diagnostic applies to.
+
+    The positions are stored inline and `start` / `end` are created on access.
+    """
+
+    __slots__ = ('start_line', 'start_character', 'end_line', 'end_character')
+
+    start_line: int
+    start_character: int
+    end_line: int
+    end_character: int
+
+    def __init__(self, start_line: int, start_character: int, end_line: int, end_character: int) -> None:
+        self.start_line = start_line
+        self.start_character = start_character
+        self.end_line = end_line
+        self.end_character = end_character
+
+    @property
+    def start(self) -> Position:
+        return Position(self.start_line, self.start_character)
+
+    @property
+    def end(self) -> Position:
+        return Position(self.end_line, self.end_character)
+
+    def _key(self) -> Tuple[int, int, int, int]:
+        return (self.start_line, self.start_character, self.end_line, self.end_character)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Range):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        return f'Range(start={self.start!r}, end={self.end!r})'
+
+
+class Diagnostic:
+    __slots__ = ('file', 'severity', 'message', 'rule', 'range')
+
+    file: str
+    severity: Severity
+    message: str
+    rule: Optional[str]
+    range: Optional[Range]
+
+    def __init__(
+        self,
+        file: str,
+        severity: Severity,
+        message: str,
+        rule: Optional[str] = None,
+        range: Optional[Range] = None,
+    ) -> None:
+        self.file = file
+        self.severity = severity
+        self.message = message
+        self.rule = rule
+        self.range = range
+
+    def to_json(self) -> Dict[str, Any]:
+        """Returns the diagnostic in the same format that pyright outputs"""
+        data: Dict[str, Any] = {'file': self.file, 'severity': self.severity, 'message': self.message}
+        if self.range is not None:
+            data['range'] = {
+                'start': {'line': self.range.start_line, 'character': self.range.start_character},
+                'end': {'line': self.range.end_line, 'character': self.range.end_character},
+            }
+        if self.rule is not None:
+            data['rule'] = self.rule
+        return data
+
+    def _key(self) -> Tuple[Any, ...]:
+        return (self.file, self.severity, self.message, self.rule, self.range)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Diagnostic):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        return (
+            f'Diagnostic(file={self.file!r}, severity={self.severity!r}, message={self.message!r}, '
+            + f'rule={self.rule!r}, range={self.range!r})'
+        )
+
+
+class Summary:
+    __slots__ = ('files_analyzed', 'error_count', 'warning_count', 'information_count', 'time_in_sec')
+
+    files_analyzed: int
+    error_count: int
+    warning_count: int
+    information_count: int
+    time_in_sec: float
+
+    def __init__(
+        self,
+        files_analyzed: int = 0,
+        error_count: int = 0,
+        warning_count: int = 0,
+        information_count: int = 0,
+        time_in_sec: float = 0,
+    ) -> None:
+        self.files_analyzed = files_analyzed
+        self.error_count = error_count
+        self.warning_count = warning_count
+        self.information_count = information_count
+        self.time_in_sec = time_in_sec
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'filesAnalyzed': self.files_analyzed,
+            'errorCount': self.error_count,
+            'warningCount': self.warning_count,
+            'informationCount': self.information_count,
+            'timeInSec': self.time_in_sec,
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Summary):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'Summary({fields})'
+
+
+class CheckResult:
+    __slots__ = ('version', 'time', 'diagnostics', 'summary', 'returncode')
+
+    version: Optional[str]
+    time: Optional[str]
+    diagnostics: List[Diagnostic]
+    summary: Summary
+    returncode: int
+
+    def __init__(
+        self,
+        *,
+        diagnostics: List[Diagnostic],
+        summary: Summary,
+        returncode: int,
+        version: Optional[str] = None,
+        time: Optional[str] = None,
+    ) -> None:
+        self.version = version
+        self.time = time
+        self.diagnostics = diagnostics
+        self.summary = summary
+        self.returncode = returncode
+
+    @property
+    def errors(self) -> List[Diagnostic]:
+        return [diagnostic for diagnostic in self.diagnostics if diagnostic.severity == 'error']
+
+    @property
+    def warnings(self) -> List[Diagnostic]:
+        return [diagnostic for diagnostic in self.diagnostics if diagnostic.severity == 'warning']
+
+    def to_json(self) -> Dict[str, Any]:
+        """Returns the result in the same format as `pyright --outputjson`"""
+        return {
+            'version': self.version,
+            'time': self.time,
+            'generalDiagnostics': [diagnostic.to_json() for diagnostic in self.diagnostics],
+            'summary': self.summary.to_json(),
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f'CheckResult(version={self.version!r}, returncode={self.returncode!r}, '
+            + f'diagnostics=[... {len(self.diagnostics)} items], summary={self.summary!r})'
+        )
+
+
+def merge_results(results: Iterable[CheckResult]) -> CheckResult:
+    """Combine the results of checking separate parts of a project into a single result.
+
+    Diagnostics that were reported by more than one process, e.g. for a module that was imported
+    by files in different shards, are only included once and the counts are updated to match.
+    Identical diagnostics within a single result are kept as pyright reported them.
+    """
+    merged = CheckResult(diagnostics=[], summary=Summary(), returncode=0)
+    seen: Set[Diagnostic] = set()
+    for result in results:
+        merged.version = merged.version or result.version
+        merged.time = merged.time or result.time
+        merged.returncode = max(merged.returncode, result.returncode)
+        merged.summary.files_analyzed += result.summary.files_analyzed
+        merged.summary.time_in_sec = max(merged.summary.time_in_sec, result.summary.time_in_sec)
+
+        for diagnostic in result.diagnostics:
+            if diagnostic in seen:
+                continue
+
+            merged.diagnostics.append(diagnostic)
+            if diagnostic.severity == 'error':
+                merged.summary.error_count += 1
+            elif diagnostic.severity == 'warning':
+                merged.summary.warning_count += 1
+            else:
+                merged.summary.information_count += 1
+
+        seen.update(result.diagnostics)
+
+    return merged
+
+
+class ProjectResult:
+    """The result of checking a single project with `pyright.batch()`.
+
+    `result` is `None` if pyright did not output any results, `error` will then contain its output.
+    """
+
+    __slots__ = ('root', 'result', 'returncode', 'time_in_sec', 'error')
+
+    root: str
+    result: Optional[CheckResult]
+    returncode: int
+    time_in_sec: float
+    error: Optional[str]
+
+    def __init__(
+        self,
+        root: str,
+        *,
+        result: Optional[CheckResult],
+        returncode: int,
+        time_in_sec: float,
+        error: Optional[str] = None,
+    ) -> None:
+        self.root = root
+        self.result = result
+        self.returncode = returncode
+        self.time_in_sec = time_in_sec
+        self.error = error
+
+    def to_json(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {'root': self.root, 'returncode': self.returncode, 'timeInSec': self.time_in_sec}
+        if self.result is not None:
+            data['summary'] = self.result.summary.to_json()
+        if self.error is not None:
+            data['error'] = self.error
+        return data
+
+    def __repr__(self) -> str:
+        return (
+            f'ProjectResult(root={self.root!r}, returncode={self.returncode!r}, '
+            + f'time_in_sec={self.time_in_sec!r}, result={self.result!r}, error={self.error!r})'
+        )
+
+
+class BatchResult:
+    __slots__ = ('projects', 'time_in_sec')
+
+    projects: List[ProjectResult]
+    time_in_sec: float
+
+    def __init__(self, projects: List[ProjectResult], *, time_in_sec: float) -> None:
+        self.projects = projects
+        self.time_in_sec = time_in_sec
+
+    @property
+    def returncode(self) -> int:
+        return max((project.returncode for project in self.projects), default=0)
+
+    @property
+    def diagnostics(self) -> List[Diagnostic]:
+        return [diagnostic for project in self.projects if project.result for diagnostic in project.result.diagnostics]
+
+    @property
+    def summary(self) -> Summary:
+        summary = Summary(time_in_sec=self.time_in_sec)
+        for project in self.projects:
+            if project.result is not None:
+                summary.files_analyzed += project.result.summary.files_analyzed
+                summary.error_count += project.result.summary.error_count
+                summary.warning_count += project.result.summary.warning_count
+                summary.information_count += project.result.summary.information_count
+        return summary
+
+    def to_json(self) -> Dict[str, Any]:
+        """Returns an aggregated report in the same format as `pyright --outputjson` with an extra `projects` key"""
+        version = next((project.result.version for project in self.projects if project.result), None)
+        return {
+            'version': version,
+            'projects': [project.to_json() for project in self.projects],
+            'generalDiagnostics': [diagnostic.to_json() for diagnostic in self.diagnostics],
+            'summary': self.summary.to_json(),
+        }
+
+    def __repr__(self) -> str:
+        return f'BatchResult(returncode={self.returncode!r}, projects=[... {len(self.projects)} items])'
+
+
+def parse_output(data: Union[str, bytes], *, returncode: int = 0) -> CheckResult:
+    """Parse the output of `pyright --outputjson`.
+
+    Diagnostics are converted to records while the JSON document is being decoded so that the decoded
+    dictionaries for every diagnostic never have to be held in memory at the same time.
+    """
+    document = json.loads(data, object_hook=_object_hook)
+    if not isinstance(document, dict):
+        raise ValueError('Expected the pyright output to be a JSON object')
+
+    output = cast(Dict[str, Any], document)
+    summary = output.get('summary')
+    return CheckResult(
+        version=output.get('version'),
+        time=output.get('time'),
+        diagnostics=output.get('generalDiagnostics', []),
+        summary=summary if isinstance(summary, Summary) else Summary(),
+        returncode=returncode,
+    )
+
+
+class DiagnosticStream:
+    """Yields diagnostics from the output of `pyright --outputjson` as they are read.
+
+    The full output is never held in memory, only the diagnostic that is currently being decoded.
+    `version`, `time` and `summary` are set once they have been read and `returncode` is set once
+    pyright has exited, which is guaranteed after iteration has finished.
+    """
+
+    version: Optional[str]
+    time: Optional[str]
+    summary: Optional[Summary]
+    returncode: Optional[int]
+
+    def __init__(
+        self,
+        stream: _BinaryReader,
+        *,
+        process: Optional[subprocess.Popen[bytes]] = None,
+        stderr: Optional[IO[bytes]] = None,
+    ) -> None:
+        self.version = None
+        self.time = None
+        self.summary = None
+        self.returncode = None
+        self._stream = stream
+        self._process = process
+        self._stderr = stderr
+        self._started = False
+
+    def __iter__(self) -> Iterator[Diagnostic]:
+        if self._started:
+            raise RuntimeError('DiagnosticStream can only be iterated once')
+
+        self._started = True
+        return self._iterate()
+
+    def _iterate(self) -> Iterator[Diagnostic]:
+        try:
+            yield from self._parse(_Reader(self._stream))
+        except ValueError as exc:
+            self._wait()
+            if self._process is None:
+                raise
+
+            from .errors import CheckError
+
+            output = b''
+            if self._stderr is not None:
+                self._stderr.seek(0)
+                output = self._stderr.read()
+
+            message = output.decode('utf-8', errors='replace').strip() or str(exc)
+            raise CheckError(
+                f'pyright exited with code {self.returncode}: {message}', returncode=self.returncode or 0
+            ) from exc
+
+        self._wait()
+
+    def _parse(self, reader: _Reader) -> Iterator[Diagnostic]:
+        decoder = json.JSONDecoder(object_hook=_object_hook)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+
+        while True:
+            key = reader.decode(decoder)
+            reader.expect(':')
+            if key == 'generalDiagnostics':
+                reader.expect('[')
+                if reader.peek() == ']':
+                    reader.expect(']')
+                else:
+                    while True:
+                        yield reader.decode(decoder)
+                        if reader.peek() == ']':
+                            reader.expect(']')
+                            break
+                        reader.expect(',')
+            else:
+                value = reader.decode(decoder)
+                if key == 'version':
+                    self.version = value
+                elif key == 'time':
+                    self.time = value
+                elif key == 'summary' and isinstance(value, Summary):
+                    self.summary = value
+
+            if reader.peek() == '}':
+                reader.expect('}')
+                return
+            reader.expect(',')
+
+    def _wait(self) -> None:
+        if self._process is not None:
+            self._stream.close()
+            self.returncode = self._process.wait()
+        elif self.returncode is None:
+            self.returncode = 0
+
+    def close(self) -> None:
+        """Stop reading the output, pyright is killed if it is still running"""
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+
+        self._stream.close()
+        if self._stderr is not None:
+            self._stderr.close()
+
+    def __enter__(self) -> DiagnosticStream:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def parse_stream(stream: _BinaryReader) -> DiagnosticStream:
+    """Incrementally parse the output of `pyright --outputjson` from a binary file object, e.g. a file or a pipe"""
+    return DiagnosticStream(stream)
+
+
+class _Reader:
+    """A minimal pull tokenizer on top of a binary stream, values are decoded with `json`"""
+
+    def __init__(self, stream: _BinaryReader) -> None:
+        self._stream = stream
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._read = cast(Any, getattr(stream, 'read1', stream.read))
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Read more data into the buffer, returns `False` if the end of the stream has been reached"""
+        if self.eof:
+            return False
+
+        # drop everything that has already been consumed
+        self.buffer = self.buffer[self.pos :]
+        self.pos = 0
+
+        chunk = self._read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            self.buffer += self._decoder.decode(b'', final=True)
+            return False
+
+        self.buffer += self._decoder.decode(chunk)
+        return True
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it, or an empty string at the end of the stream"""
+        while True:
+            self.pos = cast('re.Match[str]', WHITESPACE_RE.match(self.buffer, self.pos)).end()
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos : self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f'Expected {char!r} in pyright output but found {found!r}')
+
+        self.pos += 1
+
+    def decode(self, decoder: json.JSONDecoder) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+
+            # a number could have been truncated at the end of the buffer, any other value is complete
+            if end == len(self.buffer) and isinstance(value, (int, float)) and self.fill():
+                continue
+
+            self.pos = end
+            return value
+
+
+def _object_hook(obj: Dict[str, Any]) -> Any:
+    # `json` decodes the innermost objects first, so positions and ranges have
+    # already been converted by the time the diagnostic itself is decoded
+    if 'line' in obj and 'character' in obj and len(obj) == 2:
+        return (obj['line'], obj['character'])
+
+    if 'start' in obj and 'end' in obj and len(obj) == 2 and isinstance(obj['start'], tuple):
+        start, end = cast(Tuple[Tuple[int, int], Tuple[int, int]], (obj['start'], obj['end']))
+        return Range(*start, *end)
+
+    if 'severity' in obj and 'message' in obj:
+        rule = obj.get('rule')
+        return Diagnostic(
+            file=sys.intern(obj.get('file', '')),
+            severity=cast(Severity, sys.intern(obj['severity'])),
+            message=obj['message'],
+            rule=sys.intern(rule) if rule is not None else None,
+            range=obj.get('range'),
+        )
+
+    if 'filesAnalyzed' in obj and 'errorCount' in obj:
+        return Summary(
+            files_analyzed=obj['filesAnalyzed'],
+            error_count=obj['errorCount'],
+            warning_count=obj.get('warningCount', 0),
+            information_count=obj.get('informationCount', 0),
+            time_in_sec=obj.get('timeInSec', 0),
+        )
+
+    return obj
@@ -1,14 +1,19 @@
 import os
 import sys
+import time
 import logging
 import platform
-from typing import Union, Optional
+from typing import Any, Dict, Union, Optional, cast
 from pathlib import Path
 from functools import lru_cache
 
-from . import _mureq as mureq
+from . import _cache
 
 PYPI_API_URL: str = 'https://pypi.org/pypi/pyright/json'
+DEFAULT_VERSION_CHECK_TTL: int = 60 * 60 * 24
+
+# how long to wait before attempting another background refresh of a stale entry
+REFRESH_INTERVAL: int = 60
 log: logging.Logger = logging.getLogger(__name__)
 
 
@@ -52,6 +57,18 @@ def env_to_bool(key: str, *, default: bool = False) -> bool:
     return value.lower() in {'1', 't', 'on', 'true'}
 
 
+def env_to_int(key: str, *, default: int) -> int:
+    value = os.environ.get(key)
+    if value is None:
+        return default
+
+    try:
+        return int(value)
+    except ValueError:
+        log.debug('Ignoring invalid %s value: %s', key, value)
+        return default
+
+
 def maybe_decode(data: Union[str, bytes]) -> str:
     if isinstance(data, bytes):
         return data.decode(sys.getdefaultencoding())
@@ -59,13 +76,78 @@ def maybe_decode(data: Union[str, bytes]) -> str:
     return data
 
 
+def get_version_check_ttl() -> int:
+    """Returns the number of seconds that the result of the new version check should be cached for.
+
+    This can be configured with the `PYRIGHT_PYTHON_VERSION_CHECK_TTL` environment variable.
+    """
+    return env_to_int('PYRIGHT_PYTHON_VERSION_CHECK_TTL', default=DEFAULT_VERSION_CHECK_TTL)
+
+
+def _get_version_check_cache_path() -> Path:
+    return get_cache_dir() / 'pyright-python' / 'latest-version.json'
+
+
 @lru_cache(maxsize=None)
 def get_latest_version() -> Optional[str]:
     """Returns the latest available version of pyright-python.
 
-    This relies on the JSON PyPi API, if PyPi is down or the user is offline then
-    None is returned.
+    The result is cached on disk for `get_version_check_ttl()` seconds, including failed lookups,
+    so that the network is only hit once per TTL. The network is never accessed on the critical
+    path, if there is no cached entry or it has expired then a detached background process is
+    started to refresh it and the stale value, or `None`, is returned.
     """
+    cache_path = _get_version_check_cache_path()
+    data = _cache.read_json(cache_path)
+    entry = cast(Dict[str, Any], data) if isinstance(data, dict) else {}
+
+    now = time.time()
+    checked_at = entry.get('checked_at')
+    if not isinstance(checked_at, (int, float)) or now - checked_at > get_version_check_ttl():
+        refresh_started_at = entry.get('refresh_started_at')
+        if not isinstance(refresh_started_at, (int, float)) or now - refresh_started_at > REFRESH_INTERVAL:
+            _cache.write_json(cache_path, {**entry, 'refresh_started_at': now})
+            _refresh_latest_version_in_background()
+
+    version = entry.get('version')
+    log.debug('Using cached latest pyright-python version: %s', version)
+    return version if isinstance(version, str) else None
+
+
+def refresh_latest_version() -> Optional[str]:
+    """Fetch the latest available version of pyright-python and store the result in the cache."""
+    version = _fetch_latest_version()
+    _cache.write_json(_get_version_check_cache_path(), {'version': version, 'checked_at': time.time()})
+    return version
+
+
+def _refresh_latest_version_in_background() -> None:
+    import subprocess
+
+    log.debug('Starting background refresh of the latest pyright-python version')
+    kwargs: Dict[str, Any] = {}
+    if platform.system().lower() == 'windows':
+        kwargs['creationflags'] = getattr(subprocess, 'DETACHED_PROCESS', 0)
+    else:
+        kwargs['start_new_session'] = True
+
+    try:
+        subprocess.Popen(
+            [sys.executable, '-c', 'from pyright.utils import refresh_latest_version; refresh_latest_version()'],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+            **kwargs,
+        )
+    except Exception as exc:
+        log.debug('Could not start background refresh: %s - %s', type(exc), exc)
+
+
+def _fetch_latest_version() -> Optional[str]:
+    # imported lazily as the network stack is expensive to import
+    from . import _mureq as mureq
+
     try:
         response = mureq.get(PYPI_API_URL, timeout=1)
         version = response.json()['info']['version']
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import json
+import subprocess
+from typing import List, cast
+from pathlib import Path
+
+import pytest
+
+import pyright
+from pyright import _config, _affected
+
+FAKE_PYRIGHT = """
+const fs = require('fs');
+fs.appendFileSync(process.env.LOG_FILE, JSON.stringify(process.argv.slice(2)) + '\\n');
+process.exit(0);
+"""
+
+
+@pytest.fixture(name='log_file')
+def log_file_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    pkg_dir = tmp_path / 'cache' / '1.1.300' / 'node_modules' / 'pyright'
+    pkg_dir.mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': '1.1.300'}))
+    pkg_dir.joinpath('index.js').write_text(FAKE_PYRIGHT)
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', '1.1.300')
+    monkeypatch.setenv('PYRIGHT_PYTHON_IGNORE_WARNINGS', '1')
+    monkeypatch.setenv('LOG_FILE', str(tmp_path / 'log.txt'))
+    tmp_path.joinpath('log.txt').write_text('')
+    return tmp_path / 'log.txt'
+
+
+def _git(*args: str, cwd: Path) -> None:
+    subprocess.run(
+        ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args],
+        cwd=cwd,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+@pytest.fixture(name='project')
+def project_fixture(tmp_path: Path) -> Path:
+    project = tmp_path / 'project'
+    files = {
+        'pyrightconfig.json': '{"include": ["src"]}',
+        'README.md': '',
+        'src/pkg/__init__.py': '',
+        'src/pkg/a.py': 'X = 1\n',
+        'src/pkg/b.py': 'from . import a\n',
+        'src/pkg/c.py': 'import pkg.b\n',
+        'src/pkg/sub/__init__.py': 'from .. import c\n',
+        'src/d.py': 'def foo():\n    from pkg.sub import x\n',
+        'src/e.py': 'import os\nimport d\n',
+        'src/other.py': 'import os\n',
+    }
+    for name, content in files.items():
+        project.joinpath(name).parent.mkdir(parents=True, exist_ok=True)
+        project.joinpath(name).write_text(content)
+
+    _git('init', '-q', cwd=project)
+    _git('add', '.', cwd=project)
+    _git('commit', '-q', '-m', 'initial', cwd=project)
+    _git('tag', 'base', cwd=project)
+    return project
+
+
+def _affected_names(project: Path, *changed: str) -> list[str]:
+    config = _config.load_config(project)
+    affected = _affected.find_affected(
+        [project / name for name in changed],
+        _config.find_sources(project, config),
+        root=project,
+        config=config,
+    )
+    return [path.relative_to(project).as_posix() for path in affected]
+
+
+def test_scan_file(tmp_path: Path) -> None:
+    path = tmp_path / 'foo.py'
+    path.write_text('import a.b, c as d\nfrom . import e\nfrom ..f import g\nfrom h import *\n')
+    assert _affected._scan_file(str(path)) == ['a.b', 'c', '.', '.e', '..f', '..f.g', 'h']
+
+    path.write_text('import (')
+    assert _affected._scan_file(str(path)) == []
+
+
+def test_find_affected(project: Path) -> None:
+    assert _affected_names(project, 'src/pkg/a.py') == [
+        'src/d.py',
+        'src/e.py',
+        'src/pkg/a.py',
+        'src/pkg/b.py',
+        'src/pkg/c.py',
+        'src/pkg/sub/__init__.py',
+    ]
+    assert _affected_names(project, 'src/pkg/sub/__init__.py') == [
+        'src/d.py',
+        'src/e.py',
+        'src/pkg/sub/__init__.py',
+    ]
+    assert _affected_names(project, 'src/other.py', 'README.md') == ['src/other.py']
+
+    # files that import a deleted module are still affected
+    project.joinpath('src', 'd.py').unlink()
+    assert _affected_names(project, 'src/d.py') == ['src/e.py']
+
+
+def test_import_index(project: Path, monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setattr('pyright._result_cache.RACY_INTERVAL_NS', 0)
+    sources = _config.find_sources(project, _config.load_config(project))
+    imports = _affected.scan_imports(project, sources)
+    assert imports[str(project / 'src' / 'pkg' / 'b.py')] == ['.', '.a']
+
+    # only modified files are parsed again
+    project.joinpath('src', 'other.py').write_text('import pkg\n')
+    scanned: List[str] = []
+    original = _affected._scan_file
+
+    def scan_file(path: str) -> List[str]:
+        scanned.append(path)
+        return original(path)
+
+    monkeypatch.setattr(_affected, '_scan_file', scan_file)
+    imports = _affected.scan_imports(project, sources)
+    assert scanned == [str(project / 'src' / 'other.py')]
+    assert imports[str(project / 'src' / 'other.py')] == ['pkg']
+
+
+def test_changed_since(project: Path, log_file: Path) -> None:
+    _git('checkout', '-q', '-b', 'feature', cwd=project)
+    project.joinpath('src', 'pkg', 'sub', '__init__.py').write_text('from .. import c\nY = 1\n')
+    _git('commit', '-q', '-am', 'change', cwd=project)
+    project.joinpath('src', 'new.py').write_text('')
+
+    assert pyright.run('--changed-since', 'base', '--level=error', cwd=str(project)).returncode == 0
+    assert json.loads(log_file.read_text()) == [
+        '--level=error',
+        str(project / 'src' / 'd.py'),
+        str(project / 'src' / 'e.py'),
+        str(project / 'src' / 'new.py'),
+        str(project / 'src' / 'pkg' / 'sub' / '__init__.py'),
+    ]
+
+    # only the given files are checked
+    log_file.write_text('')
+    pyright.run('--changed-since=base', 'src/e.py', 'src/other.py', cwd=str(project))
+    assert json.loads(log_file.read_text()) == [str(project / 'src' / 'e.py')]
+
+    # nothing is ran if no files are affected
+    log_file.write_text('')
+    proc = pyright.run('--changed-since', 'HEAD', 'src/other.py', '--outputjson', cwd=str(project), capture_output=True)
+    assert proc.returncode == 0
+    assert json.loads(proc.stdout)['summary']['filesAnalyzed'] == 0
+    assert log_file.read_text() == ''
+
+    # every file is checked if the configuration changes
+    project.joinpath('pyrightconfig.json').write_text('{"include": ["src"], "strict": ["src"]}')
+    pyright.run('--changed-since', 'HEAD', cwd=str(project))
+    assert json.loads(log_file.read_text()) == []
+
+
+@pytest.mark.usefixtures('log_file')
+def test_changed_since_errors(project: Path) -> None:
+    proc = pyright.run('--changed-since', 'unknown', cwd=str(project), capture_output=True)
+    assert proc.returncode == 4
+    assert b'git merge-base failed' in cast(bytes, proc.stderr)
+
+    proc = pyright.run('--changed-since=', cwd=str(project), capture_output=True)
+    assert proc.returncode == 4
+    assert b'Expected --changed-since to be given a git ref' in cast(bytes, proc.stderr)
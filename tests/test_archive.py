@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import io
+import os
+import json
+import shutil
+import tarfile
+from typing import Any, Dict
+from pathlib import Path
+
+import pytest
+
+from pyright import errors, _archive, _commands
+
+
+@pytest.fixture(name='cache_dir')
+def cache_dir_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    cache_dir = tmp_path / 'cache' / 'pyright-python'
+    cache_dir.mkdir(parents=True)
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', cache_dir)
+    monkeypatch.setattr('pyright.node.ENV_DIR', tmp_path / 'env', raising=False)
+    return cache_dir
+
+
+def _install_fake_version(cache_dir: Path, version: str) -> Path:
+    pkg_dir = cache_dir / version / 'node_modules' / 'pyright'
+    pkg_dir.joinpath('dist').mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': version}))
+    pkg_dir.joinpath('index.js').write_text('console.log("hello")')
+    pkg_dir.joinpath('dist', 'pyright.js').write_text('')
+    return pkg_dir
+
+
+def _install_fake_nodeenv(env_dir: Path) -> None:
+    bin_dir = env_dir / 'bin'
+    bin_dir.mkdir(parents=True)
+    bin_dir.joinpath('node').write_text('#!/bin/sh\n')
+    bin_dir.joinpath('node').chmod(0o755)
+    if os.name != 'nt':
+        bin_dir.joinpath('npm').symlink_to('../lib/node_modules/npm/bin/npm-cli.js')
+
+
+def test_export_import(tmp_path: Path, cache_dir: Path) -> None:
+    _install_fake_version(cache_dir, '1.1.300')
+    _install_fake_version(cache_dir, '1.1.301')
+    _install_fake_nodeenv(tmp_path / 'env')
+
+    archive = tmp_path / 'pyright-cache.tar.gz'
+    manifest = _archive.export_cache(archive, versions=['1.1.300'])
+    assert [entry['path'] for entry in manifest['entries']] == ['nodeenv', 'versions/1.1.300']
+
+    shutil.rmtree(cache_dir)
+    shutil.rmtree(tmp_path / 'env')
+
+    result = _archive.import_cache(archive)
+    assert result == {'imported': ['nodeenv', 'versions/1.1.300'], 'skipped': [], 'incompatible': []}
+
+    pkg_dir = cache_dir / '1.1.300' / 'node_modules' / 'pyright'
+    assert pkg_dir.joinpath('index.js').read_text() == 'console.log("hello")'
+    assert pkg_dir.joinpath('dist', 'pyright.js').exists()
+    assert not cache_dir.joinpath('1.1.301').exists()
+    assert os.access(str(tmp_path / 'env' / 'bin' / 'node'), os.X_OK)
+    if os.name != 'nt':
+        assert os.readlink(str(tmp_path / 'env' / 'bin' / 'npm')) == '../lib/node_modules/npm/bin/npm-cli.js'
+
+    # no leftover temporary directories
+    assert not list(cache_dir.glob('.*.tmp'))
+
+
+def test_import_skips_present_entries(tmp_path: Path, cache_dir: Path) -> None:
+    _install_fake_version(cache_dir, '1.1.300')
+    _install_fake_version(cache_dir, '1.1.301')
+
+    archive = tmp_path / 'pyright-cache.tar.gz'
+    _archive.export_cache(archive)
+    shutil.rmtree(cache_dir / '1.1.301')
+
+    result = _archive.import_cache(archive)
+    assert result == {'imported': ['versions/1.1.301'], 'skipped': ['versions/1.1.300'], 'incompatible': []}
+
+
+def test_import_checksum_mismatch(tmp_path: Path, cache_dir: Path) -> None:
+    _install_fake_version(cache_dir, '1.1.300')
+    archive = tmp_path / 'pyright-cache.tar.gz'
+    _archive.export_cache(archive)
+    shutil.rmtree(cache_dir / '1.1.300')
+
+    # rewrite the archive with a tampered file
+    tampered = tmp_path / 'tampered.tar.gz'
+    with tarfile.open(str(archive)) as source, tarfile.open(str(tampered), mode='w:gz') as dest:
+        for member in source:
+            f = source.extractfile(member)
+            data = f.read() if f is not None else b''
+            if member.name.endswith('index.js'):
+                data = b'console.log("evil")'
+                member.size = len(data)
+            dest.addfile(member, io.BytesIO(data))
+
+    with pytest.raises(errors.ArchiveError, match='Checksum mismatch'):
+        _archive.import_cache(tampered)
+
+    assert not cache_dir.joinpath('1.1.300').exists()
+    assert [path.name for path in cache_dir.iterdir()] == []
+
+
+@pytest.mark.usefixtures('cache_dir')
+def test_import_keeps_user_managed_nodeenv(tmp_path: Path) -> None:
+    _install_fake_nodeenv(tmp_path / 'env')
+    archive = tmp_path / 'pyright-cache.tar.gz'
+    _archive.export_cache(archive, versions=[])
+
+    # the nodeenv directory is outside of the cache, e.g. set by `PYRIGHT_PYTHON_ENV_DIR`
+    env_dir = tmp_path / 'env'
+    env_dir.joinpath('bin', 'node').unlink()
+    env_dir.joinpath('user.txt').write_text('keep me')
+
+    with pytest.raises(errors.ArchiveError, match='outside of the cache directory'):
+        _archive.import_cache(archive)
+
+    assert env_dir.joinpath('user.txt').read_text() == 'keep me'
+    assert not list(tmp_path.glob('.env.*'))
+
+
+def test_export_unknown_version(tmp_path: Path, cache_dir: Path) -> None:
+    _install_fake_version(cache_dir, '1.1.300')
+
+    with pytest.raises(errors.ArchiveError, match='not installed: 1.1.299'):
+        _archive.export_cache(tmp_path / 'pyright-cache.tar.gz', versions=['1.1.299'])
+
+
+def test_import_unsafe_member(tmp_path: Path, cache_dir: Path) -> None:
+    archive = tmp_path / 'evil.tar.gz'
+    manifest = json.dumps({'format': 1, 'platform': '', 'entries': []}).encode('utf-8')
+    with tarfile.open(str(archive), mode='w:gz') as tar:
+        for name, data in ((_archive.MANIFEST_NAME, manifest), ('versions/../../evil.js', b'')):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+    with pytest.raises(errors.ArchiveError, match='unsafe archive member'):
+        _archive.import_cache(archive)
+
+    assert not cache_dir.joinpath('evil.js').exists()
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='symlinks require elevated permissions on Windows')
+def test_import_symlink_chain(tmp_path: Path, cache_dir: Path) -> None:
+    archive = tmp_path / 'evil.tar.gz'
+    entry: Dict[str, Any] = {
+        'type': 'version',
+        'path': 'versions/1.1.300',
+        'version': '1.1.300',
+        'files': {},
+        'symlinks': {},
+    }
+    manifest = json.dumps({'format': 1, 'platform': '', 'entries': [entry]}).encode('utf-8')
+    with tarfile.open(str(archive), mode='w:gz') as tar:
+        info = tarfile.TarInfo(_archive.MANIFEST_NAME)
+        info.size = len(manifest)
+        tar.addfile(info, io.BytesIO(manifest))
+
+        # each link is contained on its own but `d/m` resolves through `d/l` to outside of the archive
+        for name, linkname in (('d/l', '..'), ('d/m', 'l/..')):
+            info = tarfile.TarInfo(f'versions/1.1.300/{name}')
+            info.type = tarfile.SYMTYPE
+            info.linkname = linkname
+            tar.addfile(info)
+
+        info = tarfile.TarInfo('versions/1.1.300/d/m/evil.js')
+        tar.addfile(info, io.BytesIO(b''))
+
+    with pytest.raises(errors.ArchiveError, match='outside of the archive'):
+        _archive.import_cache(archive)
+
+    assert not list(cache_dir.rglob('evil.js'))
+    assert not list(cache_dir.parent.rglob('evil.js'))
+
+
+def test_commands(tmp_path: Path, cache_dir: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    _install_fake_version(cache_dir, '1.1.300')
+    archive = tmp_path / 'pyright-cache.tar.gz'
+
+    assert _commands.main(['cache', 'export', str(archive), '--no-nodeenv']) == 0
+    assert 'exported versions/1.1.300' in capsys.readouterr().out
+
+    assert _commands.main(['cache', 'import', str(archive)]) == 0
+    assert 'skipped versions/1.1.300, already present' in capsys.readouterr().out
+
+    assert _commands.main(['cache', 'import', str(tmp_path / 'missing.tar.gz')]) == 1
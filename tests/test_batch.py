@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import sys
+import json
+from pathlib import Path
+
+import pytest
+
+import pyright
+from pyright import _batch, _config, _commands
+
+FAKE_PYRIGHT = """
+const fs = require('fs');
+const path = require('path');
+const args = process.argv.slice(2);
+const root = args[args.indexOf('--project') + 1];
+fs.appendFileSync(process.env.LOG_FILE, root + '\\n');
+
+const failed = fs.existsSync(path.join(root, 'fail'));
+console.log(JSON.stringify({
+  version: '1.1.300',
+  time: '0',
+  generalDiagnostics: failed ? [{ file: path.join(root, 'foo.py'), severity: 'error', message: 'bad' }] : [],
+  summary: { filesAnalyzed: 1, errorCount: failed ? 1 : 0, warningCount: 0, informationCount: 0, timeInSec: 0.1 },
+}));
+process.exit(failed ? 1 : 0);
+"""
+
+
+@pytest.fixture(name='fake_pyright')
+def fake_pyright_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    pkg_dir = tmp_path / 'cache' / '1.1.300' / 'node_modules' / 'pyright'
+    pkg_dir.mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': '1.1.300'}))
+    pkg_dir.joinpath('index.js').write_text(FAKE_PYRIGHT)
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', '1.1.300')
+    monkeypatch.setenv('PYRIGHT_PYTHON_IGNORE_WARNINGS', '1')
+    monkeypatch.setenv('LOG_FILE', str(tmp_path / 'log.txt'))
+    return tmp_path / 'log.txt'
+
+
+def _create_project(path: Path, *, size: int, pyproject: bool = False) -> Path:
+    path.mkdir(parents=True)
+    if pyproject:
+        path.joinpath('pyproject.toml').write_text('[project]\nname = "foo"\n\n[tool.pyright]\nstrict = ["."]\n')
+    else:
+        path.joinpath('pyrightconfig.json').write_text('{}')
+
+    path.joinpath('foo.py').write_text('x' * size)
+    return path
+
+
+def test_find_projects(tmp_path: Path) -> None:
+    repo = _create_project(tmp_path / 'repo', size=10, pyproject=True)
+    repo.joinpath('scripts').mkdir()
+    repo.joinpath('scripts', 'bar.pyi').write_text('x' * 5)
+    repo.joinpath('README.md').write_text('x' * 100)
+    foo = _create_project(repo / 'packages' / 'foo', size=20)
+    bar = _create_project(repo / 'packages' / 'bar', size=30, pyproject=True)
+
+    # these directories are not projects or are ignored
+    repo.joinpath('packages', 'baz').mkdir()
+    repo.joinpath('packages', 'baz', 'pyproject.toml').write_text('[project]\nname = "baz"\n')
+    repo.joinpath('packages', 'baz', 'baz.py').write_text('x' * 40)
+    _create_project(repo / '.venv', size=50).joinpath('pyvenv.cfg').write_text('')
+    _create_project(repo / 'venv', size=50).joinpath('pyvenv.cfg').write_text('')
+    _create_project(repo / 'node_modules' / 'foo', size=50)
+
+    assert _config.find_projects([repo]) == [(repo, 55), (bar, 30), (foo, 20)]
+
+
+def test_load_config(tmp_path: Path) -> None:
+    tmp_path.joinpath('pyproject.toml').write_text('[tool.pyright]\ninclude = ["src"]\n')
+    tmp_path.joinpath('pyrightconfig.json').write_text(
+        '{\n  // comment\n  "include": ["src/*"], /* comment */\n  "exclude": ["//foo"]\n}'
+    )
+    assert _config.load_config(tmp_path) == {'include': ['src/*'], 'exclude': ['//foo']}
+
+    tmp_path.joinpath('pyrightconfig.json').unlink()
+    pytest.importorskip('tomllib' if sys.version_info >= (3, 11) else 'tomli')
+    assert _config.load_config(tmp_path) == {'include': ['src']}
+
+
+def test_batch(tmp_path: Path, fake_pyright: Path) -> None:
+    small = _create_project(tmp_path / 'repo' / 'small', size=10)
+    large = _create_project(tmp_path / 'repo' / 'large', size=1000, pyproject=True)
+    medium = _create_project(tmp_path / 'repo' / 'medium', size=100)
+    medium.joinpath('fail').write_text('')
+
+    result = pyright.batch([tmp_path / 'repo'], jobs=1)
+
+    # the largest projects are checked first and the results are ordered by path
+    assert fake_pyright.read_text().splitlines() == [str(large), str(medium), str(small)]
+    assert [project.root for project in result.projects] == [str(large), str(medium), str(small)]
+    assert [project.returncode for project in result.projects] == [0, 1, 0]
+    assert result.returncode == 1
+    assert result.summary.files_analyzed == 3
+    assert result.summary.error_count == 1
+    assert [diagnostic.file for diagnostic in result.diagnostics] == [str(medium / 'foo.py')]
+
+
+@pytest.mark.usefixtures('fake_pyright')
+def test_batch_command(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    foo = _create_project(tmp_path / 'repo' / 'foo', size=10)
+    bar = _create_project(tmp_path / 'repo' / 'bar', size=10)
+    bar.joinpath('fail').write_text('')
+
+    assert _commands.main(['batch', str(tmp_path / 'repo'), '--outputjson']) == 1
+    report = json.loads(capsys.readouterr().out)
+    assert [project['root'] for project in report['projects']] == [str(bar), str(foo)]
+    assert report['summary']['errorCount'] == 1
+    assert report['generalDiagnostics'] == [{'file': str(bar / 'foo.py'), 'severity': 'error', 'message': 'bad'}]
+
+    assert _commands.main(['batch', str(foo)]) == 0
+    assert '1 projects, 0 errors, 0 warnings' in capsys.readouterr().out
+
+    assert _commands.main(['batch', str(tmp_path / 'cache')]) == 1
+    assert 'no pyright projects found' in capsys.readouterr().err
+
+
+def test_default_jobs(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert _batch.get_default_jobs() >= 1
+
+    monkeypatch.setattr(_batch, '_get_available_memory', lambda: 0)
+    assert _batch.get_default_jobs() == 1
+
+    monkeypatch.setenv('PYRIGHT_PYTHON_JOBS', '12')
+    assert _batch.get_default_jobs() == 12
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import io
+import sys
+import json
+import tempfile
+from typing import cast
+from pathlib import Path
+
+import pytest
+
+import pyright
+from pyright import cli, _config, _file_list
+
+FAKE_PYRIGHT = """
+const fs = require('fs');
+const args = process.argv.slice(2);
+const project = args.indexOf('--project');
+const config = project === -1 ? null : JSON.parse(fs.readFileSync(args[project + 1], 'utf-8'));
+fs.appendFileSync(process.env.LOG_FILE, JSON.stringify({ args, config }) + '\\n');
+process.exit(0);
+"""
+
+
+@pytest.fixture(name='log_file')
+def log_file_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    pkg_dir = tmp_path / 'cache' / '1.1.300' / 'node_modules' / 'pyright'
+    pkg_dir.mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': '1.1.300'}))
+    pkg_dir.joinpath('index.js').write_text(FAKE_PYRIGHT)
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', '1.1.300')
+    monkeypatch.setenv('PYRIGHT_PYTHON_IGNORE_WARNINGS', '1')
+    monkeypatch.setenv('LOG_FILE', str(tmp_path / 'log.txt'))
+    tmp_path.joinpath('log.txt').write_text('')
+    return tmp_path / 'log.txt'
+
+
+@pytest.fixture(name='project')
+def project_fixture(tmp_path: Path) -> Path:
+    project = tmp_path / 'project'
+    project.joinpath('src').mkdir(parents=True)
+    project.joinpath('pyrightconfig.json').write_text('{\n  // comment\n  "include": ["src"], "strict": ["src"]\n}')
+    for name in ('a.py', 'b.py', 'c.py'):
+        project.joinpath('src', name).write_text('')
+    return project
+
+
+def test_parse() -> None:
+    assert _file_list.parse(b'a.py\nb.py\r\n\n  \nc d.py\n') == ['a.py', 'b.py', 'c d.py']
+    assert _file_list.parse(b'a.py\0b\n.py\0') == ['a.py', 'b\n.py']
+    assert _file_list.parse(b'') == []
+
+
+def test_expand(tmp_path: Path) -> None:
+    tmp_path.joinpath('files.txt').write_text('a.py\nb.py\n')
+    assert _file_list.expand(['--outputjson', '@files.txt', 'c.py', '@-', '@'], stdin=io.BytesIO(b'd.py')) == [
+        '--outputjson',
+        'a.py',
+        'b.py',
+        'c.py',
+        'd.py',
+        '@',
+    ]
+    assert _file_list.has_response_files(['@files.txt'])
+    assert not _file_list.has_response_files(['@', 'a.py'])
+
+
+def test_response_file(project: Path, log_file: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('PYRIGHT_PYTHON_RESPONSE_FILES', '1')
+    project.joinpath('files.txt').write_text('src/a.py\nsrc/b.py\n')
+    assert pyright.run('--level', 'error', '@files.txt', cwd=str(project)).returncode == 0
+    assert json.loads(log_file.read_text()) == {'args': ['--level', 'error', 'src/a.py', 'src/b.py'], 'config': None}
+
+    proc = pyright.run('@missing.txt', cwd=str(project), capture_output=True)
+    assert proc.returncode == 4
+    assert b'Could not read the response file missing.txt' in cast(bytes, proc.stderr)
+
+
+def test_response_files_disabled(project: Path, log_file: Path) -> None:
+    """arguments starting with `@` are passed to pyright unchanged by default as they could be paths"""
+    project.joinpath('files.txt').write_text('src/a.py\n')
+    assert pyright.run('@files.txt', cwd=str(project)).returncode == 0
+    assert json.loads(log_file.read_text()) == {'args': ['@files.txt'], 'config': None}
+
+
+def test_too_long(project: Path, log_file: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(_file_list, 'get_max_command_length', lambda: 20)
+    assert pyright.run('--level', 'error', 'src/a.py', 'src/b.py', cwd=str(project)).returncode == 0
+
+    output = json.loads(log_file.read_text())
+    assert output['args'][:3] == ['--level', 'error', '--project']
+    assert Path(output['args'][3]).parent == Path(tempfile.gettempdir())
+    assert output['config'] == {
+        'include': [str(project / 'src' / 'a.py'), str(project / 'src' / 'b.py')],
+        'strict': [str(project / 'src')],
+        'exclude': [str(project / pattern) for pattern in _config.DEFAULT_EXCLUDES],
+        'stubPath': str(project / 'typings'),
+        'extraPaths': [str(project / 'src')],
+        'autoSearchPaths': False,
+        'executionEnvironments': [{'root': str(project)}],
+    }
+
+    # the temporary configuration file is removed and never written to the project
+    assert not Path(output['args'][3]).exists()
+    assert sorted(path.name for path in project.iterdir()) == ['pyrightconfig.json', 'src']
+
+
+def test_too_long_extends(project: Path, log_file: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """an extended configuration is merged into the temporary configuration file"""
+    monkeypatch.setattr(_file_list, 'get_max_command_length', lambda: 10)
+    base = tmp_path.resolve() / 'base'
+    base.mkdir()
+    base.joinpath('pyrightconfig.json').write_text('{"stubPath": "stubs", "exclude": ["gen"], "strict": ["lib"]}')
+    project.joinpath('pyrightconfig.json').write_text('{"extends": "../base/pyrightconfig.json", "strict": ["src"]}')
+    assert pyright.run('src/a.py', 'src/b.py', cwd=str(project)).returncode == 0
+
+    config = json.loads(log_file.read_text())['config']
+    assert 'extends' not in config
+    assert config['stubPath'] == str(base / 'stubs')
+    assert config['exclude'] == [str(base / 'gen')]
+    assert config['strict'] == [str(project / 'src')]
+
+
+def test_entrypoint(project: Path, log_file: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(project)
+    monkeypatch.setenv('PYRIGHT_PYTHON_EXEC', '0')
+    monkeypatch.setenv('PYRIGHT_PYTHON_RESPONSE_FILES', '1')
+    monkeypatch.setattr(sys, 'argv', ['pyright', '@-'])
+    monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(b'src/a.py\0src/c.py\0')))
+    with pytest.raises(SystemExit) as exc:
+        cli.entrypoint()
+
+    assert exc.value.code == 0
+    assert json.loads(log_file.read_text())['args'] == ['src/a.py', 'src/c.py']
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from pyright import _gc, _utils, _commands
+from pyright._lock import FileLock
+
+
+@pytest.fixture(name='cache_dir')
+def cache_dir_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    cache_dir = tmp_path / 'pyright-python'
+    cache_dir.mkdir()
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', cache_dir)
+    monkeypatch.delenv('PYRIGHT_PYTHON_FORCE_VERSION', raising=False)
+    monkeypatch.delenv('PYRIGHT_PYTHON_CACHE_MAX_SIZE', raising=False)
+    monkeypatch.delenv('PYRIGHT_PYTHON_CACHE_MAX_AGE', raising=False)
+    return cache_dir
+
+
+def _install_fake_version(cache_dir: Path, version: str, *, size: int, last_used: float) -> Path:
+    cache_dir.joinpath(version).mkdir()
+    cache_dir.joinpath(version, 'package.json').write_text('{}')
+    pkg_dir = cache_dir / version / 'node_modules' / 'pyright'
+    pkg_dir.mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': version}))
+    pkg_dir.joinpath('index.js').write_bytes(b'x' * size)
+
+    used = cache_dir / version / _utils.LAST_USED_FILENAME
+    used.touch()
+    os.utime(str(used), (last_used, last_used))
+    return pkg_dir
+
+
+def _versions(cache_dir: Path) -> list[str]:
+    return sorted(path.name for path in cache_dir.iterdir() if not path.name.startswith('.'))
+
+
+def test_prune_max_age(cache_dir: Path) -> None:
+    now = time.time()
+    _install_fake_version(cache_dir, '1.1.300', size=1000, last_used=now - 60 * 60 * 24 * 10)
+    _install_fake_version(cache_dir, '1.1.301', size=1000, last_used=now)
+
+    result = _gc.prune(max_age=60 * 60 * 24 * 7)
+    assert [entry.version for entry in result.removed] == ['1.1.300']
+    assert result.reclaimed >= 1000
+    assert _versions(cache_dir) == ['1.1.301']
+
+
+def test_prune_max_size_lru(cache_dir: Path) -> None:
+    now = time.time()
+    _install_fake_version(cache_dir, '1.1.302', size=1000, last_used=now - 30)
+    _install_fake_version(cache_dir, '1.1.300', size=1000, last_used=now - 10)
+    _install_fake_version(cache_dir, '1.1.301', size=1000, last_used=now - 20)
+
+    result = _gc.prune(max_size=2500)
+    assert [entry.version for entry in result.removed] == ['1.1.302']
+    assert _versions(cache_dir) == ['1.1.300', '1.1.301']
+
+    result = _gc.prune(max_size=0, dry_run=True)
+    assert [entry.version for entry in result.removed] == ['1.1.301', '1.1.300']
+    assert _versions(cache_dir) == ['1.1.300', '1.1.301']
+
+
+def test_prune_skips_versions_in_use(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    now = time.time()
+    _install_fake_version(cache_dir, '1.1.300', size=1000, last_used=now - 30)
+    _install_fake_version(cache_dir, '1.1.301', size=1000, last_used=now - 20)
+    _install_fake_version(cache_dir, '1.1.302', size=1000, last_used=now - 10)
+    monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', '1.1.302')
+
+    with FileLock(_utils.get_in_use_lock_path('1.1.300'), shared=True):
+        result = _gc.prune(max_size=0)
+
+    assert [entry.version for entry in result.removed] == ['1.1.301']
+    assert [entry.version for entry in result.skipped] == ['1.1.300', '1.1.302']
+    assert _versions(cache_dir) == ['1.1.300', '1.1.302']
+
+
+def test_prune_skips_versions_being_installed(cache_dir: Path) -> None:
+    _install_fake_version(cache_dir, '1.1.300', size=1000, last_used=0)
+
+    with FileLock(_utils.get_lock_path('1.1.300')):
+        result = _gc.prune(max_age=0)
+
+    assert result.removed == []
+    assert _versions(cache_dir) == ['1.1.300']
+
+
+def test_install_pyright_marks_version_as_used(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    _install_fake_version(cache_dir, '1.1.300', size=0, last_used=0)
+    monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', '1.1.300')
+    monkeypatch.setenv('PYRIGHT_PYTHON_IGNORE_WARNINGS', '1')
+
+    _utils.install_pyright((), quiet=None)
+    assert time.time() - cache_dir.joinpath('1.1.300', _utils.LAST_USED_FILENAME).stat().st_mtime < 60
+
+    # the version is held by this process and cannot be pruned
+    monkeypatch.delenv('PYRIGHT_PYTHON_FORCE_VERSION')
+    assert [entry.version for entry in _gc.prune(max_size=0).skipped] == ['1.1.300']
+
+
+def test_auto_prune(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    _install_fake_version(cache_dir, '1.1.300', size=1000, last_used=0)
+    assert _gc.auto_prune() is None
+
+    monkeypatch.setenv('PYRIGHT_PYTHON_CACHE_MAX_AGE', '1d')
+    result = _gc.auto_prune()
+    assert result is not None
+    assert [entry.version for entry in result.removed] == ['1.1.300']
+
+
+@pytest.mark.parametrize(
+    'value,expected',
+    [('1024', 1024), ('1K', 1024), ('500M', 500 * 1024**2), ('2GiB', 2 * 1024**3), ('1.5g', int(1.5 * 1024**3))],
+)
+def test_parse_size(value: str, expected: int) -> None:
+    assert _gc.parse_size(value) == expected
+
+
+@pytest.mark.parametrize('value,expected', [('3600', 3600), ('12h', 12 * 60 * 60), ('30d', 30 * 60 * 60 * 24)])
+def test_parse_duration(value: str, expected: int) -> None:
+    assert _gc.parse_duration(value) == expected
+
+
+def test_prune_command(cache_dir: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    _install_fake_version(cache_dir, '1.1.300', size=2048, last_used=0)
+
+    assert _commands.main(['cache', 'prune']) == 1
+    assert 'one of --max-size or --max-age is required' in capsys.readouterr().err
+
+    assert _commands.main(['cache', 'prune', '--max-age', '7d']) == 0
+    output = capsys.readouterr().out
+    assert 'removed 1.1.300' in output
+    assert 'reclaimed 2.' in output
+    assert _versions(cache_dir) == []
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import sys
+import subprocess
+from typing import List
+
+# these are only needed when a network request is actually made
+NETWORK_MODULES = {'ssl', 'socket', 'http.client', 'pyright._mureq'}
+
+# these are expensive to import and must not be imported by the `pyright.cli:entrypoint` import path
+HEAVY_MODULES = {
+    *NETWORK_MODULES,
+    'json',
+    'asyncio',
+    'tarfile',
+    'subprocess',
+    'concurrent.futures',
+    'pyright.node',
+    'pyright._utils',
+    'pyright.results',
+}
+
+
+def _imported_modules(statement: str) -> List[str]:
+    proc = subprocess.run(
+        [sys.executable, '-c', f'{statement}; import sys; print("\\n".join(sys.modules))'],
+        check=True,
+        stdout=subprocess.PIPE,
+    )
+    return proc.stdout.decode('utf-8').splitlines()
+
+
+def test_entrypoint_imports() -> None:
+    modules = _imported_modules('from pyright.cli import entrypoint')
+    assert HEAVY_MODULES.isdisjoint(modules), sorted(HEAVY_MODULES.intersection(modules))
+
+
+def test_no_network_imports() -> None:
+    """The network stack is only imported when a network request is made"""
+    modules = _imported_modules('import pyright, pyright.cli, pyright.node, pyright._utils, pyright.langserver')
+    assert NETWORK_MODULES.isdisjoint(modules)
+
+
+def test_lazy_attributes() -> None:
+    modules = _imported_modules('import pyright')
+    assert 'pyright.cli' not in modules
+    assert 'pyright.node' not in modules
+
+    modules = _imported_modules('import pyright; pyright.run; pyright.errors')
+    assert 'pyright.cli' in modules
+    assert 'pyright.errors' in modules
+
+
+def test_lazy_submodules() -> None:
+    modules = _imported_modules('import pyright; pyright.cli.run; pyright.node.run; pyright.langserver.run')
+    assert 'pyright.cli' in modules
+    assert 'pyright.node' in modules
+    assert 'pyright.langserver' in modules
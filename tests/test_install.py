@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import json
+import time
+import threading
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pyright import _utils, errors
+from pyright._lock import FileLock
+
+
+@pytest.fixture(name='cache_dir')
+def cache_dir_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    cache_dir = tmp_path / 'pyright-python'
+    cache_dir.mkdir()
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', cache_dir)
+    monkeypatch.delenv('PYRIGHT_PYTHON_LATEST_VERSION_TTL', raising=False)
+    monkeypatch.delenv('PYRIGHT_PYTHON_PYLANCE_VERSION_TTL', raising=False)
+    return cache_dir
+
+
+def _install_fake_version(cache_dir: Path, version: str) -> Path:
+    pkg_dir = cache_dir / version / 'node_modules' / 'pyright'
+    pkg_dir.mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': version}))
+    pkg_dir.joinpath('index.js').write_text('')
+    return pkg_dir
+
+
+def test_latest_version_is_cached(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The resolved `latest` version is re-used across processes until the TTL expires"""
+    latest = mock.Mock(return_value='1.1.400')
+    monkeypatch.setattr('pyright.node.latest', latest)
+
+    assert _utils.get_latest_pyright_version() == '1.1.400'
+    assert _utils.get_latest_pyright_version() == '1.1.400'
+    assert latest.call_count == 1
+    assert cache_dir.joinpath('latest-pyright-version.json').exists()
+
+    monkeypatch.setenv('PYRIGHT_PYTHON_LATEST_VERSION_TTL', '0')
+    time.sleep(0.01)
+    latest.return_value = '1.1.401'
+    assert _utils.get_latest_pyright_version() == '1.1.401'
+    assert latest.call_count == 2
+
+
+@pytest.mark.usefixtures('cache_dir')
+def test_latest_version_refresh(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Passing refresh=True ignores the cached version"""
+    latest = mock.Mock(return_value='1.1.400')
+    monkeypatch.setattr('pyright.node.latest', latest)
+
+    assert _utils.get_latest_pyright_version() == '1.1.400'
+    latest.return_value = '1.1.401'
+    assert _utils.get_latest_pyright_version(refresh=True) == '1.1.401'
+    assert _utils.get_latest_pyright_version() == '1.1.401'
+
+
+def test_latest_version_offline_fallback(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The newest installed version is used if the registry cannot be reached"""
+    monkeypatch.setattr('pyright.node.latest', mock.Mock(side_effect=errors.VersionCheckFailed('offline')))
+    monkeypatch.setattr('pyright._utils.__pyright_version__', '1.1.1')
+
+    _install_fake_version(cache_dir, '1.1.9')
+    _install_fake_version(cache_dir, '1.1.10')
+    _install_fake_version(cache_dir, '1.1.2')
+    assert _utils.get_latest_pyright_version() == '1.1.10'
+
+
+def test_latest_version_offline_no_fallback(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The error is propagated if there is nothing to fall back to"""
+    monkeypatch.setattr('pyright.node.latest', mock.Mock(side_effect=errors.VersionCheckFailed('offline')))
+    monkeypatch.setattr('pyright._utils.__file__', str(cache_dir / '_utils.py'))
+
+    with pytest.raises(errors.VersionCheckFailed):
+        _utils.get_latest_pyright_version()
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, data: Any = None, headers: Optional[Dict[str, str]] = None) -> None:
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise RuntimeError(f'HTTP {self.status_code}')
+
+    def json(self) -> Any:
+        return self.data
+
+
+@pytest.mark.usefixtures('cache_dir')
+def test_pylance_release_cached_forever(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Immutable Pylance release versions are only ever fetched once"""
+    get = mock.Mock(return_value=FakeResponse(200, {'pyrightVersion': '1.1.334'}))
+    monkeypatch.setattr('pyright._mureq.get', get)
+    monkeypatch.setenv('PYRIGHT_PYTHON_PYLANCE_VERSION_TTL', '0')
+
+    assert _utils._get_pylance_pyright_version('2023.11.11') == '1.1.334'
+    time.sleep(0.01)
+    assert _utils._get_pylance_pyright_version('2023.11.11') == '1.1.334'
+    assert get.call_count == 1
+
+
+@pytest.mark.usefixtures('cache_dir')
+def test_pylance_alias_revalidated(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Moving aliases are revalidated with a conditional request once the TTL expires"""
+    get = mock.Mock(return_value=FakeResponse(200, {'pyrightVersion': '1.1.334'}, {'ETag': '"abc"'}))
+    monkeypatch.setattr('pyright._mureq.get', get)
+
+    assert _utils._get_pylance_pyright_version('latest-release') == '1.1.334'
+    assert _utils._get_pylance_pyright_version('latest-release') == '1.1.334'
+    assert get.call_count == 1
+
+    monkeypatch.setenv('PYRIGHT_PYTHON_PYLANCE_VERSION_TTL', '0')
+    time.sleep(0.01)
+    get.return_value = FakeResponse(304)
+    assert _utils._get_pylance_pyright_version('latest-release') == '1.1.334'
+    assert get.call_count == 2
+    assert get.call_args.kwargs['headers'] == {'If-None-Match': '"abc"'}
+
+    time.sleep(0.01)
+    get.return_value = FakeResponse(200, {'pyrightVersion': '1.1.335'}, {'ETag': '"def"'})
+    assert _utils._get_pylance_pyright_version('latest-release') == '1.1.335'
+
+
+@pytest.mark.usefixtures('cache_dir')
+def test_pylance_offline_fallback(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A stale cached entry is used if the release metadata cannot be downloaded"""
+    get = mock.Mock(return_value=FakeResponse(200, {'pyrightVersion': '1.1.334'}))
+    monkeypatch.setattr('pyright._mureq.get', get)
+    assert _utils._get_pylance_pyright_version('latest-release') == '1.1.334'
+
+    monkeypatch.setenv('PYRIGHT_PYTHON_PYLANCE_VERSION_TTL', '0')
+    time.sleep(0.01)
+    get.side_effect = TimeoutError('timed out')
+    assert _utils._get_pylance_pyright_version('latest-release') == '1.1.334'
+
+    with pytest.raises(TimeoutError):
+        _utils._get_pylance_pyright_version('latest-prerelease')
+
+
+class FakeNpm:
+    """Fakes `npm install pyright@<version>` by writing the package.json file"""
+
+    def __init__(self, *, delay: float = 0, fail: bool = False) -> None:
+        self.delay = delay
+        self.fail = fail
+        self.calls: List[Path] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, target: str, *args: str, cwd: str, **_kwargs: Any) -> None:
+        assert target == 'npm'
+        assert args[0] == 'install'
+        version = args[1].split('@')[1]
+
+        with self._lock:
+            self.calls.append(Path(cwd))
+
+        # the partial install must never be visible
+        pkg_dir = Path(cwd) / 'node_modules' / 'pyright'
+        pkg_dir.mkdir(parents=True)
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError('npm install failed')
+
+        pkg_dir.joinpath('index.js').write_text('')
+        pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': version}))
+
+
+@pytest.fixture(name='install_env')
+def install_env_fixture(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', '1.1.300')
+    monkeypatch.setenv('PYRIGHT_PYTHON_IGNORE_WARNINGS', '1')
+
+
+@pytest.mark.usefixtures('install_env')
+def test_concurrent_installs(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Only one concurrent caller installs a version, the others wait and re-use it"""
+    npm = FakeNpm(delay=0.2)
+    monkeypatch.setattr('pyright.node.run', npm)
+
+    def install(_: int) -> Path:
+        return _utils.install_pyright((), quiet=None)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(install, range(8)))
+
+    pkg_dir = cache_dir / '1.1.300' / 'node_modules' / 'pyright'
+    assert results == [pkg_dir] * 8
+    assert len(npm.calls) == 1
+
+    # the install happened in a temporary directory that was then moved into place
+    assert npm.calls[0].parent == cache_dir
+    assert npm.calls[0].name.startswith('.1.1.300.')
+    assert not npm.calls[0].exists()
+    assert json.loads(pkg_dir.joinpath('package.json').read_text())['version'] == '1.1.300'
+
+
+@pytest.mark.usefixtures('install_env')
+def test_failed_install_is_not_visible(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A failed install does not leave a partial install behind"""
+    monkeypatch.setattr('pyright.node.run', FakeNpm(fail=True))
+
+    with pytest.raises(RuntimeError, match='npm install failed'):
+        _utils.install_pyright((), quiet=None)
+
+    assert not cache_dir.joinpath('1.1.300').exists()
+    assert not list(cache_dir.glob('.1.1.300.*'))
+
+
+@pytest.mark.usefixtures('install_env')
+def test_corrupted_install_is_replaced(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    corrupted = cache_dir / '1.1.300' / 'node_modules' / 'pyright'
+    corrupted.mkdir(parents=True)
+    corrupted.joinpath('package.json').write_text('{')
+
+    npm = FakeNpm()
+    monkeypatch.setattr('pyright.node.run', npm)
+
+    pkg_dir = _utils.install_pyright((), quiet=None)
+    assert pkg_dir == corrupted
+    assert len(npm.calls) == 1
+    assert json.loads(pkg_dir.joinpath('package.json').read_text())['version'] == '1.1.300'
+
+
+def test_file_lock(tmp_path: Path) -> None:
+    path = tmp_path / 'foo.lock'
+
+    with FileLock(path):
+        assert not FileLock(path).acquire(blocking=False)
+
+    lock = FileLock(path)
+    assert lock.acquire(blocking=False)
+    lock.release()
+
+
+def test_shared_file_lock(tmp_path: Path) -> None:
+    path = tmp_path / 'foo.lock'
+
+    with FileLock(path, shared=True):
+        shared = FileLock(path, shared=True)
+        assert shared.acquire(blocking=False)
+        assert not FileLock(path).acquire(blocking=False)
+        shared.release()
+
+    exclusive = FileLock(path)
+    assert exclusive.acquire(blocking=False)
+    exclusive.release()
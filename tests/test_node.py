@@ -1,5 +1,8 @@
 import os
 import sys
+import json
+import time
+import asyncio
 import subprocess
 from typing import TYPE_CHECKING, Tuple
 from pathlib import Path
@@ -168,3 +171,152 @@ def test_update_path_env(tmp_path: Path) -> None:
         sep='---',
     )
     assert path == f'{target.absolute()}---/foo'
+
+
+def _create_fake_binary(directory: Path) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    binary = directory / ('node.exe' if os.name == 'nt' else 'node')
+    binary.write_text('')
+    binary.chmod(0o755)
+    return binary
+
+
+@mock.patch('pyright.node.USE_STRATEGY_CACHE', True)
+@mock.patch('pyright.node.USE_GLOBAL_NODE', True)
+@mock.patch('pyright.node.USE_NODEJS_WHEEL', False)
+def test_strategy_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The resolved strategy is cached on disk and re-used until the binary changes"""
+    binary = _create_fake_binary(tmp_path / 'bin')
+    monkeypatch.setenv('PYRIGHT_PYTHON_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setenv('PATH', str(binary.parent))
+
+    strategy = pyright.node._resolve_strategy('node')
+    assert strategy == pyright.node.GlobalStrategy(type='global', path=binary)
+    assert tmp_path.joinpath('cache', 'pyright-python', 'strategies.json').exists()
+
+    which = mock.Mock(side_effect=AssertionError('binary resolution should be cached'))
+    monkeypatch.setattr('shutil.which', which)
+    assert pyright.node._resolve_strategy('node') == strategy
+    assert which.call_count == 0
+
+    # modifying the binary invalidates the cache
+    stat = binary.stat()
+    os.utime(binary, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    with pytest.raises(AssertionError, match='should be cached'):
+        pyright.node._resolve_strategy('node')
+
+
+@mock.patch('pyright.node.USE_STRATEGY_CACHE', True)
+@mock.patch('pyright.node.USE_GLOBAL_NODE', True)
+@mock.patch('pyright.node.USE_NODEJS_WHEEL', False)
+def test_strategy_cache_key(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Changing the PATH or PYRIGHT_PYTHON_* environment variables results in a new cache entry"""
+    first = _create_fake_binary(tmp_path / 'first')
+    second = _create_fake_binary(tmp_path / 'second')
+    monkeypatch.setenv('PYRIGHT_PYTHON_CACHE_DIR', str(tmp_path / 'cache'))
+
+    monkeypatch.setenv('PATH', str(first.parent))
+    assert pyright.node._resolve_strategy('node') == pyright.node.GlobalStrategy(type='global', path=first)
+
+    monkeypatch.setenv('PATH', str(second.parent))
+    assert pyright.node._resolve_strategy('node') == pyright.node.GlobalStrategy(type='global', path=second)
+
+    key = pyright.node._strategy_cache_key('node')
+    monkeypatch.setenv('PYRIGHT_PYTHON_NODE_VERSION', '20.0.0')
+    assert pyright.node._strategy_cache_key('node') != key
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='exec mode is only supported on POSIX')
+def test_execute(tmp_path: Path) -> None:
+    """The current process is replaced with node, buffered output is flushed and the exit code is propagated"""
+    tmp_path.joinpath('test.js').write_text('console.log(process.env.MY_ENV_VAR); process.exit(3)')
+    proc = subprocess.run(
+        [
+            sys.executable,
+            '-c',
+            'from pyright import node; print("before"); node.execute("node", "test.js")',
+        ],
+        env={**os.environ, 'MY_ENV_VAR': 'hello!'},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    assert proc.returncode == 3
+    assert maybe_decode(proc.stdout).splitlines() == ['before', 'hello!']
+
+
+def test_get_command_nodeenv(tmp_path: Path) -> None:
+    """The nodeenv command includes the same environment variables as `run()`"""
+    binary = _create_fake_binary(tmp_path / 'bin')
+    env = {'PATH': '/foo', 'FOO': 'bar'}
+    strategy = pyright.node.NodeenvStrategy(type='nodeenv', path=binary)
+
+    command = pyright.node._get_command('node', strategy, ('index.js',), env=env)
+    assert command.args == [str(binary), 'index.js']
+    assert command.env is not None
+    assert command.env['FOO'] == 'bar'
+    assert command.env['PATH'] == f'{binary.parent.absolute()}{os.pathsep}/foo'
+    assert command.env['NODE_PATH'] == pyright.node.get_env_variables()['NODE_PATH']
+
+    # the given environment is not modified
+    assert env == {'PATH': '/foo', 'FOO': 'bar'}
+
+
+def test_get_command_global(tmp_path: Path) -> None:
+    binary = _create_fake_binary(tmp_path / 'bin')
+    strategy = pyright.node.GlobalStrategy(type='global', path=binary)
+
+    command = pyright.node._get_command('node', strategy, ('index.js', '--version'), env=None)
+    assert command == pyright.node.Command(args=[str(binary), 'index.js', '--version'], env=None)
+
+
+def test_arun(tmp_path: Path) -> None:
+    tmp_path.joinpath('test.js').write_text(
+        'process.stdin.on("data", (data) => console.log(process.env.MY_ENV_VAR, String(data))); process.exitCode = 2'
+    )
+    proc = asyncio.run(
+        pyright.node.arun(
+            'node',
+            'test.js',
+            input=b'world',
+            env={**os.environ, 'MY_ENV_VAR': 'hello'},
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+    )
+    assert proc.returncode == 2
+    assert proc.stdout == b'hello world\n'
+
+    with pytest.raises(subprocess.CalledProcessError):
+        asyncio.run(pyright.node.arun('node', 'test.js', input=b'', stdin=subprocess.PIPE, check=True))
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='process groups are only supported on POSIX')
+def test_arun_cancelled(tmp_path: Path) -> None:
+    """Cancelling the task kills node and the processes it spawned"""
+    tmp_path.joinpath('test.js').write_text(
+        'const child = require("child_process").spawn(process.execPath, ["-e", "setInterval(() => {}, 1000)"]);\n'
+        + 'require("fs").writeFileSync("pids", JSON.stringify([process.pid, child.pid]));\n'
+        + 'setInterval(() => {}, 1000);\n'
+    )
+
+    async def main() -> None:
+        task = asyncio.ensure_future(pyright.node.arun('node', 'test.js'))
+        while not tmp_path.joinpath('pids').exists():
+            await asyncio.sleep(0.05)
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+
+    for pid in json.loads(tmp_path.joinpath('pids').read_text()):
+        for _ in range(50):
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.05)
+        else:
+            raise AssertionError(f'Process {pid} is still running')
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import sys
+import json
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+import pyright
+from pyright import cli, _config, _prefilter
+
+FAKE_PYRIGHT = """
+const fs = require('fs');
+fs.appendFileSync(process.env.LOG_FILE, JSON.stringify(process.argv.slice(2)) + '\\n');
+process.exit(0);
+"""
+
+
+@pytest.fixture(name='log_file')
+def log_file_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    pkg_dir = tmp_path / 'cache' / '1.1.300' / 'node_modules' / 'pyright'
+    pkg_dir.mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': '1.1.300'}))
+    pkg_dir.joinpath('index.js').write_text(FAKE_PYRIGHT)
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', '1.1.300')
+    monkeypatch.setenv('PYRIGHT_PYTHON_IGNORE_WARNINGS', '1')
+    monkeypatch.setenv('LOG_FILE', str(tmp_path / 'log.txt'))
+    tmp_path.joinpath('log.txt').write_text('')
+    return tmp_path / 'log.txt'
+
+
+@pytest.fixture(name='project')
+def project_fixture(tmp_path: Path) -> Path:
+    project = tmp_path / 'project'
+    for name in ('src/a.py', 'src/b.pyi', 'src/generated/c.py', 'src/legacy/d.py', 'scripts/e.py', 'src/.f/g.py'):
+        project.joinpath(name).parent.mkdir(parents=True, exist_ok=True)
+        project.joinpath(name).write_text('')
+
+    project.joinpath('pyrightconfig.json').write_text(
+        '{"include": ["src"], "exclude": ["**/generated", "**/.*"], "ignore": ["src/legacy"]}'
+    )
+    tmp_path.joinpath('outside.py').write_text('')
+    return project
+
+
+def test_filter_args(project: Path) -> None:
+    assert _prefilter.filter_args(['src/a.py', 'src/b.pyi'], cwd=project) == ('src/a.py', 'src/b.pyi')
+    assert _prefilter.filter_args(
+        ['--outputjson', 'src/.f/g.py', 'src/a.py', 'src/generated/c.py', 'src'], cwd=project
+    ) == ('--outputjson', 'src/a.py', 'src')
+
+    for name in ('src/generated/c.py', 'src/.f/g.py'):
+        assert _prefilter.filter_args([name], cwd=project) is None
+
+    # pyright checks files that are named explicitly even if they are not included or are ignored
+    for name in ('scripts/e.py', 'src/legacy/d.py', '../outside.py'):
+        assert _prefilter.filter_args([name], cwd=project) == (name,)
+
+    # other arguments are never removed
+    assert _prefilter.filter_args(['src/generated/c.py', 'missing.py'], cwd=project) == ('missing.py',)
+    assert _prefilter.filter_args(['--verifytypes', 'src/generated/c.py'], cwd=project) == (
+        '--verifytypes',
+        'src/generated/c.py',
+    )
+    assert _prefilter.filter_args(['--level', 'error'], cwd=project) == ('--level', 'error')
+
+    # files are only filtered if there is a pyright configuration
+    project.joinpath('pyrightconfig.json').unlink()
+    assert _prefilter.filter_args(['src/generated/c.py'], cwd=project) == ('src/generated/c.py',)
+
+
+def test_default_excludes(project: Path) -> None:
+    project.joinpath('pyrightconfig.json').write_text('{"include": ["src"]}')
+    assert _prefilter.filter_args(['src/.f/g.py', 'src/generated/c.py'], cwd=project) == ('src/generated/c.py',)
+
+
+def test_config_cache(project: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setattr('pyright._result_cache.RACY_INTERVAL_NS', 0)
+    assert _prefilter.load_config(project) == {'exclude': ['**/generated', '**/.*']}
+
+    original = _config.load_config
+    monkeypatch.setattr(_config, 'load_config', mock.Mock(side_effect=AssertionError('should not be called')))
+    assert _prefilter.load_config(project)['exclude'] == ['**/generated', '**/.*']
+
+    # the configuration is parsed again when it changes
+    project.joinpath('pyrightconfig.json').write_text('{"exclude": ["scripts"]}')
+    monkeypatch.setattr(_config, 'load_config', original)
+    assert _prefilter.load_config(project) == {'exclude': ['scripts']}
+
+
+def test_skipped(project: Path, log_file: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('PYRIGHT_PYTHON_PREFILTER', '1')
+    proc = pyright.run('src/.f/g.py', 'src/generated/c.py', cwd=str(project), capture_output=True, text=True)
+    assert proc.returncode == 0
+    assert proc.stdout == '0 errors, 0 warnings, 0 informations \n'
+    assert log_file.read_text() == ''
+
+    proc = pyright.run('--outputjson', 'src/generated/c.py', cwd=str(project), capture_output=True)
+    assert json.loads(proc.stdout)['summary']['filesAnalyzed'] == 0
+
+    pyright.run('src/generated/c.py', 'scripts/e.py', cwd=str(project))
+    assert json.loads(log_file.read_text()) == ['scripts/e.py']
+
+
+def test_disabled_by_default(project: Path, log_file: Path) -> None:
+    pyright.run('src/generated/c.py', cwd=str(project))
+    assert json.loads(log_file.read_text()) == ['src/generated/c.py']
+
+
+@pytest.mark.usefixtures('log_file')
+def test_entrypoint(project: Path, monkeypatch: pytest.MonkeyPatch, capfd: pytest.CaptureFixture[str]) -> None:
+    monkeypatch.chdir(project)
+    monkeypatch.setenv('PYRIGHT_PYTHON_PREFILTER', '1')
+    monkeypatch.setattr(sys, 'argv', ['pyright', 'src/generated/c.py'])
+    monkeypatch.setattr('pyright.cli._get_script', mock.Mock(side_effect=AssertionError('should not be called')))
+    with pytest.raises(SystemExit) as exc:
+        cli.entrypoint()
+
+    assert exc.value.code == 0
+    assert capfd.readouterr().out == '0 errors, 0 warnings, 0 informations \n'
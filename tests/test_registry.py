@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import io
+import os
+import json
+import base64
+import hashlib
+import tarfile
+import threading
+from typing import Any, Dict, Iterator
+from pathlib import Path
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from pyright import _utils, errors, _registry
+
+
+class Registry:
+    url: str
+    routes: Dict[str, bytes]
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.routes = {}
+
+    def publish(self, version: str, files: Dict[str, bytes], *, integrity: str | None = None) -> bytes:
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode='w:gz') as tar:
+            for name, content in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                info.mode = 0o644
+                tar.addfile(info, io.BytesIO(content))
+
+        tarball = buf.getvalue()
+        if integrity is None:
+            integrity = 'sha512-' + base64.b64encode(hashlib.sha512(tarball).digest()).decode('ascii')
+
+        self.routes[f'/pyright/-/pyright-{version}.tgz'] = tarball
+        self.routes['/pyright'] = json.dumps(
+            {
+                'name': 'pyright',
+                'dist-tags': {'latest': version},
+                'versions': {
+                    version: {
+                        'dist': {
+                            'tarball': f'{self.url}/pyright/-/pyright-{version}.tgz',
+                            'integrity': integrity,
+                        }
+                    }
+                },
+            }
+        ).encode('utf-8')
+        return tarball
+
+
+@pytest.fixture(name='registry')
+def registry_fixture(monkeypatch: pytest.MonkeyPatch) -> Iterator[Registry]:
+    routes: Dict[str, bytes] = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            body = routes.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    registry = Registry(f'http://127.0.0.1:{server.server_address[1]}')
+    registry.routes = routes
+    monkeypatch.setenv('PYRIGHT_PYTHON_REGISTRY_URL', registry.url + '/')
+
+    try:
+        yield registry
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_install(tmp_path: Path, registry: Registry) -> None:
+    registry.publish(
+        '1.1.300',
+        {
+            'package/package.json': b'{"name": "pyright", "version": "1.1.300"}',
+            'package/index.js': b'console.log("hello")',
+            'package/dist/typeshed/stdlib/builtins.pyi': b'class object: ...',
+        },
+    )
+
+    pkg_dir = _registry.install('pyright', '1.1.300', dest=tmp_path)
+    assert pkg_dir == tmp_path / 'node_modules' / 'pyright'
+    assert pkg_dir.joinpath('index.js').read_text() == 'console.log("hello")'
+    assert pkg_dir.joinpath('dist', 'typeshed', 'stdlib', 'builtins.pyi').exists()
+
+
+def test_install_integrity_mismatch(tmp_path: Path, registry: Registry) -> None:
+    registry.publish(
+        '1.1.300',
+        {'package/index.js': b''},
+        integrity='sha512-' + base64.b64encode(hashlib.sha512(b'foo').digest()).decode('ascii'),
+    )
+
+    with pytest.raises(errors.RegistryError, match='Integrity check failed'):
+        _registry.install('pyright', '1.1.300', dest=tmp_path)
+
+    assert not tmp_path.joinpath('node_modules').exists()
+
+
+def test_install_unsafe_paths(tmp_path: Path, registry: Registry) -> None:
+    registry.publish('1.1.300', {'package/../../evil.js': b''})
+
+    with pytest.raises(errors.RegistryError, match='unsafe tarball member'):
+        _registry.install('pyright', '1.1.300', dest=tmp_path / 'dest')
+
+    assert not tmp_path.joinpath('evil.js').exists()
+
+
+def test_install_unknown_version(tmp_path: Path, registry: Registry) -> None:
+    registry.publish('1.1.300', {'package/index.js': b''})
+
+    with pytest.raises(errors.RegistryError, match=r'Could not find pyright@1\.1\.301'):
+        _registry.install('pyright', '1.1.301', dest=tmp_path)
+
+
+def test_latest(registry: Registry) -> None:
+    registry.publish('1.1.300', {'package/index.js': b''})
+    assert _registry.latest('pyright') == '1.1.300'
+
+
+def test_install_pyright_tarball_installer(tmp_path: Path, registry: Registry, monkeypatch: pytest.MonkeyPatch) -> None:
+    """`install_pyright()` uses the tarball installer when configured"""
+    registry.publish(
+        '1.1.300',
+        {
+            'package/package.json': b'{"name": "pyright", "version": "1.1.300"}',
+            'package/index.js': b'',
+        },
+    )
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path)
+    monkeypatch.setenv('PYRIGHT_PYTHON_INSTALLER', 'tarball')
+    monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', '1.1.300')
+    monkeypatch.setenv('PYRIGHT_PYTHON_IGNORE_WARNINGS', '1')
+
+    pkg_dir = _utils.install_pyright((), quiet=None)
+    assert pkg_dir == tmp_path / '1.1.300' / 'node_modules' / 'pyright'
+    assert pkg_dir.joinpath('index.js').exists()
+
+
+def test_tarball_installer_deduplicates(tmp_path: Path, registry: Registry, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Files that are unchanged between versions are hardlinked from the store"""
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path)
+    monkeypatch.setenv('PYRIGHT_PYTHON_INSTALLER', 'tarball')
+    monkeypatch.setenv('PYRIGHT_PYTHON_IGNORE_WARNINGS', '1')
+
+    pkg_dirs: Dict[str, Path] = {}
+    for version in ('1.1.300', '1.1.301'):
+        registry.publish(
+            version,
+            {
+                'package/package.json': json.dumps({'name': 'pyright', 'version': version}).encode('utf-8'),
+                'package/dist/typeshed/stdlib/builtins.pyi': b'class object: ...',
+            },
+        )
+        monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', version)
+        pkg_dirs[version] = _utils.install_pyright((), quiet=None)
+
+    builtins = Path('dist', 'typeshed', 'stdlib', 'builtins.pyi')
+    assert os.path.samefile(pkg_dirs['1.1.300'] / builtins, pkg_dirs['1.1.301'] / builtins)
+    assert not os.path.samefile(pkg_dirs['1.1.300'] / 'package.json', pkg_dirs['1.1.301'] / 'package.json')
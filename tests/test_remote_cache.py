@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import json
+import socket
+import threading
+from typing import Iterator
+from pathlib import Path
+
+import pytest
+
+import pyright
+from pyright import _mureq, _cache_server, _remote_cache, _result_cache
+
+FAKE_PYRIGHT = """
+const fs = require('fs');
+fs.appendFileSync(process.env.LOG_FILE, 'run\\n');
+console.log('checked ' + fs.readFileSync('src/a.py', 'utf-8'));
+process.exit(1);
+"""
+
+
+@pytest.fixture(name='server')
+def server_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[_cache_server.CacheServer]:
+    server = _cache_server.create_server(port=0, directory=tmp_path / 'server', max_size=1024)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv('PYRIGHT_PYTHON_REMOTE_CACHE_URL', f'{server.url}/pyright/')
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(name='log_file')
+def log_file_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    pkg_dir = tmp_path / 'cache' / '1.1.300' / 'node_modules' / 'pyright'
+    pkg_dir.mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': '1.1.300'}))
+    pkg_dir.joinpath('index.js').write_text(FAKE_PYRIGHT)
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setattr(_remote_cache, '_unavailable', False)
+    monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', '1.1.300')
+    monkeypatch.setenv('PYRIGHT_PYTHON_IGNORE_WARNINGS', '1')
+    monkeypatch.setenv('LOG_FILE', str(tmp_path / 'log.txt'))
+    tmp_path.joinpath('log.txt').write_text('')
+    return tmp_path / 'log.txt'
+
+
+@pytest.fixture(name='project')
+def project_fixture(tmp_path: Path) -> Path:
+    project = tmp_path / 'project'
+    project.joinpath('src').mkdir(parents=True)
+    project.joinpath('pyrightconfig.json').write_text('{}')
+    project.joinpath('src', 'a.py').write_text('foo')
+    return project
+
+
+def _runs(log_file: Path) -> int:
+    return len(log_file.read_text().splitlines())
+
+
+def test_server(server: _cache_server.CacheServer) -> None:
+    assert _mureq.get(f'{server.url}/foo').status_code == 404
+    assert _mureq.put(f'{server.url}/foo/bar', body=b'data').status_code == 201
+    assert _mureq.get(f'{server.url}/foo/bar').body == b'data'
+    assert _mureq.head(f'{server.url}/foo/bar').headers['Content-Length'] == '4'
+    assert server.directory.joinpath('foo', 'bar').read_bytes() == b'data'
+
+    assert _mureq.put(f'{server.url}/foo/large', body=b'x' * 1025).status_code == 413
+    assert _mureq.get(f'{server.url}/foo/large').status_code == 404
+
+    for key in ('..', 'foo/../bar', '.hidden', 'foo//bar'):
+        assert _mureq.put(f'{server.url}/{key}', body=b'data').status_code == 400
+
+
+def test_remote_cache(
+    server: _cache_server.CacheServer, project: Path, log_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    proc = pyright.run(cwd=str(project), capture_output=True)
+    assert proc.returncode == 1
+    assert proc.stdout == b'checked foo\n'
+    assert _runs(log_file) == 1
+
+    # the result is uploaded and replayed on the next run
+    entries = list(server.directory.joinpath('pyright').iterdir())
+    assert len(entries) == 1
+    proc = pyright.run(cwd=str(project), capture_output=True)
+    assert proc.returncode == 1
+    assert proc.stdout == b'checked foo\n'
+    assert _runs(log_file) == 1
+
+    # remote results are also stored in the local cache if it is enabled
+    monkeypatch.setenv('PYRIGHT_PYTHON_RESULT_CACHE', '1')
+    pyright.run(cwd=str(project), capture_output=True)
+    assert _result_cache.load(entries[0].name) == (1, b'checked foo\n', b'')
+
+    project.joinpath('src', 'a.py').write_text('bar')
+    monkeypatch.setenv('PYRIGHT_PYTHON_REMOTE_CACHE_READ_ONLY', '1')
+    proc = pyright.run(cwd=str(project), capture_output=True)
+    assert proc.stdout == b'checked bar\n'
+    assert _runs(log_file) == 2
+    assert len(list(server.directory.joinpath('pyright').iterdir())) == 1
+
+
+@pytest.mark.usefixtures('server')
+def test_invalid_entries(project: Path, log_file: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # results that are too large are not uploaded
+    monkeypatch.setenv('PYRIGHT_PYTHON_REMOTE_CACHE_MAX_SIZE', '10')
+    pyright.run(cwd=str(project), capture_output=True)
+    monkeypatch.delenv('PYRIGHT_PYTHON_REMOTE_CACHE_MAX_SIZE')
+    pyright.run(cwd=str(project), capture_output=True)
+    assert _runs(log_file) == 2
+
+    monkeypatch.setattr(_remote_cache, 'get_max_size', lambda: 10)
+    pyright.run(cwd=str(project), capture_output=True)
+    assert _runs(log_file) == 3
+
+
+def test_unavailable(project: Path, log_file: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # the server accepts connections but never responds
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        sock.listen()
+        monkeypatch.setenv('PYRIGHT_PYTHON_REMOTE_CACHE_URL', f'http://127.0.0.1:{sock.getsockname()[1]}')
+        monkeypatch.setenv('PYRIGHT_PYTHON_REMOTE_CACHE_TIMEOUT', '0.1')
+
+        proc = pyright.run(cwd=str(project), capture_output=True)
+        assert proc.returncode == 1
+        assert proc.stdout == b'checked foo\n'
+        assert _runs(log_file) == 1
+        assert _remote_cache._unavailable
+
+    # the cache is not used again once a request has failed
+    monkeypatch.setattr(_remote_cache, 'get_timeout', lambda: pytest.fail('should not be called'))
+    assert _remote_cache.fetch('foo') is None
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+import pyright
+from pyright import _result_cache
+
+FAKE_PYRIGHT = """
+const fs = require('fs');
+fs.appendFileSync(process.env.LOG_FILE, JSON.stringify(process.argv.slice(2)) + '\\n');
+console.log('checked ' + fs.readFileSync('src/a.py', 'utf-8'));
+console.error('some warning');
+process.exit(Number(process.env.CODE || 1));
+"""
+
+
+@pytest.fixture(name='log_file')
+def log_file_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    pkg_dir = tmp_path / 'cache' / '1.1.300' / 'node_modules' / 'pyright'
+    pkg_dir.mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': '1.1.300'}))
+    pkg_dir.joinpath('index.js').write_text(FAKE_PYRIGHT)
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', '1.1.300')
+    monkeypatch.setenv('PYRIGHT_PYTHON_IGNORE_WARNINGS', '1')
+    monkeypatch.setenv('PYRIGHT_PYTHON_RESULT_CACHE', '1')
+    monkeypatch.setenv('LOG_FILE', str(tmp_path / 'log.txt'))
+    tmp_path.joinpath('log.txt').write_text('')
+    return tmp_path / 'log.txt'
+
+
+@pytest.fixture(name='project')
+def project_fixture(tmp_path: Path) -> Path:
+    project = tmp_path / 'project'
+    project.joinpath('src').mkdir(parents=True)
+    project.joinpath('pyrightconfig.json').write_text('{"include": ["src"]}')
+    project.joinpath('src', 'a.py').write_text('foo')
+    project.joinpath('src', 'b.py').write_text('bar')
+    return project
+
+
+def _runs(log_file: Path) -> int:
+    return len(log_file.read_text().splitlines())
+
+
+def test_result_cache(project: Path, log_file: Path) -> None:
+    proc = pyright.run('--level', 'error', cwd=str(project), capture_output=True)
+    assert proc.returncode == 1
+    assert proc.stdout == b'checked foo\n'
+    assert proc.stderr == b'some warning\n'
+    assert _runs(log_file) == 1
+
+    # the result is replayed
+    cached = pyright.run('--level', 'error', cwd=str(project), capture_output=True, text=True)
+    assert cached.returncode == 1
+    assert cached.stdout == 'checked foo\n'
+    assert cached.stderr == 'some warning\n'
+    assert _runs(log_file) == 1
+
+    # the file contents are hashed, not just the mtime
+    os.utime(project / 'src' / 'b.py', (0, 0))
+    pyright.run('--level', 'error', cwd=str(project), capture_output=True)
+    assert _runs(log_file) == 1
+
+    project.joinpath('src', 'a.py').write_text('baz')
+    proc = pyright.run('--level', 'error', cwd=str(project), capture_output=True)
+    assert proc.stdout == b'checked baz\n'
+    assert _runs(log_file) == 2
+
+    # new files, configuration changes and different arguments are not cached
+    project.joinpath('src', 'c.py').write_text('')
+    pyright.run('--level', 'error', cwd=str(project), capture_output=True)
+    assert _runs(log_file) == 3
+
+    project.joinpath('pyrightconfig.json').write_text('{"include": ["src"], "strict": ["src"]}')
+    pyright.run('--level', 'error', cwd=str(project), capture_output=True)
+    assert _runs(log_file) == 4
+
+    pyright.run(cwd=str(project), capture_output=True)
+    assert _runs(log_file) == 5
+
+
+def test_not_cached(project: Path, log_file: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # fatal errors
+    monkeypatch.setenv('CODE', '2')
+    assert pyright.run(cwd=str(project), stdout=subprocess.DEVNULL).returncode == 2
+    assert pyright.run(cwd=str(project), stdout=subprocess.DEVNULL).returncode == 2
+    assert _runs(log_file) == 2
+
+    # options that change what pyright does
+    monkeypatch.setenv('CODE', '0')
+    pyright.run('--watch', cwd=str(project), stdout=subprocess.DEVNULL)
+    pyright.run('--watch', cwd=str(project), stdout=subprocess.DEVNULL)
+    assert _runs(log_file) == 4
+
+    # the cache is disabled by default
+    monkeypatch.delenv('PYRIGHT_PYTHON_RESULT_CACHE')
+    pyright.run(cwd=str(project), stdout=subprocess.DEVNULL)
+    pyright.run(cwd=str(project), stdout=subprocess.DEVNULL)
+    assert _runs(log_file) == 6
+
+
+def test_import_roots(project: Path, log_file: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """sources outside of the project that imports resolve to are part of the fingerprint"""
+    editable = tmp_path / 'editable'
+    editable.mkdir()
+    monkeypatch.setattr(sys, 'path', [str(editable), *sys.path])
+    sibling = tmp_path / 'sibling'
+    sibling.mkdir()
+    sibling.joinpath('sibling.py').write_text('foo')
+    env = {**os.environ, 'PYTHONPATH': str(sibling)}
+
+    roots = _result_cache.get_import_roots(env)
+    assert editable.resolve() in roots
+    assert sibling.resolve() in roots
+    assert not any(Path(sys.prefix).resolve() in (root, *root.parents) for root in roots)
+
+    for _ in range(2):
+        pyright.run(cwd=str(project), env=env, stdout=subprocess.DEVNULL)
+    assert _runs(log_file) == 1
+
+    sibling.joinpath('sibling.py').write_text('bar')
+    pyright.run(cwd=str(project), env=env, stdout=subprocess.DEVNULL)
+    assert _runs(log_file) == 2
+
+    editable.joinpath('editable.py').write_text('')
+    pyright.run(cwd=str(project), env=env, stdout=subprocess.DEVNULL)
+    assert _runs(log_file) == 3
+
+
+def test_hash_files(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setattr(_result_cache, 'RACY_INTERVAL_NS', 0)
+    foo = tmp_path / 'foo.py'
+    foo.write_text('foo')
+
+    digests = _result_cache.hash_files(tmp_path, [foo, tmp_path / 'missing.py'])
+    assert digests == {
+        str(foo): '2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae',
+        str(tmp_path / 'missing.py'): 'missing',
+    }
+
+    # files are not read again if their size and mtime are the same
+    monkeypatch.setattr(_result_cache, '_hash_file', mock.Mock(side_effect=AssertionError('should not be called')))
+    assert _result_cache.hash_files(tmp_path, [foo]) == {str(foo): digests[str(foo)]}
+
+
+def test_eviction(project: Path, log_file: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('PYRIGHT_PYTHON_RESULT_CACHE_MAX_ENTRIES', '2')
+    for level in ('error', 'warning', 'information'):
+        pyright.run('--level', level, cwd=str(project), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    assert _runs(log_file) == 3
+    assert len(list(_result_cache.get_cache_dir().glob('*.json'))) == 2
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import io
+import json
+import asyncio
+from typing import Any, Dict, List
+from pathlib import Path
+
+import pytest
+
+import pyright
+from pyright import errors
+from pyright.results import Range, Summary, Position, Diagnostic, CheckResult, parse_output, parse_stream, merge_results
+
+OUTPUT: Dict[str, Any] = {
+    'version': '1.1.300',
+    'time': '1700000000000',
+    'generalDiagnostics': [
+        {
+            'file': '/project/foo.py',
+            'severity': 'error',
+            'message': 'Import "bar" could not be resolved',
+            'range': {'start': {'line': 0, 'character': 7}, 'end': {'line': 0, 'character': 10}},
+            'rule': 'reportMissingImports',
+        },
+        {
+            'file': '/project/foo.py',
+            'severity': 'warning',
+            'message': 'Unnecessary cast',
+            'range': {'start': {'line': 3, 'character': 0}, 'end': {'line': 4, 'character': 1}},
+            'rule': 'reportUnnecessaryCast',
+        },
+        {
+            'file': '/project/pyrightconfig.json',
+            'severity': 'information',
+            'message': 'Config note',
+        },
+    ],
+    'summary': {
+        'filesAnalyzed': 2,
+        'errorCount': 1,
+        'warningCount': 1,
+        'informationCount': 1,
+        'timeInSec': 0.5,
+    },
+}
+
+
+def test_parse_output() -> None:
+    result = parse_output(json.dumps(OUTPUT), returncode=1)
+    assert result.version == '1.1.300'
+    assert result.returncode == 1
+    assert result.summary == Summary(
+        files_analyzed=2, error_count=1, warning_count=1, information_count=1, time_in_sec=0.5
+    )
+    assert result.diagnostics == [
+        Diagnostic(
+            file='/project/foo.py',
+            severity='error',
+            message='Import "bar" could not be resolved',
+            rule='reportMissingImports',
+            range=Range(0, 7, 0, 10),
+        ),
+        Diagnostic(
+            file='/project/foo.py',
+            severity='warning',
+            message='Unnecessary cast',
+            rule='reportUnnecessaryCast',
+            range=Range(3, 0, 4, 1),
+        ),
+        Diagnostic(file='/project/pyrightconfig.json', severity='information', message='Config note'),
+    ]
+    assert [diagnostic.rule for diagnostic in result.errors] == ['reportMissingImports']
+    assert [diagnostic.rule for diagnostic in result.warnings] == ['reportUnnecessaryCast']
+
+    error = result.diagnostics[0]
+    assert error.range is not None
+    assert error.range.start == Position(line=0, character=7)
+    assert error.range.end == Position(line=0, character=10)
+
+
+def test_parse_output_compact() -> None:
+    result = parse_output(json.dumps(OUTPUT).encode('utf-8'))
+
+    # file paths are shared between diagnostics
+    assert result.diagnostics[0].file is result.diagnostics[1].file
+
+    # records do not have a `__dict__`
+    for record in (result.diagnostics[0], result.diagnostics[0].range, result.summary, result):
+        assert not hasattr(record, '__dict__')
+
+
+def test_parse_output_invalid() -> None:
+    with pytest.raises(ValueError):
+        parse_output('No configuration file found.')
+
+    with pytest.raises(ValueError):
+        parse_output('[]')
+
+
+@pytest.fixture(name='fake_pyright')
+def fake_pyright_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    pkg_dir = tmp_path / 'cache' / '1.1.300' / 'node_modules' / 'pyright'
+    pkg_dir.mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': '1.1.300'}))
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', '1.1.300')
+    monkeypatch.setenv('PYRIGHT_PYTHON_IGNORE_WARNINGS', '1')
+    return pkg_dir / 'index.js'
+
+
+def test_check(fake_pyright: Path) -> None:
+    fake_pyright.write_text(
+        'const args = process.argv.slice(2);\n'
+        + f'const output = {json.dumps(OUTPUT)};\n'
+        + 'output.version = JSON.stringify(args);\n'
+        + 'console.log(JSON.stringify(output));\n'
+        + 'process.exit(1);\n'
+    )
+
+    result = pyright.check(['foo.py', Path('bar.py')], args=['--level', 'error'])
+    assert result.returncode == 1
+    assert json.loads(result.version or '') == ['--outputjson', '--level', 'error', 'foo.py', 'bar.py']
+    assert len(result.diagnostics) == 3
+    assert result.summary.error_count == 1
+
+
+def test_check_failed(fake_pyright: Path) -> None:
+    fake_pyright.write_text('console.error("Config file could not be parsed"); process.exit(3);')
+
+    with pytest.raises(errors.CheckError, match='Config file could not be parsed') as exc:
+        pyright.check()
+
+    assert exc.value.returncode == 3
+
+
+def test_merge_results() -> None:
+    error = Diagnostic(file='foo.py', severity='error', message='error')
+    warning = Diagnostic(file='foo.py', severity='warning', message='warning')
+
+    # diagnostics reported by more than one result are only included once
+    merged = merge_results(
+        [
+            CheckResult(diagnostics=[error], summary=Summary(files_analyzed=1, error_count=1), returncode=1),
+            CheckResult(diagnostics=[error, warning], summary=Summary(files_analyzed=2), returncode=0),
+        ]
+    )
+    assert merged.diagnostics == [error, warning]
+    assert merged.summary == Summary(files_analyzed=3, error_count=1, warning_count=1)
+    assert merged.returncode == 1
+
+    # but identical diagnostics reported by the same result are kept
+    merged = merge_results([CheckResult(diagnostics=[error, error], summary=Summary(), returncode=1)])
+    assert merged.diagnostics == [error, error]
+    assert merged.summary.error_count == 2
+
+
+class _ChunkedReader(io.RawIOBase):
+    """Returns at most `size` bytes per read to exercise every buffer boundary"""
+
+    def __init__(self, data: bytes, size: int) -> None:
+        self._data = data
+        self._size = size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        chunk = self._data[: min(len(buffer), self._size)]
+        self._data = self._data[len(chunk) :]
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+
+@pytest.mark.parametrize('size', [1, 3, 4096])
+def test_parse_stream(size: int) -> None:
+    output: Any = json.loads(json.dumps(OUTPUT))
+    output['generalDiagnostics'].append({'file': 'ü.py', 'severity': 'error', 'message': '€'})
+    data = json.dumps(output, indent=2, ensure_ascii=False).encode('utf-8')
+
+    stream = parse_stream(_ChunkedReader(data, size))
+    diagnostics = list(stream)
+    assert diagnostics == [*parse_output(data).diagnostics]
+    assert diagnostics[-1] == Diagnostic(file='ü.py', severity='error', message='€')
+    assert stream.version == '1.1.300'
+    assert stream.summary is not None
+    assert stream.summary.error_count == 1
+
+    with pytest.raises(RuntimeError):
+        list(stream)
+
+
+def test_parse_stream_empty() -> None:
+    stream = parse_stream(io.BytesIO(b'{"version": "1.1.300", "generalDiagnostics": []}'))
+    assert list(stream) == []
+    assert stream.version == '1.1.300'
+    assert stream.summary is None
+
+
+def test_parse_stream_invalid() -> None:
+    with pytest.raises(ValueError):
+        list(parse_stream(io.BytesIO(b'No configuration file found.')))
+
+    with pytest.raises(ValueError):
+        list(parse_stream(io.BytesIO(b'{"generalDiagnostics": [{"file": "foo.py"')))
+
+
+def test_check_stream(fake_pyright: Path) -> None:
+    fake_pyright.write_text(
+        f'const output = {json.dumps(OUTPUT)};\n'
+        + 'output.version = JSON.stringify(process.argv.slice(2));\n'
+        + 'console.log(JSON.stringify(output));\n'
+        + 'process.exit(1);\n'
+    )
+
+    with pyright.check_stream(['foo.py']) as stream:
+        assert [diagnostic.severity for diagnostic in stream] == ['error', 'warning', 'information']
+
+    assert stream.returncode == 1
+    assert json.loads(stream.version or '') == ['--outputjson', 'foo.py']
+
+
+def test_check_stream_failed(fake_pyright: Path) -> None:
+    fake_pyright.write_text('console.error("Config file could not be parsed"); process.exit(3);')
+
+    with pytest.raises(errors.CheckError, match='Config file could not be parsed') as exc:
+        with pyright.check_stream() as stream:
+            list(stream)
+
+    assert exc.value.returncode == 3
+
+
+def test_check_stream_closed_early(fake_pyright: Path) -> None:
+    fake_pyright.write_text(
+        'process.stdout.write(\'{"generalDiagnostics": [\');\n'
+        + f'process.stdout.write(JSON.stringify({json.dumps(OUTPUT["generalDiagnostics"][0])}));\n'
+        + 'setInterval(() => {}, 1000);\n'
+    )
+
+    with pyright.check_stream() as stream:
+        assert next(iter(stream)).severity == 'error'
+
+    assert stream._process is not None
+    assert stream._process.poll() is not None
+
+
+def test_acheck(fake_pyright: Path) -> None:
+    fake_pyright.write_text(
+        f'const output = {json.dumps(OUTPUT)};\n'
+        + 'output.version = process.argv[process.argv.length - 1];\n'
+        + 'setTimeout(() => console.log(JSON.stringify(output)), 100);\n'
+    )
+
+    async def main() -> List[CheckResult]:
+        return await asyncio.gather(*(pyright.acheck([f'{i}.py']) for i in range(5)))
+
+    results = asyncio.run(main())
+    assert [result.version for result in results] == [f'{i}.py' for i in range(5)]
+    assert all(len(result.diagnostics) == 3 for result in results)
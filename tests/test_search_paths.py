@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import os
+import sys
+import json
+import sysconfig
+from typing import Any, Dict, List
+from pathlib import Path
+
+import pytest
+
+import pyright
+from pyright import _config, _search_paths
+
+FAKE_PYRIGHT = """
+const fs = require('fs');
+const args = process.argv.slice(2);
+const project = args.indexOf('--project');
+const config = project === -1 ? null : JSON.parse(fs.readFileSync(args[project + 1], 'utf-8'));
+fs.appendFileSync(process.env.LOG_FILE, JSON.stringify({ args, config }) + '\\n');
+process.exit(0);
+"""
+
+SEARCH_PATHS = {'venvPath': '/envs', 'venv': 'project', 'extraPaths': ['/usr/lib/python3/dist-packages']}
+VERSION = f'{sys.version_info[0]}.{sys.version_info[1]}'
+
+
+@pytest.fixture(name='log_file')
+def log_file_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    pkg_dir = tmp_path / 'cache' / '1.1.300' / 'node_modules' / 'pyright'
+    pkg_dir.mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': '1.1.300'}))
+    pkg_dir.joinpath('index.js').write_text(FAKE_PYRIGHT)
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setattr(_search_paths, 'get_search_paths', lambda: dict(SEARCH_PATHS))
+    monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', '1.1.300')
+    monkeypatch.setenv('PYRIGHT_PYTHON_IGNORE_WARNINGS', '1')
+    monkeypatch.setenv('PYRIGHT_PYTHON_SEARCH_PATHS', '1')
+    monkeypatch.setenv('LOG_FILE', str(tmp_path / 'log.txt'))
+    tmp_path.joinpath('log.txt').write_text('')
+    return tmp_path / 'log.txt'
+
+
+@pytest.fixture(name='project')
+def project_fixture(tmp_path: Path) -> Path:
+    project = tmp_path / 'project'
+    project.joinpath('src').mkdir(parents=True)
+    project.joinpath('pyrightconfig.json').write_text('{"include": ["src"], "extraPaths": ["vendor"]}')
+    project.joinpath('src', 'a.py').write_text('')
+    return project
+
+
+def read_log(log_file: Path) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in log_file.read_text().splitlines()]
+
+
+def test_compute(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    prefix = tmp_path / 'venv'
+    site_packages = prefix / 'lib' / f'python{VERSION}' / 'site-packages'
+    site_packages.mkdir(parents=True)
+    editable = tmp_path / 'editable'
+    editable.mkdir()
+    site_packages.joinpath('editable.pth').write_text(f'# comment\nimport os\n{editable}\n')
+    monkeypatch.setattr(sys, 'prefix', str(prefix))
+
+    stdlib = os.path.abspath(sysconfig.get_path('stdlib'))
+    other = str(tmp_path / 'dist-packages')
+    assert _search_paths._compute([stdlib, str(site_packages), str(editable), other]) == {
+        'venvPath': str(tmp_path),
+        'venv': 'venv',
+        'extraPaths': [other],
+    }
+
+    # pyright would not find `site-packages` by itself
+    assert _search_paths._compute([stdlib, other]) is None
+
+
+def test_get_search_paths_cached(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    directory = tmp_path / 'site-packages'
+    directory.mkdir()
+    os.utime(directory, (0, 0))
+    monkeypatch.setattr(_search_paths, '_get_sys_path', lambda: [str(directory)])
+
+    calls: List[List[str]] = []
+
+    def compute(sys_path: List[str]) -> Dict[str, Any]:
+        calls.append(sys_path)
+        return dict(SEARCH_PATHS)
+
+    monkeypatch.setattr(_search_paths, '_compute', compute)
+    assert _search_paths.get_search_paths() == SEARCH_PATHS
+    assert _search_paths.get_search_paths() == SEARCH_PATHS
+    assert len(calls) == 1
+
+    # installing a package invalidates the cache
+    os.utime(directory, (1, 1))
+    assert _search_paths.get_search_paths() == SEARCH_PATHS
+    assert len(calls) == 2
+
+
+def test_get_search_paths_current_interpreter(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    search_paths = _search_paths.get_search_paths()
+    if search_paths is not None:
+        assert os.path.join(search_paths['venvPath'], search_paths['venv']) == os.path.abspath(sys.prefix)
+
+
+def test_run(project: Path, log_file: Path) -> None:
+    assert pyright.run('--outputjson', 'src/a.py', cwd=str(project)).returncode == 0
+    (entry,) = read_log(log_file)
+    assert entry['args'][:3] == ['--outputjson', '--pythonversion', VERSION]
+    assert entry['args'][3] == '--project'
+    assert entry['args'][5:] == ['src/a.py']
+    assert entry['config'] == {
+        'include': [str(project / 'src')],
+        'exclude': [str(project / pattern) for pattern in _config.DEFAULT_EXCLUDES],
+        'stubPath': str(project / 'typings'),
+        'venvPath': '/envs',
+        'venv': 'project',
+        'extraPaths': [str(project / 'src'), str(project / 'vendor'), '/usr/lib/python3/dist-packages'],
+        'autoSearchPaths': False,
+        'executionEnvironments': [{'root': str(project)}],
+    }
+
+    # the temporary configuration file is removed and never written to the project
+    assert not Path(entry['args'][4]).exists()
+    assert sorted(path.name for path in project.iterdir()) == ['pyrightconfig.json', 'src']
+
+
+def test_run_configured_interpreter(project: Path, log_file: Path) -> None:
+    project.joinpath('pyrightconfig.json').write_text('{"venvPath": ".", "venv": ".venv", "pythonVersion": "3.8"}')
+    assert pyright.run('src/a.py', cwd=str(project)).returncode == 0
+    assert pyright.run('--pythonpath', sys.executable, 'src/a.py', cwd=str(project)).returncode == 0
+    assert [entry['args'] for entry in read_log(log_file)] == [
+        ['src/a.py'],
+        ['--pythonpath', sys.executable, 'src/a.py'],
+    ]
+
+
+def test_disabled(project: Path, log_file: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('PYRIGHT_PYTHON_SEARCH_PATHS', '0')
+    assert pyright.run('src/a.py', cwd=str(project)).returncode == 0
+    assert read_log(log_file) == [{'args': ['src/a.py'], 'config': None}]
+
+
+def test_get_env() -> None:
+    directory = os.path.dirname(sys.executable)
+    env = _search_paths.get_env({'PATH': 'other'})
+    assert env['PATH'] == f'{directory}{os.pathsep}other'
+    assert _search_paths.get_env(env) == env
+    assert _search_paths.get_env({})['PATH'] == directory
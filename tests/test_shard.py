@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import os
+import json
+import asyncio
+import tempfile
+import subprocess
+from typing import Any, List, cast
+from pathlib import Path
+
+import pytest
+
+import pyright
+from pyright import _shard, errors, _config, _commands, _file_list
+
+FAKE_PYRIGHT = """
+const fs = require('fs');
+const files = process.argv.slice(2).filter((arg) => !arg.startsWith('-'));
+fs.appendFileSync(process.env.LOG_FILE, JSON.stringify(files) + '\\n');
+if (files.some((file) => file.includes('garbage'))) {
+  console.log('not json');
+  process.exit(0);
+}
+
+const diagnostics = files.map((file) => ({
+  file,
+  severity: file.includes('bad') ? 'error' : 'warning',
+  message: 'checked',
+  range: { start: { line: 0, character: 0 }, end: { line: 0, character: 1 } },
+}));
+diagnostics.push({ file: '/shared.py', severity: 'information', message: 'imported by every shard' });
+console.error('No configuration file found.');
+console.log(JSON.stringify({
+  version: '1.1.300',
+  time: '0',
+  generalDiagnostics: diagnostics,
+  summary: { filesAnalyzed: files.length, errorCount: 0, warningCount: 0, informationCount: 0, timeInSec: 0.1 },
+}));
+process.exit(diagnostics.some((diagnostic) => diagnostic.severity === 'error') ? 1 : 0);
+"""
+
+
+@pytest.fixture(name='log_file')
+def log_file_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    pkg_dir = tmp_path / 'cache' / '1.1.300' / 'node_modules' / 'pyright'
+    pkg_dir.mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': '1.1.300'}))
+    pkg_dir.joinpath('index.js').write_text(FAKE_PYRIGHT)
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setenv('PYRIGHT_PYTHON_FORCE_VERSION', '1.1.300')
+    monkeypatch.setenv('PYRIGHT_PYTHON_IGNORE_WARNINGS', '1')
+    monkeypatch.setenv('LOG_FILE', str(tmp_path / 'log.txt'))
+    return tmp_path / 'log.txt'
+
+
+@pytest.fixture(name='project')
+def project_fixture(tmp_path: Path) -> Path:
+    project = tmp_path / 'project'
+    project.joinpath('src', 'pkg').mkdir(parents=True)
+    project.joinpath('pyrightconfig.json').write_text('{"include": ["src"]}')
+    project.joinpath('src', 'a.py').write_text('x' * 100)
+    project.joinpath('src', 'bad.py').write_text('x' * 60)
+    project.joinpath('src', 'pkg', 'c.py').write_text('x' * 50)
+    project.joinpath('src', 'pkg', 'd.pyi').write_text('x' * 10)
+    project.joinpath('setup.py').write_text('')
+    return project
+
+
+def test_plan(tmp_path: Path) -> None:
+    files: List[Path] = []
+    for name, size in [('a', 10), ('b', 70), ('c', 30), ('d', 30), ('e', 40), ('f', 20)]:
+        path = tmp_path / f'{name}.py'
+        path.write_text('x' * size)
+        files.append(path)
+
+    shards = _shard.plan(files, 3)
+    assert [[path.stem for path in shard] for shard in shards] == [['b'], ['e', 'f', 'a'], ['c', 'd']]
+
+    # the order of the given files does not matter
+    assert _shard.plan(list(reversed(files)), 3) == shards
+
+    # shards are empty if there are not enough files
+    assert _shard.plan(files[:2], 3) == [[files[1]], [files[0]], []]
+
+
+def test_split_args() -> None:
+    assert _shard.split_args(['--outputjson', '-p', 'foo', '--level=error', 'a.py', '--threads', 'b.py']) == (
+        ['--outputjson', '-p', 'foo', '--level=error', '--threads'],
+        ['a.py', 'b.py'],
+    )
+    assert _shard.split_args(['--threads', '4', 'a.py']) == (['--threads', '4'], ['a.py'])
+    assert _shard.split_args(['--verifytypes', 'foo']) is None
+    assert _shard.pop_jobs(['--jobs', '3', 'a.py', '--jobs=4']) == (4, ('a.py',))
+    assert _shard.pop_jobs(['a.py']) == (1, ('a.py',))
+    assert _shard.pop_shard(['--shard', '2/3', 'a.py']) == ((2, 3), ('a.py',))
+
+    for value in ('0/3', '4/3', '1', 'a/b'):
+        with pytest.raises(errors.PyrightError):
+            _shard.pop_shard([f'--shard={value}'])
+
+
+def test_find_sources(project: Path) -> None:
+    project.joinpath('src', 'node_modules').mkdir()
+    project.joinpath('src', 'node_modules', 'e.py').write_text('')
+    project.joinpath('src', '.hidden').mkdir()
+    project.joinpath('src', '.hidden', 'f.py').write_text('')
+
+    assert _config.find_sources(project, _config.load_config(project)) == [
+        project / 'src' / 'a.py',
+        project / 'src' / 'bad.py',
+        project / 'src' / 'pkg' / 'c.py',
+        project / 'src' / 'pkg' / 'd.pyi',
+    ]
+    assert _config.find_sources(project, {'include': ['src/*.py', 'setup.py'], 'exclude': ['**/bad.py']}) == [
+        project / 'src' / 'a.py',
+        project / 'setup.py',
+    ]
+
+
+def test_jobs(project: Path, log_file: Path) -> None:
+    proc = pyright.run('--outputjson', '--jobs', '2', cwd=str(project), capture_output=True)
+    assert proc.returncode == 1
+    assert proc.stderr == b'No configuration file found.\n'
+
+    shards = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert sorted(len(shard) for shard in shards) == [2, 2]
+
+    output = json.loads(proc.stdout)
+    assert output['summary']['filesAnalyzed'] == 4
+    assert output['summary']['errorCount'] == 1
+    assert output['summary']['warningCount'] == 3
+    assert output['summary']['informationCount'] == 1
+    assert sorted(diagnostic['file'] for diagnostic in output['generalDiagnostics']) == sorted(
+        [*(file for shard in shards for file in shard), '/shared.py']
+    )
+
+
+def test_jobs_too_long(project: Path, log_file: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """the files in each shard are passed through a temporary configuration file if they are too long"""
+    monkeypatch.setattr(_file_list, 'get_max_command_length', lambda: 100)
+    proc = pyright.run('--outputjson', '--jobs', '2', cwd=str(project), capture_output=True)
+    assert proc.returncode == 0
+
+    shards = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert len(shards) == 2
+    for files in shards:
+        assert len(files) == 1
+        assert Path(files[0]).parent == Path(tempfile.gettempdir())
+
+
+def test_arun_jobs(project: Path, log_file: Path) -> None:
+    """`arun()` handles the arguments in the same way as `run()`"""
+    proc = asyncio.run(pyright.arun('--outputjson', '--jobs', '2', cwd=str(project), stdout=subprocess.PIPE))
+    assert proc.returncode == 1
+    assert len(log_file.read_text().splitlines()) == 2
+    assert json.loads(proc.stdout)['summary']['filesAnalyzed'] == 4
+
+
+def test_arun_jobs_cancelled(project: Path, log_file: Path, tmp_path: Path) -> None:
+    """Cancelling `arun()` kills every shard"""
+    index_js = tmp_path / 'cache' / '1.1.300' / 'node_modules' / 'pyright' / 'index.js'
+    index_js.write_text(
+        'require("fs").appendFileSync(process.env.LOG_FILE, process.pid + "\\n");\nsetInterval(() => {}, 1000);\n'
+    )
+
+    async def main() -> None:
+        task = asyncio.ensure_future(pyright.arun('--jobs', '2', cwd=str(project), stdout=subprocess.PIPE))
+        while len(log_file.read_text().splitlines() if log_file.exists() else []) < 2:
+            await asyncio.sleep(0.05)
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+
+    for pid in log_file.read_text().splitlines():
+        with pytest.raises(ProcessLookupError):
+            os.kill(int(pid), 0)
+
+
+def test_jobs_text_output(project: Path, log_file: Path) -> None:
+    proc = pyright.run('--jobs=4', 'src/pkg', 'src/a.py', cwd=str(project), capture_output=True, text=True)
+    assert proc.returncode == 0
+    assert len(log_file.read_text().splitlines()) == 3
+
+    lines = proc.stdout.splitlines()
+    assert f'  {project / "src" / "a.py"}:1:1 - warning: checked' in lines
+    assert '  /shared.py:information: imported by every shard' in lines
+    assert lines[-1] == '0 errors, 3 warnings, 1 information '
+
+
+def test_jobs_fallback(project: Path, log_file: Path) -> None:
+    """pyright is ran normally if there is nothing to split"""
+    proc = pyright.run('--jobs', '4', 'src/a.py', cwd=str(project), stdout=subprocess.PIPE)
+    assert proc.returncode == 0
+    assert json.loads(log_file.read_text()) == ['src/a.py']
+
+    proc = pyright.run('--jobs', 'foo', cwd=str(project), capture_output=True)
+    assert proc.returncode == 4
+    assert b'Expected --jobs to be a positive number' in cast(bytes, proc.stderr)
+
+
+def test_jobs_invalid_output(project: Path, log_file: Path) -> None:
+    """a shard that exits successfully without any results is reported as a failure"""
+    project.joinpath('src', 'garbage.py').write_text('')
+    proc = pyright.run('--jobs', '2', cwd=str(project), capture_output=True)
+    assert proc.returncode == 4
+    assert proc.stdout == b'not json\n'
+    assert len(log_file.read_text().splitlines()) == 2
+
+
+def test_shard(project: Path, log_file: Path, tmp_path: Path) -> None:
+    outputs: List[Any] = []
+    for index in (1, 2, 3):
+        proc = pyright.run('--outputjson', '--shard', f'{index}/3', cwd=str(project), capture_output=True)
+        tmp_path.joinpath(f'shard-{index}.json').write_bytes(cast(bytes, proc.stdout))
+        outputs.append(json.loads(proc.stdout))
+
+    # every file is checked exactly once
+    shards = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert sorted(file for shard in shards for file in shard) == sorted(
+        str(project / 'src' / name) for name in ('a.py', 'bad.py', 'pkg/c.py', 'pkg/d.pyi')
+    )
+    assert shards[0] == [str(project / 'src' / 'a.py')]
+
+    # shards are empty if there are more shards than files
+    proc = pyright.run('--outputjson', '--shard', '5/5', cwd=str(project), capture_output=True)
+    assert proc.returncode == 0
+    assert json.loads(proc.stdout)['summary']['filesAnalyzed'] == 0
+    assert len(log_file.read_text().splitlines()) == 3
+
+
+def test_merge(project: Path, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    tmp_path.joinpath('shard-1.json').write_text(
+        json.dumps(
+            {
+                'version': '1.1.300',
+                'generalDiagnostics': [
+                    {'file': 'a.py', 'severity': 'error', 'message': 'bad'},
+                    {'file': 'shared.py', 'severity': 'warning', 'message': 'shared'},
+                ],
+                'summary': {'filesAnalyzed': 2, 'errorCount': 1, 'warningCount': 1, 'informationCount': 0},
+            }
+        )
+    )
+    tmp_path.joinpath('shard-2.json').write_text(
+        json.dumps(
+            {
+                'version': '1.1.300',
+                'generalDiagnostics': [{'file': 'shared.py', 'severity': 'warning', 'message': 'shared'}],
+                'summary': {'filesAnalyzed': 3, 'errorCount': 0, 'warningCount': 1, 'informationCount': 0},
+            }
+        )
+    )
+
+    assert _commands.main(['merge', str(tmp_path / 'shard-*.json'), '--outputjson']) == 1
+    output = json.loads(capsys.readouterr().out)
+    assert output['summary']['filesAnalyzed'] == 5
+    assert output['summary']['errorCount'] == 1
+    assert output['summary']['warningCount'] == 1
+    assert [diagnostic['file'] for diagnostic in output['generalDiagnostics']] == ['a.py', 'shared.py']
+
+    assert _commands.main(['merge', str(tmp_path / 'shard-2.json')]) == 0
+    assert capsys.readouterr().out.splitlines() == [
+        'shared.py',
+        '  shared.py:warning: shared',
+        '0 errors, 1 warning, 0 informations ',
+    ]
+
+    project.joinpath('invalid.json').write_text('No configuration file found.')
+    assert _commands.main(['merge', str(project / 'invalid.json')]) == 1
+    assert 'does not contain the output of pyright --outputjson' in capsys.readouterr().err
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import io
+import os
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from pyright import _gc, _store
+
+
+@pytest.fixture(name='cache_dir')
+def cache_dir_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    cache_dir = tmp_path / 'pyright-python'
+    cache_dir.mkdir()
+    monkeypatch.setattr('pyright._utils.ROOT_CACHE_DIR', cache_dir)
+    monkeypatch.delenv('PYRIGHT_PYTHON_FORCE_VERSION', raising=False)
+    monkeypatch.delenv('PYRIGHT_PYTHON_CACHE_DEDUPE', raising=False)
+    return cache_dir
+
+
+def _install_fake_version(cache_dir: Path, version: str, files: dict[str, bytes]) -> Path:
+    cache_dir.joinpath(version).mkdir()
+    cache_dir.joinpath(version, 'package.json').write_text('{}')
+    pkg_dir = cache_dir / version / 'node_modules' / 'pyright'
+    pkg_dir.mkdir(parents=True)
+    pkg_dir.joinpath('package.json').write_text(json.dumps({'name': 'pyright', 'version': version}))
+    for name, content in files.items():
+        pkg_dir.joinpath(name).write_bytes(content)
+    return pkg_dir
+
+
+def _dedupe(path: Path) -> None:
+    with _store.use() as store:
+        assert store is not None
+        store.dedupe(path)
+
+
+def test_dedupe(cache_dir: Path) -> None:
+    first = _install_fake_version(cache_dir, '1.1.300', {'shared.js': b'a' * 100, 'changed.js': b'b' * 100})
+    second = _install_fake_version(cache_dir, '1.1.301', {'shared.js': b'a' * 100, 'changed.js': b'c' * 100})
+    _dedupe(first)
+    _dedupe(second)
+
+    assert os.path.samefile(first / 'shared.js', second / 'shared.js')
+    assert not os.path.samefile(first / 'changed.js', second / 'changed.js')
+    assert second.joinpath('shared.js').read_bytes() == b'a' * 100
+    assert first.joinpath('shared.js').stat().st_nlink == 3
+
+
+def test_dedupe_respects_file_mode(cache_dir: Path) -> None:
+    first = _install_fake_version(cache_dir, '1.1.300', {'bin.js': b'a'})
+    second = _install_fake_version(cache_dir, '1.1.301', {'bin.js': b'a'})
+    second.joinpath('bin.js').chmod(0o755)
+    _dedupe(first)
+    _dedupe(second)
+
+    assert not os.path.samefile(first / 'bin.js', second / 'bin.js')
+    assert os.access(str(second / 'bin.js'), os.X_OK)
+
+
+def test_dedupe_disabled(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('PYRIGHT_PYTHON_CACHE_DEDUPE', '0')
+    with _store.use() as store:
+        assert store is None
+
+    assert not cache_dir.joinpath('.store').exists()
+
+
+def test_dedupe_opt_in(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Installs that have already been written, e.g. by npm, are only deduplicated if explicitly enabled"""
+    with _store.use(default=False) as store:
+        assert store is None
+
+    monkeypatch.setenv('PYRIGHT_PYTHON_CACHE_DEDUPE', '1')
+    with _store.use(default=False) as store:
+        assert store is not None
+
+
+def test_write_links_existing_files(cache_dir: Path) -> None:
+    first = _install_fake_version(cache_dir, '1.1.300', {'shared.js': b'a' * 100})
+    _dedupe(first)
+
+    path = cache_dir / 'new.js'
+    with _store.use() as store:
+        assert store is not None
+        store.write(io.BytesIO(b'a' * 100), path, size=100, mode=0o644)
+        store.write(io.BytesIO(b'd' * 100), cache_dir / 'other.js', size=100, mode=0o644)
+
+    assert os.path.samefile(first / 'shared.js', path)
+    assert cache_dir.joinpath('other.js').stat().st_nlink == 2
+
+
+def test_prune_accounts_for_shared_files(cache_dir: Path) -> None:
+    first = _install_fake_version(cache_dir, '1.1.300', {'shared.js': b'a' * 1000, 'changed.js': b'b' * 100})
+    second = _install_fake_version(cache_dir, '1.1.301', {'shared.js': b'a' * 1000, 'changed.js': b'c' * 100})
+    os.utime(str(cache_dir / '1.1.300'), (0, 0))
+    _dedupe(first)
+    _dedupe(second)
+
+    versions = _gc.get_cached_versions()
+    assert [entry.version for entry in versions] == ['1.1.300', '1.1.301']
+
+    # the shared file is not reclaimed by removing the older version
+    assert versions[0].size < 1000
+
+    result = _gc.prune(max_size=1200)
+    assert [entry.version for entry in result.removed] == ['1.1.300']
+    assert result.reclaimed == versions[0].size
+
+    # the store entry for the changed file is no longer used and is pruned
+    assert second.joinpath('shared.js').stat().st_nlink == 2
+    entries = [path for path in cache_dir.joinpath('.store').rglob('*') if path.is_file()]
+    assert all(path.stat().st_nlink == 2 for path in entries)
+
+
+def test_store_prune_skipped_while_in_use(cache_dir: Path) -> None:
+    first = _install_fake_version(cache_dir, '1.1.300', {'index.js': b'a'})
+    _dedupe(first)
+    shutil.rmtree(cache_dir / '1.1.300')
+
+    with _store.use():
+        assert _store.prune() == 0
+
+    assert _store.prune() > 0
+    assert not [path for path in cache_dir.joinpath('.store').rglob('*') if path.is_file()]
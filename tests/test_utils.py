@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import json
+import time
+from typing import Any
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from pyright import utils
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv('PYRIGHT_PYTHON_CACHE_DIR', str(tmp_path))
+    monkeypatch.delenv('PYRIGHT_PYTHON_VERSION_CHECK_TTL', raising=False)
+    utils.get_latest_version.cache_clear()
+    return tmp_path
+
+
+class FakeResponse:
+    def __init__(self, data: Any) -> None:
+        self.data = data
+
+    def json(self) -> Any:
+        return self.data
+
+
+def _write_cache_entry(cache_dir: Path, **entry: Any) -> Path:
+    path = cache_dir / 'pyright-python' / 'latest-version.json'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(entry))
+    return path
+
+
+def test_latest_version_cold_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The network is not accessed if there is no cached entry, it is fetched in the background instead"""
+    monkeypatch.setattr('pyright._mureq.get', mock.Mock(side_effect=AssertionError('network accessed')))
+    refresh = mock.Mock()
+    monkeypatch.setattr('pyright.utils._refresh_latest_version_in_background', refresh)
+
+    assert utils.get_latest_version() is None
+    assert refresh.call_count == 1
+
+    # a refresh is only attempted once per refresh interval
+    utils.get_latest_version.cache_clear()
+    assert utils.get_latest_version() is None
+    assert refresh.call_count == 1
+
+
+def test_refresh_latest_version(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    get = mock.Mock(return_value=FakeResponse({'info': {'version': 'v1.2.3'}}))
+    monkeypatch.setattr('pyright._mureq.get', get)
+
+    assert utils.refresh_latest_version() == '1.2.3'
+    assert get.call_count == 1
+
+    data = json.loads(cache_dir.joinpath('pyright-python', 'latest-version.json').read_text())
+    assert data['version'] == '1.2.3'
+    assert utils.get_latest_version() == '1.2.3'
+
+
+def test_latest_version_records_failures(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Failed lookups are cached so that offline machines only pay the timeout once"""
+    get = mock.Mock(side_effect=TimeoutError('timed out'))
+    monkeypatch.setattr('pyright._mureq.get', get)
+    refresh = mock.Mock()
+    monkeypatch.setattr('pyright.utils._refresh_latest_version_in_background', refresh)
+
+    assert utils.refresh_latest_version() is None
+    assert utils.get_latest_version() is None
+    assert get.call_count == 1
+    assert refresh.call_count == 0
+
+    data = json.loads(cache_dir.joinpath('pyright-python', 'latest-version.json').read_text())
+    assert data['version'] is None
+
+
+def test_latest_version_fresh_cache(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A fresh cached entry is returned without accessing the network"""
+    _write_cache_entry(cache_dir, version='1.0.0', checked_at=time.time())
+    monkeypatch.setattr('pyright._mureq.get', mock.Mock(side_effect=AssertionError('network accessed')))
+    refresh = mock.Mock()
+    monkeypatch.setattr('pyright.utils._refresh_latest_version_in_background', refresh)
+
+    assert utils.get_latest_version() == '1.0.0'
+    assert refresh.call_count == 0
+
+
+def test_latest_version_stale_cache(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A stale cached entry is returned immediately and refreshed in the background"""
+    monkeypatch.setenv('PYRIGHT_PYTHON_VERSION_CHECK_TTL', '60')
+    path = _write_cache_entry(cache_dir, version='1.0.0', checked_at=time.time() - 120)
+    monkeypatch.setattr('pyright._mureq.get', mock.Mock(side_effect=AssertionError('network accessed')))
+    refresh = mock.Mock()
+    monkeypatch.setattr('pyright.utils._refresh_latest_version_in_background', refresh)
+
+    assert utils.get_latest_version() == '1.0.0'
+    assert refresh.call_count == 1
+
+    # a refresh is only attempted once per refresh interval
+    utils.get_latest_version.cache_clear()
+    assert utils.get_latest_version() == '1.0.0'
+    assert refresh.call_count == 1
+    assert 'refresh_started_at' in json.loads(path.read_text())
+
+
+def test_version_check_ttl(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert utils.get_version_check_ttl() == utils.DEFAULT_VERSION_CHECK_TTL
+
+    monkeypatch.setenv('PYRIGHT_PYTHON_VERSION_CHECK_TTL', '10')
+    assert utils.get_version_check_ttl() == 10
+
+    monkeypatch.setenv('PYRIGHT_PYTHON_VERSION_CHECK_TTL', 'foo')
+    assert utils.get_version_check_ttl() == utils.DEFAULT_VERSION_CHECK_TTL